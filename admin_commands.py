@@ -2,7 +2,11 @@
 import logging
 from telegram import Update
 from telegram.ext import ContextTypes
+from async_db_handler import AsyncDatabaseHandler
 from db_handler import DatabaseHandler
+from database import get_pool_stats
+from backpressure import get_write_budget
+from rate_limiter import get_rate_limiter
 import config
 
 logger = logging.getLogger(__name__)
@@ -38,6 +42,8 @@ I'm a message capture bot. Add me to your groups to start capturing messages.
 /list_groups - List all monitored groups
 /list_topics <group_id> - Show topics in a group
 /reinitialize - Migration info (not available in webhook mode)
+/reinit_status [job_id] - Progress of migration jobs
+/reinit_pause, /reinit_resume, /reinit_cancel <job_id> - Control a migration job
 
 **Setup:**
 1. Add me to your group
@@ -57,7 +63,8 @@ For help, contact the bot administrator.
             await update.message.reply_text("⛔ You are not authorized to use this command.")
             return
         
-        stats = DatabaseHandler.get_database_stats()
+        stats = await AsyncDatabaseHandler.get_database_stats()
+        pool = get_pool_stats()
         
         status_message = f"""
 📊 **Database Status**
@@ -65,7 +72,63 @@ For help, contact the bot administrator.
 Groups monitored: {stats['groups']}
 Total topics: {stats['topics']}
 Total messages: {stats['messages']:,}
+
+🔌 **Connection Pool** ({pool['pool_class']})
+{pool['status']}
 """
+        if config.INGEST_MODE == 'batch':
+            buffer = DatabaseHandler.get_message_buffer().get_stats()
+            status_message += (
+                f"\n📦 **Write Buffer**\n"
+                f"Buffered: {buffer['buffered']:,}\n"
+                f"Flushes: {buffer['flushes']:,} ({buffer['failed_flushes']} failed, "
+                f"{buffer['rows_dropped']:,} rows dropped)\n"
+                f"Avg flush: {buffer['avg_flush_size']:.0f} rows in {buffer['avg_flush_ms']:.1f} ms\n"
+                f"Last flush: {buffer['last_flush_size']} rows in {buffer['last_flush_ms']:.1f} ms\n"
+            )
+        
+        budget = get_write_budget().get_stats()
+        status_message += (
+            f"\n🚦 **Write Budget** ({config.WRITE_BUDGET} slots, shed policy: {config.SHED_POLICY})\n"
+            f"In flight: {budget['inflight']}, waiting: {budget['waiting']} (max {budget['max_waiting']})\n"
+            f"Deferred: {budget['deferred']:,} ({budget['deferred_pending']} pending), "
+            f"dropped: {budget['dropped']:,}\n"
+        )
+        
+        spool = DatabaseHandler.get_spool()
+        if spool is not None:
+            spooled = spool.get_stats()
+            status_message += (
+                f"\n💽 **Spool**{' (diverting writes)' if spooled['diverting'] else ''}\n"
+                f"Pending: {spooled['pending']:,} messages in {spooled['segments']} segments "
+                f"({spooled['bytes'] / 1024:.0f} KB)\n"
+                f"Spooled: {spooled['spooled']:,}, replayed: {spooled['replayed']:,} "
+                f"({spooled['replay_failures']} failed attempts, {spooled['dead_lettered']} dead-lettered)\n"
+                f"Last replay rate: {spooled['last_replay_rate']:.0f} msg/s\n"
+            )
+        
+        limits = get_rate_limiter().get_stats()
+        if limits['calls']:
+            status_message += (
+                f"\n⏱ **Outbound Rate Limit** ({config.RATE_LIMIT_GLOBAL_PER_SECOND:g}/s global, "
+                f"{config.RATE_LIMIT_CHAT_PER_SECOND * 60:g}/min per chat)\n"
+                f"Calls: {limits['calls']:,}, retries: {limits['retries']:,} "
+                f"(flood control: {limits['retry_after']:,}, gave up: {limits['gave_up']:,})\n"
+                f"Time waited: {limits['total_wait_s']:.0f}s\n"
+            )
+        
+        # Polling mode with concurrent processing (see update_processor.py)
+        processor = context.application.update_processor
+        if hasattr(processor, 'get_stats'):
+            updates = processor.get_stats()
+            status_message += (
+                f"\n⚙️ **Update Processing**\n"
+                f"Active: {updates['capture_active']} capture, {updates['admin_active']} admin\n"
+                f"Pending: {updates['pending']} in {updates['busy_chats']} chats\n"
+                f"Processed: {updates['capture']:,} capture, {updates['admin']:,} admin "
+                f"({updates['failed']} failed)\n"
+            )
+        
         await update.message.reply_text(status_message, parse_mode='Markdown')
         logger.info(f"Status command used by {user.username}")
     
@@ -78,7 +141,7 @@ Total messages: {stats['messages']:,}
             await update.message.reply_text("⛔ You are not authorized to use this command.")
             return
         
-        groups = DatabaseHandler.get_all_groups()
+        groups = await AsyncDatabaseHandler.get_all_groups()
         
         if not groups:
             await update.message.reply_text("📋 No groups are being monitored yet.")
@@ -109,6 +172,10 @@ Total messages: {stats['messages']:,}
 /list_topics <group_id> - Show topics in a specific group
 /list_groups - List all monitored groups
 /reinitialize <source_id> <target_id> - Migrate messages from one group to another
+/reinit_status [job_id] - Show migration job progress
+/reinit_pause <job_id> - Pause a migration job
+/reinit_resume <job_id> - Continue a paused or failed job
+/reinit_cancel <job_id> - Cancel a migration job
 
 **How to Use:**
 1. Add the bot to your Telegram group
@@ -121,6 +188,7 @@ Total messages: {stats['messages']:,}
 `/reinitialize -1001234567890 -1009876543210`
 
 This will copy all messages from the source group to the target group.
+If a migration is interrupted, run the same command again (or use /reinit_resume) to resume it.
 """
         await update.message.reply_text(help_text, parse_mode='Markdown')
     
@@ -151,13 +219,13 @@ This will copy all messages from the source group to the target group.
             return
         
         # Get group info
-        group = DatabaseHandler.get_group_by_id(group_id)
+        group = await AsyncDatabaseHandler.get_group_by_id(group_id)
         if not group:
             await update.message.reply_text(f"❌ Group with ID `{group_id}` not found in database.", parse_mode='Markdown')
             return
         
         # Get topic statistics
-        topic_stats = DatabaseHandler.get_topic_stats(group_id)
+        topic_stats = await AsyncDatabaseHandler.get_topic_stats(group_id)
         
         if not topic_stats:
             await update.message.reply_text(
@@ -189,6 +257,121 @@ This will copy all messages from the source group to the target group.
         await update.message.reply_text(message, parse_mode='Markdown')
         logger.info(f"List topics command used by {user.username} for group {group_id}")
     
+    @staticmethod
+    async def reinit_status(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /reinit_status command to show migration job progress."""
+        user = update.effective_user
+        
+        if not is_admin(user.id):
+            await update.message.reply_text("⛔ You are not authorized to use this command.")
+            return
+        
+        # Optional job ID argument
+        if context.args:
+            try:
+                job_id = int(context.args[0])
+            except ValueError:
+                await update.message.reply_text("❌ Job ID must be a valid integer.")
+                return
+            job = await AsyncDatabaseHandler.get_migration_job(job_id)
+            if not job:
+                await update.message.reply_text(f"❌ Job #{job_id} not found.")
+                return
+            jobs = [job]
+        else:
+            jobs = await AsyncDatabaseHandler.get_migration_jobs(limit=5)
+            if not jobs:
+                await update.message.reply_text("📭 No reinitialization jobs yet.")
+                return
+        
+        status_icons = {
+            'pending': '⏳', 'running': '🔄', 'paused': '⏸',
+            'completed': '✅', 'failed': '❌', 'cancelled': '🛑',
+        }
+        status_message = "📋 **Reinitialization Jobs**\n"
+        for job in jobs:
+            percentage = job.processed / job.total_messages * 100 if job.total_messages else 0
+            status_message += (
+                f"\n{status_icons.get(job.status, '•')} **Job #{job.id}** - {job.status} ({job.mode} mode)\n"
+                f"`{job.source_group_id}` → `{job.target_group_id}`\n"
+                f"Progress: {job.processed:,}/{job.total_messages:,} messages ({percentage:.1f}%)\n"
+                f"Sent: {job.sent:,}, failed: {job.failed:,}, API calls: {job.api_calls:,}\n"
+            )
+            if job.checkpoint_timestamp:
+                status_message += f"Checkpoint: message from {job.checkpoint_timestamp.strftime('%Y-%m-%d %H:%M')}\n"
+            status_message += f"Last update: {job.updated_at.strftime('%Y-%m-%d %H:%M:%S')} UTC\n"
+            if job.control and job.status == 'running':
+                status_message += f"Requested: {job.control}\n"
+            if job.error:
+                status_message += f"Error: `{job.error[:200]}`\n"
+        
+        if any(job.status in ('paused', 'failed') for job in jobs):
+            status_message += "\nℹ️ Use /reinit_resume <job_id> to continue a paused or failed job."
+        
+        await update.message.reply_text(status_message, parse_mode='Markdown')
+    
+    @staticmethod
+    async def reinit_pause(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /reinit_pause command."""
+        await AdminCommands._control_job(update, context, 'pause')
+    
+    @staticmethod
+    async def reinit_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /reinit_cancel command."""
+        await AdminCommands._control_job(update, context, 'cancel')
+    
+    @staticmethod
+    async def reinit_resume(update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /reinit_resume command."""
+        await AdminCommands._control_job(update, context, 'resume')
+    
+    @staticmethod
+    async def _control_job(update: Update, context: ContextTypes.DEFAULT_TYPE, action):
+        """Pause, cancel or resume a migration job given as the command argument."""
+        user = update.effective_user
+        
+        if not is_admin(user.id):
+            await update.message.reply_text("⛔ You are not authorized to use this command.")
+            return
+        
+        if len(context.args) != 1:
+            await update.message.reply_text(
+                f"❌ Invalid usage.\n\n"
+                f"Usage: `/reinit_{action} <job_id>`\n\n"
+                f"Use /reinit_status to get job IDs.",
+                parse_mode='Markdown'
+            )
+            return
+        
+        try:
+            job_id = int(context.args[0])
+        except ValueError:
+            await update.message.reply_text("❌ Job ID must be a valid integer.")
+            return
+        
+        try:
+            outcome = await AsyncDatabaseHandler.control_migration_job(job_id, action)
+        except ValueError as e:
+            await update.message.reply_text(f"❌ Cannot {action} job: {e}.")
+            return
+        
+        if outcome is None:
+            await update.message.reply_text(f"❌ Job #{job_id} not found.")
+        elif outcome == 'requested':
+            await update.message.reply_text(
+                f"⏳ Job #{job_id} will {action} after the message it is sending."
+            )
+        elif outcome == 'pending':
+            if config.REINIT_USE_WORKER:
+                await update.message.reply_text(f"▶️ Job #{job_id} queued again; a worker will continue it.")
+            else:
+                await update.message.reply_text(
+                    f"▶️ Job #{job_id} can continue: run /reinitialize again for the same groups."
+                )
+        else:
+            await update.message.reply_text(f"✅ Job #{job_id} is now {outcome}.")
+        logger.info(f"Job {job_id} {action} by {user.username}: {outcome}")
+    
     @staticmethod
     async def recent(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /recent command - Show recent messages."""
@@ -203,7 +386,7 @@ This will copy all messages from the source group to the target group.
         if context.args and context.args[0].isdigit():
             limit = min(int(context.args[0]), 50)  # Max 50 messages
         
-        messages = DatabaseHandler.get_recent_messages(limit=limit)
+        messages = await AsyncDatabaseHandler.get_recent_messages(limit=limit)
         
         if not messages:
             await update.message.reply_text("📭 No messages in database yet.")
@@ -291,7 +474,7 @@ This will copy all messages from the source group to the target group.
             await update.message.reply_text("⛔ You are not authorized to use this command.")
             return
         
-        stats = DatabaseHandler.get_detailed_stats()
+        stats = await AsyncDatabaseHandler.get_detailed_stats()
         
         message = "📊 **Detailed Statistics**\n\n"
         
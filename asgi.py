@@ -0,0 +1,164 @@
+"""ASGI entry point - Telegram Message Capture Bot (Webhook Mode).
+
+Serves the same routes as bot.py, but natively async: every webhook
+request is processed as its own task on one shared event loop, so
+updates are handled concurrently. Run with any ASGI server, e.g.:
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8000
+
+The Flask app in bot.py remains the entry point for Vercel.
+"""
+import logging
+import os
+from contextlib import asynccontextmanager
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+import config
+from database import init_db, dispose_engine
+from db_handler import DatabaseHandler
+from async_db_handler import shutdown_db_executor
+from bot_setup import (
+    build_application, is_valid_webhook_secret, process_raw_update,
+    claim_update, complete_update, forget_update, is_valid_stats_secret
+)
+from update_dedup import get_deduplicator, UPDATE_DONE, UPDATE_IN_PROGRESS
+from fast_path import loads
+from update_queue import UpdateDispatcher
+
+# Configure logging
+logging.basicConfig(
+    level=getattr(logging, config.LOG_LEVEL),
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+# Initialize database
+logger.info("Initializing database...")
+init_db()
+
+# Create application
+logger.info("Creating bot application...")
+application = build_application()
+logger.info(f"Admin IDs: {config.ADMIN_IDS}")
+
+# Update queue for fast-ack mode (started in the lifespan handler)
+dispatcher = None
+if config.WEBHOOK_FAST_ACK:
+    dispatcher = UpdateDispatcher(
+        lambda data: process_raw_update(application, data),
+        workers=config.WEBHOOK_WORKERS,
+        max_queue_size=config.WEBHOOK_QUEUE_SIZE
+    )
+
+
+async def index(request: Request):
+    """Health check endpoint."""
+    return PlainTextResponse('Telegram Bot is running!')
+
+
+async def webhook(request: Request):
+    """Handle incoming webhook updates from Telegram."""
+    secret_header = request.headers.get('X-Telegram-Bot-Api-Secret-Token')
+    if not is_valid_webhook_secret(secret_header):
+        client = request.client.host if request.client else 'unknown'
+        logger.warning(f"Invalid webhook secret token from {client}")
+        return PlainTextResponse('Unauthorized', status_code=403)
+
+    data = None
+    try:
+        data = loads(await request.body())
+
+        # Acknowledge redelivered updates without processing them again
+        claim = await claim_update(data)
+        if claim == UPDATE_DONE:
+            return PlainTextResponse('OK')
+        if claim == UPDATE_IN_PROGRESS:
+            # Still being processed elsewhere: Telegram redelivers it later
+            return PlainTextResponse('In progress', status_code=503)
+
+        # Fast-ack mode: queue the update and let the workers process it
+        if dispatcher is not None:
+            if dispatcher.submit(data):
+                # Acknowledged, so Telegram will not redeliver it
+                await complete_update(data)
+                return PlainTextResponse('OK')
+            # Telegram redelivers updates that are not acknowledged with 2xx
+            await forget_update(data)
+            return PlainTextResponse('Queue full', status_code=503)
+
+        await process_raw_update(application, data)
+        await complete_update(data)
+        return PlainTextResponse('OK')
+    except Exception as e:
+        logger.error(f"Error processing webhook: {e}", exc_info=True)
+        if isinstance(data, dict):
+            await forget_update(data)
+        return PlainTextResponse('Error', status_code=500)
+
+
+async def set_webhook(request: Request):
+    """Set the webhook URL for the bot."""
+    webhook_url = os.getenv('WEBHOOK_URL')
+    if not webhook_url:
+        return PlainTextResponse('WEBHOOK_URL environment variable not set', status_code=400)
+
+    try:
+        # Set webhook with secret token if configured
+        webhook_params = {'url': f"{webhook_url}/webhook"}
+        if config.WEBHOOK_SECRET:
+            webhook_params['secret_token'] = config.WEBHOOK_SECRET
+            logger.info("Setting webhook with secret token")
+
+        await application.bot.set_webhook(**webhook_params)
+        return PlainTextResponse(
+            f'Webhook set to {webhook_url}/webhook (secured: {bool(config.WEBHOOK_SECRET)})'
+        )
+    except Exception as e:
+        logger.error(f"Error setting webhook: {e}", exc_info=True)
+        return PlainTextResponse(f'Error: {e}', status_code=500)
+
+
+async def queue_stats(request: Request):
+    """Report update queue depth, drops and latency, and duplicate update hits."""
+    if not is_valid_stats_secret(request.headers.get('X-Telegram-Bot-Api-Secret-Token')):
+        client = request.client.host if request.client else 'unknown'
+        logger.warning(f"Unauthorized queue stats request from {client}")
+        return PlainTextResponse('Unauthorized', status_code=403)
+
+    deduplicator = get_deduplicator()
+    stats = {'dedup': deduplicator.get_stats() if deduplicator else None}
+    if dispatcher is None:
+        return JSONResponse({'fast_ack': False, **stats})
+    return JSONResponse({'fast_ack': True, **dispatcher.get_stats(), **stats})
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """Initialize the bot once at startup and release resources at shutdown."""
+    # Resume replaying messages spooled by a previous run
+    DatabaseHandler.get_spool()
+    async with application:
+        if dispatcher is not None:
+            await dispatcher.start()
+        yield
+        if dispatcher is not None:
+            await dispatcher.stop()
+    shutdown_db_executor()
+    DatabaseHandler.flush_message_buffer()
+    dispose_engine()
+
+
+app = Starlette(
+    routes=[
+        Route('/', index),
+        Route('/webhook', webhook, methods=['POST']),
+        Route('/set-webhook', set_webhook, methods=['GET']),
+        Route('/queue-stats', queue_stats, methods=['GET']),
+    ],
+    lifespan=lifespan,
+)
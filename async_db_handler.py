@@ -0,0 +1,203 @@
+"""Async database operations for the Telegram bot.
+
+The handlers run on the python-telegram-bot event loop, so every
+DatabaseHandler call is executed on a bounded thread pool instead of
+blocking the loop while waiting for the database. Handlers wrapped with
+with_db_priority (admin commands, chat member updates) run their calls on
+a separate small pool, so a backlog of other database work never holds
+them up.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from db_handler import DatabaseHandler
+import config
+
+# Bounded pool of database threads (sized to match the connection pool)
+_executor = ThreadPoolExecutor(
+    max_workers=config.DB_EXECUTOR_WORKERS,
+    thread_name_prefix='db'
+)
+
+# Threads kept for with_db_priority handlers
+_priority_executor = ThreadPoolExecutor(
+    max_workers=config.DB_PRIORITY_WORKERS,
+    thread_name_prefix='db-priority'
+)
+
+
+# Set while a with_db_priority handler runs (tasks it starts inherit it)
+_priority = contextvars.ContextVar('db_priority', default=False)
+
+
+async def run_in_db_thread(func, *args, **kwargs):
+    """Run a blocking database function on the database thread pool."""
+    loop = asyncio.get_running_loop()
+    executor = _priority_executor if _priority.get() else _executor
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+def with_db_priority(handler):
+    """Wrap an async handler so its database calls run on the priority threads."""
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        token = _priority.set(True)
+        try:
+            return await handler(*args, **kwargs)
+        finally:
+            _priority.reset(token)
+    return wrapper
+
+
+def shutdown_db_executor():
+    """Wait for queued database work and stop the thread pool."""
+    _executor.shutdown(wait=True)
+    _priority_executor.shutdown(wait=True)
+
+
+class AsyncDatabaseHandler:
+    """Awaitable wrappers around DatabaseHandler for use in async handlers."""
+
+    # Cache invalidation never touches the database, so it stays synchronous
+    invalidate_group = staticmethod(DatabaseHandler.invalidate_group)
+    invalidate_topic = staticmethod(DatabaseHandler.invalidate_topic)
+
+    @staticmethod
+    async def add_or_update_group(group_id, group_name):
+        """Add or update a group in the database."""
+        return await run_in_db_thread(DatabaseHandler.add_or_update_group, group_id, group_name)
+
+    @staticmethod
+    async def add_forum_topic(group_id, topic_id, topic_name):
+        """Add a forum topic to the database."""
+        return await run_in_db_thread(DatabaseHandler.add_forum_topic, group_id, topic_id, topic_name)
+
+    @staticmethod
+    async def get_topic_name(group_id, topic_id):
+        """Get topic name from the cache or database."""
+        return await run_in_db_thread(DatabaseHandler.get_topic_name, group_id, topic_id)
+
+    @staticmethod
+    async def save_message(message_data):
+        """Save a captured message."""
+        return await run_in_db_thread(DatabaseHandler.save_message, message_data)
+
+    @staticmethod
+    async def get_all_groups():
+        """Get all monitored groups with message counts."""
+        return await run_in_db_thread(DatabaseHandler.get_all_groups)
+
+    @staticmethod
+    async def get_database_stats():
+        """Get database statistics."""
+        return await run_in_db_thread(DatabaseHandler.get_database_stats)
+
+    @staticmethod
+    async def get_messages_for_group(group_id):
+        """Get all messages for a specific group, ordered by timestamp."""
+        return await run_in_db_thread(DatabaseHandler.get_messages_for_group, group_id)
+
+    @staticmethod
+    async def count_messages_for_group(group_id):
+        """Count a group's messages."""
+        return await run_in_db_thread(DatabaseHandler.count_messages_for_group, group_id)
+
+    @staticmethod
+    async def iter_messages_for_group(group_id, chunk_size=500, after=None, **topic_filters):
+        """Yield a group's messages page by page, prefetching the next page."""
+        page = await run_in_db_thread(
+            DatabaseHandler.get_message_page, group_id, after, chunk_size, **topic_filters
+        )
+        next_page = None
+        try:
+            while page:
+                if len(page) == chunk_size:
+                    last = page[-1]
+                    next_page = asyncio.ensure_future(run_in_db_thread(
+                        DatabaseHandler.get_message_page, group_id, (last.timestamp, last.id), chunk_size,
+                        **topic_filters
+                    ))
+                for row in page:
+                    yield row
+                if next_page is None:
+                    return
+                page, next_page = await next_page, None
+        finally:
+            if next_page is not None:
+                next_page.cancel()
+
+    @staticmethod
+    async def get_topics_for_group(group_id):
+        """Get all topics for a specific group."""
+        return await run_in_db_thread(DatabaseHandler.get_topics_for_group, group_id)
+
+    @staticmethod
+    async def get_group_by_id(group_id):
+        """Get group information by ID."""
+        return await run_in_db_thread(DatabaseHandler.get_group_by_id, group_id)
+
+    @staticmethod
+    async def get_topic_stats(group_id):
+        """Get message count per topic for a group."""
+        return await run_in_db_thread(DatabaseHandler.get_topic_stats, group_id)
+
+    @staticmethod
+    async def get_recent_messages(limit=10, group_id=None, topic_id=None):
+        """Get recent messages with optional filters."""
+        return await run_in_db_thread(
+            DatabaseHandler.get_recent_messages, limit=limit, group_id=group_id, topic_id=topic_id
+        )
+
+    @staticmethod
+    async def get_detailed_stats():
+        """Get detailed statistics for all groups and topics."""
+        return await run_in_db_thread(DatabaseHandler.get_detailed_stats)
+
+    @staticmethod
+    async def create_migration_job(source_group_id, target_group_id, mode, **fields):
+        """Record a new migration job and return its ID."""
+        return await run_in_db_thread(
+            DatabaseHandler.create_migration_job, source_group_id, target_group_id, mode, **fields
+        )
+
+    @staticmethod
+    async def get_migration_job(job_id):
+        """Get a migration job by ID."""
+        return await run_in_db_thread(DatabaseHandler.get_migration_job, job_id)
+
+    @staticmethod
+    async def get_unfinished_migration_job(source_group_id, target_group_id):
+        """Get the most recent unfinished job for a source/target pair, if any."""
+        return await run_in_db_thread(
+            DatabaseHandler.get_unfinished_migration_job, source_group_id, target_group_id
+        )
+
+    @staticmethod
+    async def update_migration_job(job_id, **fields):
+        """Update a migration job's columns and return its pending control request."""
+        return await run_in_db_thread(DatabaseHandler.update_migration_job, job_id, **fields)
+
+    @staticmethod
+    async def claim_migration_job(worker_id, stale_after, job_id=None):
+        """Atomically take a queued (or the given) job for running."""
+        return await run_in_db_thread(
+            DatabaseHandler.claim_migration_job, worker_id, stale_after, job_id=job_id
+        )
+
+    @staticmethod
+    async def enqueue_migration_job(source_group_id, target_group_id, mode, stale_after, **fields):
+        """Queue a migration for a worker; returns (job ID, newly queued)."""
+        return await run_in_db_thread(
+            DatabaseHandler.enqueue_migration_job, source_group_id, target_group_id, mode, stale_after, **fields
+        )
+
+    @staticmethod
+    async def control_migration_job(job_id, action):
+        """Pause, cancel or resume a job; returns its new status or 'requested'."""
+        return await run_in_db_thread(DatabaseHandler.control_migration_job, job_id, action)
+
+    @staticmethod
+    async def get_migration_jobs(limit=5):
+        """Get the most recent migration jobs, newest first."""
+        return await run_in_db_thread(DatabaseHandler.get_migration_jobs, limit)
@@ -0,0 +1,149 @@
+"""Backpressure and load shedding for captured message writes.
+
+A WriteBudget caps how much database work captures may have in flight.
+Captures wait for a free slot instead of piling up behind the database,
+and a few slots are reserved, so captures never occupy every database
+worker thread that migrations and job updates also need (admin commands
+have threads of their own, see async_db_handler.py). When the budget is
+exhausted, low-value service messages (new_member, left_member, ...) can
+be dropped or deferred until load falls.
+"""
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+import config
+
+logger = logging.getLogger(__name__)
+
+SHED_POLICIES = ('none', 'drop', 'defer')
+
+
+class WriteBudget:
+    """In-flight limit for database writes with reserved priority slots and shedding."""
+
+    def __init__(self, max_inflight=5, reserved=1, shed_policy='none', shed_types=(),
+                 max_deferred=1000):
+        """
+        Args:
+            max_inflight: Writes allowed in flight at once, priority work included
+            reserved: Slots only priority work may use
+            shed_policy: What to do with shed_types when captures are backed up:
+                'none' (wait like any capture), 'drop' or 'defer'
+            shed_types: Message types that may be shed
+            max_deferred: Deferred writes kept at most (older ones are dropped beyond this)
+        """
+        if shed_policy not in SHED_POLICIES:
+            raise ValueError(
+                f"Unknown shed policy {shed_policy!r}, expected one of {SHED_POLICIES}"
+            )
+        self.max_inflight = max_inflight
+        self.capture_limit = max(1, max_inflight - reserved)
+        self.shed_policy = shed_policy
+        self.shed_types = frozenset(shed_types)
+        self._inflight = 0
+        self._waiting = 0
+        self._condition = None  # created on first use, on the running event loop
+        self._deferred = deque()
+        self.max_deferred = max_deferred
+        self._drain_task = None
+        self._stats = {
+            'admitted': 0,
+            'priority': 0,
+            'waited': 0,
+            'max_waiting': 0,
+            'deferred': 0,
+            'deferred_written': 0,
+            'dropped': 0,
+        }
+
+    @property
+    def saturated(self):
+        """Whether new captures would have to wait for a slot."""
+        return self._waiting > 0 or self._inflight >= self.capture_limit
+
+    @asynccontextmanager
+    async def slot(self, priority=False):
+        """Hold one in-flight write slot (priority work may also use the reserved slots)."""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        limit = self.max_inflight if priority else self.capture_limit
+        async with self._condition:
+            if self._inflight >= limit:
+                self._stats['waited'] += 1
+                self._waiting += 1
+                self._stats['max_waiting'] = max(self._stats['max_waiting'], self._waiting)
+                try:
+                    await self._condition.wait_for(lambda: self._inflight < limit)
+                finally:
+                    self._waiting -= 1
+            self._inflight += 1
+            self._stats['priority' if priority else 'admitted'] += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._inflight -= 1
+                self._condition.notify_all()
+
+    def should_shed(self, message_type):
+        """Check whether a capture of this type should be dropped or deferred right now."""
+        return self.shed_policy != 'none' and message_type in self.shed_types and self.saturated
+
+    def shed(self, write_fn):
+        """
+        Drop or defer a write according to the shed policy.
+
+        Args:
+            write_fn: Coroutine function performing the write, run later if deferred
+        """
+        if self.shed_policy == 'drop':
+            self._stats['dropped'] += 1
+            return
+        if len(self._deferred) >= self.max_deferred:
+            self._deferred.popleft()
+            self._stats['dropped'] += 1
+        self._deferred.append(write_fn)
+        self._stats['deferred'] += 1
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = asyncio.get_running_loop().create_task(self._drain())
+
+    async def _drain(self):
+        """Write deferred captures one at a time, only while captures are not backed up."""
+        while self._deferred:
+            async with self._condition:
+                await self._condition.wait_for(lambda: not self.saturated)
+            if not self._deferred:
+                break
+            write_fn = self._deferred.popleft()
+            try:
+                async with self.slot():
+                    await write_fn()
+                self._stats['deferred_written'] += 1
+            except Exception as e:
+                logger.error(f"Deferred write failed: {e}", exc_info=True)
+
+    def get_stats(self):
+        """Get in-flight, waiting, deferred and dropped counts."""
+        stats = dict(self._stats)
+        stats['inflight'] = self._inflight
+        stats['waiting'] = self._waiting
+        stats['deferred_pending'] = len(self._deferred)
+        return stats
+
+
+_write_budget = None
+
+
+def get_write_budget():
+    """Get the process-wide write budget configured from WRITE_BUDGET / SHED_* settings."""
+    global _write_budget
+    if _write_budget is None:
+        _write_budget = WriteBudget(
+            max_inflight=config.WRITE_BUDGET,
+            reserved=config.WRITE_BUDGET_RESERVED,
+            shed_policy=config.SHED_POLICY,
+            shed_types=config.SHED_MESSAGE_TYPES,
+            max_deferred=config.SHED_MAX_DEFERRED
+        )
+    return _write_budget
@@ -0,0 +1,113 @@
+"""Benchmark webhook capture: full python-telegram-bot pipeline vs the raw-JSON fast path.
+
+Feeds synthetic plain group messages (text, photo and forum topic messages)
+through both paths and reports per-update latency, both for parsing alone
+(JSON decode + object building / field extraction) and end to end into a
+throwaway SQLite database.
+
+Usage:
+    python benchmark_fast_path.py [--updates 2000]
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+
+# The benchmark must never touch the real database
+_workdir = tempfile.mkdtemp(prefix='bench_fast_path_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_workdir, 'bench.db')}"
+os.environ.setdefault('BOT_TOKEN', 'benchmark')
+os.environ['INGEST_MODE'] = 'sync'
+
+import config  # noqa: E402
+import fast_path  # noqa: E402
+from telegram import Update  # noqa: E402
+from database import init_db, dispose_engine  # noqa: E402
+from bot_setup import build_application, process_raw_update  # noqa: E402
+
+
+def make_update(i):
+    """Build a raw update body like Telegram sends for a group message."""
+    message = {
+        'message_id': i,
+        'date': 1700000000 + i,
+        'chat': {'id': -1001234567890, 'type': 'supergroup', 'title': 'Benchmark Group', 'is_forum': True},
+        'from': {'id': 1000 + i % 50, 'is_bot': False, 'first_name': 'User', 'username': f'user{i % 50}'},
+    }
+    if i % 3 == 0:
+        message['photo'] = [
+            {'file_id': f'small{i}', 'file_unique_id': f's{i}', 'width': 90, 'height': 90, 'file_size': 1000},
+            {'file_id': f'large{i}', 'file_unique_id': f'l{i}', 'width': 1280, 'height': 1280, 'file_size': 90000},
+        ]
+        message['caption'] = 'Photo caption'
+    else:
+        message['text'] = f'Benchmark message number {i} with some ordinary text in it.'
+    if i % 2 == 0:
+        message['is_topic_message'] = True
+        message['message_thread_id'] = 7
+    return json.dumps({'update_id': i, 'message': message}).encode()
+
+
+def bench_parse(application, bodies):
+    """Time JSON decoding plus object building (full) or field extraction (fast), per update."""
+    handlers = application.handlers[0]
+    started = time.perf_counter()
+    for body in bodies:
+        update = Update.de_json(json.loads(body), application.bot)
+        # The work PTB does to pick a handler before calling it
+        next(handler for handler in handlers if handler.check_update(update))
+    full = (time.perf_counter() - started) / len(bodies)
+
+    started = time.perf_counter()
+    for body in bodies:
+        fast_path.parse_plain_message(fast_path.loads(body))
+    fast = (time.perf_counter() - started) / len(bodies)
+    return full, fast
+
+
+async def bench_end_to_end(application, bodies, fast):
+    """Time parsing, handling and storing every update on one path."""
+    config.FAST_PATH_ENABLED = fast
+    loads = fast_path.loads if fast else json.loads
+    started = time.perf_counter()
+    for body in bodies:
+        await process_raw_update(application, loads(body))
+    return (time.perf_counter() - started) / len(bodies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--updates', type=int, default=2000, help='updates per run')
+    args = parser.parse_args()
+
+    init_db()
+    application = build_application()
+    # Handlers only need the bot for commands; skip the network round trip of initialize()
+    application._initialized = True
+
+    full_bodies = [make_update(i) for i in range(args.updates)]
+    # Separate message ids so the fast path inserts new rows instead of upserting
+    fast_bodies = [make_update(i) for i in range(args.updates, 2 * args.updates)]
+
+    print(f'⏱️ {args.updates:,} group messages per run '
+          f'(JSON parser: {"orjson" if fast_path.orjson else "json"})\n')
+    full, fast = bench_parse(application, full_bodies)
+    print('📦 Parse and route only:')
+    print(f'   Full pipeline  {full * 1e6:9.1f} µs/update')
+    print(f'   Fast path      {fast * 1e6:9.1f} µs/update  ({full / fast:.1f}x faster)')
+
+    full = asyncio.run(bench_end_to_end(application, full_bodies, fast=False))
+    fast = asyncio.run(bench_end_to_end(application, fast_bodies, fast=True))
+    print('\n💾 End to end (parse, handle, store in SQLite):')
+    print(f'   Full pipeline  {full * 1e6:9.1f} µs/update')
+    print(f'   Fast path      {fast * 1e6:9.1f} µs/update  ({full / fast:.1f}x faster)')
+
+    dispose_engine()
+    shutil.rmtree(_workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
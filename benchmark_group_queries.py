@@ -0,0 +1,153 @@
+"""Benchmark get_all_groups / get_topic_stats: per-row COUNTs vs grouped aggregates.
+
+Builds a throwaway SQLite database for each group count and reports the
+number of SQL statements and the latency of the old N+1 implementation
+against the current single-query implementation.
+
+Usage:
+    python benchmark_group_queries.py [--groups 10 100 300] [--messages 50] [--topics 5]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# The benchmark must never touch the real database
+_workdir = tempfile.mkdtemp(prefix='bench_groups_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_workdir, 'bench.db')}"
+os.environ.setdefault('BOT_TOKEN', 'benchmark')
+
+from sqlalchemy import event, insert  # noqa: E402
+from database import (  # noqa: E402
+    Base, dispose_engine, get_engine, get_session, TelegramGroup, ForumTopic, CapturedMessage,
+    rebuild_message_counters
+)
+from db_handler import DatabaseHandler  # noqa: E402
+
+
+def legacy_get_all_groups():
+    """The previous implementation: two COUNT queries per group."""
+    session = get_session()
+    try:
+        result = []
+        for group in session.query(TelegramGroup).all():
+            message_count = session.query(CapturedMessage).filter_by(group_id=group.group_id).count()
+            topic_count = session.query(ForumTopic).filter_by(group_id=group.group_id).count()
+            result.append({
+                'group_id': group.group_id,
+                'group_name': group.group_name,
+                'message_count': message_count,
+                'topic_count': topic_count or 1
+            })
+        return result
+    finally:
+        session.close()
+
+
+def legacy_get_topic_stats(group_id):
+    """The previous implementation: one COUNT query per topic."""
+    session = get_session()
+    try:
+        result = []
+        for topic in session.query(ForumTopic).filter_by(group_id=group_id).all():
+            count = session.query(CapturedMessage).filter_by(
+                group_id=group_id, topic_id=topic.topic_id
+            ).count()
+            result.append({'topic_id': topic.topic_id, 'topic_name': topic.topic_name, 'message_count': count})
+        general_count = session.query(CapturedMessage).filter_by(group_id=group_id, topic_id=None).count()
+        if general_count > 0:
+            result.insert(0, {'topic_id': None, 'topic_name': 'General', 'message_count': general_count})
+        return result
+    finally:
+        session.close()
+
+
+def populate(groups, messages_per_group, topics_per_group):
+    """Fill a fresh schema with synthetic groups, topics and messages."""
+    engine = get_engine()
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    start = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(TelegramGroup), [
+            {'group_id': -1000 - g, 'group_name': f'Group {g}'} for g in range(groups)
+        ])
+        conn.execute(insert(ForumTopic), [
+            {'group_id': -1000 - g, 'topic_id': t, 'topic_name': f'Topic {t}'}
+            for g in range(groups) for t in range(1, topics_per_group + 1)
+        ])
+        rows = []
+        for g in range(groups):
+            for m in range(messages_per_group):
+                topic_id = random.choice([None] + list(range(1, topics_per_group + 1)))
+                rows.append({
+                    'group_id': -1000 - g,
+                    'group_name': f'Group {g}',
+                    'message_id': m,
+                    'topic_id': topic_id,
+                    'message_type': 'text',
+                    'text_content': 'hello',
+                    'timestamp': start + timedelta(seconds=m)
+                })
+        conn.execute(insert(CapturedMessage), rows)
+        # The current implementation reads message counts from the counters
+        rebuild_message_counters(conn)
+
+
+def measure(fn, *args, repeat=5):
+    """Return (statements per call, best latency in ms, result)."""
+    statements = [0]
+
+    def count(*_):
+        statements[0] += 1
+
+    engine = get_engine()
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        result = fn(*args)
+        per_call = statements[0]
+        best = float('inf')
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn(*args)
+            best = min(best, time.perf_counter() - started)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    return per_call, best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark group/topic aggregate queries')
+    parser.add_argument('--groups', type=int, nargs='+', default=[10, 100, 300])
+    parser.add_argument('--messages', type=int, default=50, help='messages per group')
+    parser.add_argument('--topics', type=int, default=5, help='topics per group')
+    args = parser.parse_args()
+
+    print(f"{'groups':>7} | {'query':<16} | {'old stmts':>9} | {'new stmts':>9} | "
+          f"{'old ms':>8} | {'new ms':>8} | {'speedup':>7}")
+    print('-' * 80)
+    for groups in args.groups:
+        populate(groups, args.messages, args.topics)
+        cases = [
+            ('get_all_groups', legacy_get_all_groups, DatabaseHandler.get_all_groups, ()),
+            ('get_topic_stats', legacy_get_topic_stats, DatabaseHandler.get_topic_stats, (-1000,)),
+        ]
+        for name, old_fn, new_fn, fn_args in cases:
+            old_stmts, old_ms, old_result = measure(old_fn, *fn_args)
+            new_stmts, new_ms, new_result = measure(new_fn, *fn_args)
+            if sorted(map(repr, old_result)) != sorted(map(repr, new_result)):
+                print(f'❌ {name}: results differ between implementations')
+                sys.exit(1)
+            print(f'{groups:>7} | {name:<16} | {old_stmts:>9} | {new_stmts:>9} | '
+                  f'{old_ms:>8.2f} | {new_ms:>8.2f} | {old_ms / new_ms:>6.1f}x')
+
+    dispose_engine()
+    shutil.rmtree(_workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
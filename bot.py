@@ -1,21 +1,20 @@
 """Main bot file - Telegram Message Capture Bot (Webhook Mode for Vercel)."""
+import atexit
 import logging
 import os
 import asyncio
-from flask import Flask, request
-from telegram import Update
-from telegram.ext import (
-    Application,
-    CommandHandler,
-    MessageHandler,
-    ChatMemberHandler,
-    filters
-)
+import threading
+from flask import Flask, request, jsonify
 import config
 from database import init_db
-from message_handlers import MessageCapture
-from admin_commands import AdminCommands
-from reinit_interactive import get_reinitialize_handler
+from db_handler import DatabaseHandler
+from bot_setup import (
+    build_application, is_valid_webhook_secret, process_raw_update,
+    claim_update, complete_update, forget_update, is_valid_stats_secret
+)
+from update_dedup import get_deduplicator, UPDATE_DONE, UPDATE_IN_PROGRESS
+from fast_path import loads
+from update_queue import UpdateDispatcher
 
 # Configure logging (Vercel only supports console/stdout)
 logging.basicConfig(
@@ -36,62 +35,58 @@ init_db()
 
 # Create application
 logger.info("Creating bot application...")
-application = Application.builder().token(config.BOT_TOKEN).build()
-
-# Register command handlers
-application.add_handler(CommandHandler("start", AdminCommands.start))
-application.add_handler(CommandHandler("help", AdminCommands.help_command))
-application.add_handler(CommandHandler("status", AdminCommands.status))
-application.add_handler(CommandHandler("list_groups", AdminCommands.list_groups))
-application.add_handler(CommandHandler("list_topics", AdminCommands.list_topics))
-application.add_handler(CommandHandler("recent", AdminCommands.recent))
-application.add_handler(CommandHandler("stats", AdminCommands.stats))
-
-# Add interactive reinitialize conversation handler
-application.add_handler(get_reinitialize_handler())
-
-# Register chat member handler (for when bot is added to groups)
-application.add_handler(
-    ChatMemberHandler(
-        MessageCapture.handle_new_chat_member,
-        ChatMemberHandler.MY_CHAT_MEMBER
-    )
-)
+application = build_application()
+logger.info(f"Admin IDs: {config.ADMIN_IDS}")
 
-# Register message handlers for capturing
-application.add_handler(
-    MessageHandler(
-        filters.ChatType.GROUPS & ~filters.COMMAND,
-        MessageCapture.handle_message
+# One event loop per worker process, running in a background thread, so the
+# Application (and the Bot's HTTP client) is initialized once and reused
+_loop = asyncio.new_event_loop()
+_loop_thread = threading.Thread(target=_loop.run_forever, name='bot-event-loop', daemon=True)
+_loop_thread.start()
+_init_lock = threading.Lock()
+_initialized = False
+
+# Update queue for fast-ack mode (runs on the shared event loop)
+dispatcher = None
+if config.WEBHOOK_FAST_ACK:
+    dispatcher = UpdateDispatcher(
+        lambda data: process_raw_update(application, data),
+        workers=config.WEBHOOK_WORKERS,
+        max_queue_size=config.WEBHOOK_QUEUE_SIZE
     )
-)
 
-# Handle edited messages
-application.add_handler(
-    MessageHandler(
-        filters.ChatType.GROUPS & filters.UpdateType.EDITED_MESSAGE,
-        MessageCapture.handle_message
-    )
-)
 
-# Handle forum topic creation
-application.add_handler(
-    MessageHandler(
-        filters.StatusUpdate.FORUM_TOPIC_CREATED,
-        MessageCapture.handle_forum_topic_created
-    )
-)
+def run_async(coro):
+    """Run a coroutine on the shared event loop and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
 
-# Handle forum topic edited
-application.add_handler(
-    MessageHandler(
-        filters.StatusUpdate.FORUM_TOPIC_EDITED,
-        MessageCapture.handle_forum_topic_edited
-    )
-)
 
-logger.info("Bot handlers registered")
-logger.info(f"Admin IDs: {config.ADMIN_IDS}")
+def ensure_initialized():
+    """Initialize the Application on first use (once per worker process)."""
+    global _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        if not _initialized:
+            logger.info("Initializing bot application...")
+            run_async(application.initialize())
+            # Resume replaying messages spooled by a previous run
+            DatabaseHandler.get_spool()
+            if dispatcher is not None:
+                run_async(dispatcher.start())
+            _initialized = True
+
+
+@atexit.register
+def shutdown():
+    """Shut down the Application and stop the shared event loop."""
+    try:
+        if _initialized:
+            if dispatcher is not None:
+                run_async(dispatcher.stop())
+            run_async(application.shutdown())
+    finally:
+        _loop.call_soon_threadsafe(_loop.stop)
 
 
 @app.route('/')
@@ -103,28 +98,44 @@ def index():
 @app.route('/webhook', methods=['POST'])
 def webhook():
     """Handle incoming webhook updates from Telegram."""
+    data = None
     try:
         # Verify secret token if configured
-        if config.WEBHOOK_SECRET:
-            secret_header = request.headers.get('X-Telegram-Bot-Api-Secret-Token')
-            if secret_header != config.WEBHOOK_SECRET:
-                logger.warning(f"Invalid webhook secret token from {request.remote_addr}")
-                return 'Unauthorized', 403
+        secret_header = request.headers.get('X-Telegram-Bot-Api-Secret-Token')
+        if not is_valid_webhook_secret(secret_header):
+            logger.warning(f"Invalid webhook secret token from {request.remote_addr}")
+            return 'Unauthorized', 403
+        
+        ensure_initialized()
+        data = loads(request.get_data())
         
-        # Get the update from the request
-        update = Update.de_json(request.get_json(force=True), application.bot)
+        # Acknowledge redelivered updates without processing them again
+        claim = run_async(claim_update(data))
+        if claim == UPDATE_DONE:
+            return 'OK', 200
+        if claim == UPDATE_IN_PROGRESS:
+            # Still being processed elsewhere: Telegram redelivers it later
+            return 'In progress', 503
         
-        # Process update with fresh event loop
-        async def process():
-            # Use a fresh application instance for each request
-            async with application:
-                await application.process_update(update)
+        # Fast-ack mode: queue the update and let the workers process it
+        if dispatcher is not None:
+            if run_async(dispatcher.submit_async(data)):
+                # Acknowledged, so Telegram will not redeliver it
+                run_async(complete_update(data))
+                return 'OK', 200
+            # Telegram redelivers updates that are not acknowledged with 2xx
+            run_async(forget_update(data))
+            return 'Queue full', 503
         
-        asyncio.run(process())
+        # Process update on the long-lived event loop
+        run_async(process_raw_update(application, data))
+        run_async(complete_update(data))
         
         return 'OK', 200
     except Exception as e:
         logger.error(f"Error processing webhook: {e}", exc_info=True)
+        if isinstance(data, dict):
+            run_async(forget_update(data))
         return 'Error', 500
 
 
@@ -143,13 +154,28 @@ def set_webhook():
             logger.info("Setting webhook with secret token")
         
         # Run async operation
-        asyncio.run(application.bot.set_webhook(**webhook_params))
+        ensure_initialized()
+        run_async(application.bot.set_webhook(**webhook_params))
         return f'Webhook set to {webhook_url}/webhook (secured: {bool(config.WEBHOOK_SECRET)})', 200
     except Exception as e:
         logger.error(f"Error setting webhook: {e}", exc_info=True)
         return f'Error: {e}', 500
 
 
+@app.route('/queue-stats', methods=['GET'])
+def queue_stats():
+    """Report update queue depth, drops and latency, and duplicate update hits."""
+    if not is_valid_stats_secret(request.headers.get('X-Telegram-Bot-Api-Secret-Token')):
+        logger.warning(f"Unauthorized queue stats request from {request.remote_addr}")
+        return 'Unauthorized', 403
+    
+    deduplicator = get_deduplicator()
+    stats = {'dedup': deduplicator.get_stats() if deduplicator else None}
+    if dispatcher is None:
+        return jsonify({'fast_ack': False, **stats}), 200
+    return jsonify({'fast_ack': True, **dispatcher.get_stats(), **stats}), 200
+
+
 # For local testing
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
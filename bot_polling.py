@@ -1,18 +1,14 @@
 """Main bot file - Telegram Message Capture Bot."""
+import asyncio
 import logging
 import os
-from telegram.ext import (
-    Application,
-    CommandHandler,
-    MessageHandler,
-    ChatMemberHandler,
-    filters
-)
+from telegram.ext import Application
 import config
-from database import init_db
-from message_handlers import MessageCapture
-from admin_commands import AdminCommands
-from reinit_interactive import get_reinitialize_handler
+from database import init_db, dispose_engine, is_sqlite, checkpoint_sqlite
+from db_handler import DatabaseHandler
+from async_db_handler import run_in_db_thread, shutdown_db_executor
+from bot_setup import build_application
+from update_processor import ChatOrderedUpdateProcessor
 
 # Create logs directory if it doesn't exist
 if not os.path.exists('logs'):
@@ -29,6 +25,40 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Background task running periodic SQLite WAL checkpoints
+_checkpoint_task = None
+
+
+async def checkpoint_periodically(interval):
+    """Checkpoint the SQLite WAL every `interval` seconds so it does not grow unbounded."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            busy, wal_frames, checkpointed = await run_in_db_thread(checkpoint_sqlite)
+            logger.debug(f"WAL checkpoint: {checkpointed}/{wal_frames} frames (busy={busy})")
+        except Exception as e:
+            logger.warning(f"WAL checkpoint failed: {e}")
+
+
+async def on_startup(application: Application):
+    """Start background maintenance tasks."""
+    global _checkpoint_task
+    # Resume replaying messages spooled by a previous run
+    DatabaseHandler.get_spool()
+    if is_sqlite() and config.SQLITE_CHECKPOINT_INTERVAL > 0:
+        _checkpoint_task = asyncio.create_task(
+            checkpoint_periodically(config.SQLITE_CHECKPOINT_INTERVAL)
+        )
+
+
+async def on_shutdown(application: Application):
+    """Finish pending database work, flush buffered messages and close pooled connections."""
+    if _checkpoint_task is not None:
+        _checkpoint_task.cancel()
+    shutdown_db_executor()
+    DatabaseHandler.flush_message_buffer()
+    dispose_engine()
+
 
 def main():
     """Start the bot."""
@@ -38,64 +68,24 @@ def main():
     
     # Create application
     logger.info("Creating bot application...")
-    application = Application.builder().token(config.BOT_TOKEN).build()
-    
-    # Register command handlers
-    application.add_handler(CommandHandler("start", AdminCommands.start))
-    application.add_handler(CommandHandler("help", AdminCommands.help_command))
-    application.add_handler(CommandHandler("status", AdminCommands.status))
-    application.add_handler(CommandHandler("list_groups", AdminCommands.list_groups))
-    application.add_handler(CommandHandler("list_topics", AdminCommands.list_topics))
-    application.add_handler(CommandHandler("recent", AdminCommands.recent))
-    application.add_handler(CommandHandler("stats", AdminCommands.stats))
-    
-    # Add interactive reinitialize conversation handler
-    application.add_handler(get_reinitialize_handler())
-    
-    # Register chat member handler (for when bot is added to groups)
-    application.add_handler(
-        ChatMemberHandler(
-            MessageCapture.handle_new_chat_member,
-            ChatMemberHandler.MY_CHAT_MEMBER
-        )
-    )
-    
-    # Register message handlers for capturing
-    application.add_handler(
-        MessageHandler(
-            filters.ChatType.GROUPS & ~filters.COMMAND,
-            MessageCapture.handle_message
-        )
-    )
-    
-    # Handle edited messages
-    application.add_handler(
-        MessageHandler(
-            filters.ChatType.GROUPS & filters.UpdateType.EDITED_MESSAGE,
-            MessageCapture.handle_message
-        )
-    )
-    
-    # Handle forum topic creation
-    application.add_handler(
-        MessageHandler(
-            filters.StatusUpdate.FORUM_TOPIC_CREATED,
-            MessageCapture.handle_forum_topic_created
-        )
-    )
-    
-    # Handle forum topic edited
-    application.add_handler(
-        MessageHandler(
-            filters.StatusUpdate.FORUM_TOPIC_EDITED,
-            MessageCapture.handle_forum_topic_edited
-        )
+    application = build_application(
+        Application.builder()
+        .concurrent_updates(ChatOrderedUpdateProcessor(
+            concurrency=config.UPDATE_CONCURRENCY,
+            admin_concurrency=config.ADMIN_CONCURRENCY,
+            max_pending=config.UPDATE_MAX_PENDING
+        ))
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
     )
     
     # Start the bot
     logger.info("Starting bot...")
     logger.info(f"Admin IDs: {config.ADMIN_IDS}")
-    application.run_polling(allowed_updates=["message", "edited_message", "my_chat_member"])
+    # callback_query drives the interactive /reinitialize buttons
+    application.run_polling(
+        allowed_updates=["message", "edited_message", "my_chat_member", "callback_query"]
+    )
 
 
 if __name__ == '__main__':
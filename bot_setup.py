@@ -0,0 +1,158 @@
+"""Shared bot application setup for the polling, Flask and ASGI entry points."""
+import logging
+from telegram import Update
+from telegram.ext import (
+    Application,
+    CommandHandler,
+    MessageHandler,
+    ChatMemberHandler,
+    filters
+)
+import config
+from message_handlers import MessageCapture
+from admin_commands import AdminCommands
+from reinit_interactive import get_reinitialize_handler
+from async_db_handler import run_in_db_thread, with_db_priority
+from update_dedup import get_deduplicator, UPDATE_NEW
+import fast_path
+
+logger = logging.getLogger(__name__)
+
+
+def register_handlers(application: Application):
+    """Register every command, capture and chat member handler."""
+    # Register command handlers (their database calls get priority over captures)
+    application.add_handler(CommandHandler("start", with_db_priority(AdminCommands.start)))
+    application.add_handler(CommandHandler("help", with_db_priority(AdminCommands.help_command)))
+    application.add_handler(CommandHandler("status", with_db_priority(AdminCommands.status)))
+    application.add_handler(CommandHandler("list_groups", with_db_priority(AdminCommands.list_groups)))
+    application.add_handler(CommandHandler("list_topics", with_db_priority(AdminCommands.list_topics)))
+    application.add_handler(CommandHandler("recent", with_db_priority(AdminCommands.recent)))
+    application.add_handler(CommandHandler("stats", with_db_priority(AdminCommands.stats)))
+    application.add_handler(CommandHandler("reinit_status", with_db_priority(AdminCommands.reinit_status)))
+    application.add_handler(CommandHandler("reinit_pause", with_db_priority(AdminCommands.reinit_pause)))
+    application.add_handler(CommandHandler("reinit_cancel", with_db_priority(AdminCommands.reinit_cancel)))
+    application.add_handler(CommandHandler("reinit_resume", with_db_priority(AdminCommands.reinit_resume)))
+
+    # Add interactive reinitialize conversation handler
+    application.add_handler(get_reinitialize_handler())
+
+    # Register chat member handler (for when bot is added to groups; priority like the commands)
+    application.add_handler(
+        ChatMemberHandler(
+            with_db_priority(MessageCapture.handle_new_chat_member),
+            ChatMemberHandler.MY_CHAT_MEMBER
+        )
+    )
+
+    # Register message handlers for capturing
+    application.add_handler(
+        MessageHandler(
+            filters.ChatType.GROUPS & ~filters.COMMAND,
+            MessageCapture.handle_message
+        )
+    )
+
+    # Handle edited messages
+    application.add_handler(
+        MessageHandler(
+            filters.ChatType.GROUPS & filters.UpdateType.EDITED_MESSAGE,
+            MessageCapture.handle_message
+        )
+    )
+
+    # Handle forum topic creation
+    application.add_handler(
+        MessageHandler(
+            filters.StatusUpdate.FORUM_TOPIC_CREATED,
+            MessageCapture.handle_forum_topic_created
+        )
+    )
+
+    # Handle forum topic edited
+    application.add_handler(
+        MessageHandler(
+            filters.StatusUpdate.FORUM_TOPIC_EDITED,
+            MessageCapture.handle_forum_topic_edited
+        )
+    )
+
+
+def build_application(builder=None) -> Application:
+    """
+    Build the bot application with all handlers registered.
+
+    Args:
+        builder: Optional pre-configured ApplicationBuilder (the token is set here)
+    """
+    if builder is None:
+        builder = Application.builder()
+    application = builder.token(config.BOT_TOKEN).build()
+    register_handlers(application)
+    logger.info("Bot handlers registered")
+    return application
+
+
+def is_valid_webhook_secret(secret_header):
+    """Check the X-Telegram-Bot-Api-Secret-Token header against WEBHOOK_SECRET."""
+    if not config.WEBHOOK_SECRET:
+        return True
+    return secret_header == config.WEBHOOK_SECRET
+
+
+def is_valid_stats_secret(secret_header):
+    """Check a stats request's X-Telegram-Bot-Api-Secret-Token header (stats are closed without WEBHOOK_SECRET)."""
+    return bool(config.WEBHOOK_SECRET) and secret_header == config.WEBHOOK_SECRET
+
+
+async def process_raw_update(application: Application, data):
+    """Capture a raw webhook update on the fast path, or parse it and run the handlers."""
+    if config.FAST_PATH_ENABLED and await fast_path.capture(data):
+        return
+    update = Update.de_json(data, application.bot)
+    await application.process_update(update)
+
+
+async def claim_update(data):
+    """
+    Claim a raw update's update_id before processing it.
+    
+    Returns:
+        UPDATE_NEW (process it), UPDATE_IN_PROGRESS (answer with an error so
+        Telegram retries later) or UPDATE_DONE (acknowledge and skip it)
+    """
+    deduplicator = get_deduplicator()
+    update_id = data.get('update_id')
+    if deduplicator is None or update_id is None:
+        return UPDATE_NEW
+    if deduplicator.uses_store:
+        outcome = await run_in_db_thread(deduplicator.claim, update_id)
+    else:
+        outcome = deduplicator.claim(update_id)
+    if outcome != UPDATE_NEW:
+        logger.info(f"Skipping duplicate update {update_id} ({outcome})")
+    return outcome
+
+
+async def complete_update(data):
+    """Mark a raw update as processed, so its redeliveries are skipped."""
+    deduplicator = get_deduplicator()
+    update_id = data.get('update_id')
+    if deduplicator is None or update_id is None:
+        return
+    if deduplicator.uses_store:
+        await run_in_db_thread(deduplicator.complete, update_id)
+    else:
+        deduplicator.complete(update_id)
+
+
+async def forget_update(data):
+    """Forget a raw update that was not processed, so Telegram's redelivery is accepted."""
+    deduplicator = get_deduplicator()
+    update_id = data.get('update_id')
+    if deduplicator is None or update_id is None:
+        return
+    if deduplicator.uses_store:
+        await run_in_db_thread(deduplicator.forget, update_id)
+    else:
+        deduplicator.forget(update_id)
@@ -0,0 +1,84 @@
+"""Report where cold-start time goes for a webhook entry point.
+
+Runs the entry point in fresh interpreters: once with ``python -X importtime``
+to break import time down by top-level package, and once to time the startup
+phases (imports, init_db, build_application) separately.
+
+Usage:
+    python cold_start_report.py              # profile bot.py (Vercel)
+    python cold_start_report.py --module asgi --top 20
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+PHASES_SCRIPT = """
+import json, time
+timings = {}
+started = time.perf_counter()
+import telegram, telegram.ext, sqlalchemy
+timings['third_party_imports'] = time.perf_counter() - started
+mark = time.perf_counter()
+import database, bot_setup
+timings['project_imports'] = time.perf_counter() - mark
+mark = time.perf_counter()
+database.init_db()
+timings['init_db'] = time.perf_counter() - mark
+mark = time.perf_counter()
+bot_setup.build_application()
+timings['build_application'] = time.perf_counter() - mark
+timings['total'] = time.perf_counter() - started
+print(json.dumps(timings))
+"""
+
+
+def run_python(args):
+    """Run a fresh interpreter in the project directory and return the result."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    return subprocess.run(
+        [sys.executable, *args], cwd=here, capture_output=True, text=True, check=True
+    )
+
+
+def import_breakdown(module):
+    """Sum import self-time (ms) per top-level package from -X importtime output."""
+    result = run_python(['-X', 'importtime', '-c', f'import {module}'])
+    per_package = defaultdict(float)
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        per_package[name.strip().split('.')[0]] += int(self_us) / 1000
+    return per_package
+
+
+def phase_timings():
+    """Time the startup phases (in seconds) in a fresh interpreter."""
+    result = run_python(['-c', PHASES_SCRIPT])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--module', default='bot', help='entry point module to import (default: bot)')
+    parser.add_argument('--top', type=int, default=15, help='number of packages to list')
+    args = parser.parse_args()
+
+    print(f'⏱️ Cold start report for {args.module}.py\n')
+
+    per_package = import_breakdown(args.module)
+    total = sum(per_package.values())
+    print(f'📦 Import time by package (total {total:.0f} ms, includes module-level startup code):')
+    for name, ms in sorted(per_package.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f'   {name:<28} {ms:8.1f} ms  {ms / total * 100:5.1f}%')
+
+    print('\n🚀 Startup phases:')
+    for phase, seconds in phase_timings().items():
+        print(f'   {phase:<28} {seconds * 1000:8.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
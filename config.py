@@ -17,16 +17,134 @@ ADMIN_IDS = [int(id.strip()) for id in ADMIN_IDS_STR.split(',') if id.strip()]
 # Database Configuration
 DATABASE_PATH = os.getenv('DATABASE_PATH', 'bot_database.db')
 
+# Connection Pool Configuration (one engine is shared by the whole process)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '30'))  # seconds
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))  # seconds, -1 disables
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+# Threads running database calls for async handlers (at most one connection each)
+DB_EXECUTOR_WORKERS = int(os.getenv('DB_EXECUTOR_WORKERS', str(DB_POOL_SIZE)))
+# Extra threads only admin commands and chat member updates use, so they never
+# queue behind captures, migrations or job updates (connections come from the overflow)
+DB_PRIORITY_WORKERS = int(os.getenv('DB_PRIORITY_WORKERS', '1'))
+
+# SQLite Performance Profile (applied to every new connection when using SQLite)
+SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))  # bytes
+SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', '-65536'))  # negative = KiB
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_TEMP_STORE = os.getenv('SQLITE_TEMP_STORE', 'MEMORY')
+SQLITE_CHECKPOINT_INTERVAL = int(os.getenv('SQLITE_CHECKPOINT_INTERVAL', '300'))  # seconds, 0 disables
+SQLITE_CHECKPOINT_MODE = os.getenv('SQLITE_CHECKPOINT_MODE', 'PASSIVE')
+
+# Message Ingestion
+# "sync" commits every message immediately, "batch" buffers and bulk-inserts them
+INGEST_MODE = os.getenv('INGEST_MODE', 'sync').lower()
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', '200'))  # rows per flush
+INGEST_BATCH_INTERVAL_MS = int(os.getenv('INGEST_BATCH_INTERVAL_MS', '500'))  # max wait
+
+# Backpressure: captures in flight at once (default: one per DB worker
+# thread), minus WRITE_BUDGET_RESERVED slots kept free for database work
+# outside the budget (migrations, job updates, update claims). When captures
+# are backed up, SHED_POLICY
+# ("none", "drop" or "defer") applies to SHED_MESSAGE_TYPES.
+WRITE_BUDGET = int(os.getenv('WRITE_BUDGET', str(DB_EXECUTOR_WORKERS)))
+WRITE_BUDGET_RESERVED = int(os.getenv('WRITE_BUDGET_RESERVED', '1'))
+SHED_POLICY = os.getenv('SHED_POLICY', 'none').lower()
+SHED_MESSAGE_TYPES = [
+    t.strip() for t in os.getenv('SHED_MESSAGE_TYPES', 'new_member,left_member,title_change').split(',')
+    if t.strip()
+]
+SHED_MAX_DEFERRED = int(os.getenv('SHED_MAX_DEFERRED', '1000'))
+
+# Durable spool: messages the database rejects (or takes longer than
+# SPOOL_LATENCY_THRESHOLD_MS on average to write; 0 = failures only) are
+# journaled to SPOOL_DIR and replayed in order once it recovers
+SPOOL_ENABLED = os.getenv('SPOOL_ENABLED', 'false').lower() == 'true'
+SPOOL_DIR = os.getenv('SPOOL_DIR', 'spool')
+SPOOL_SEGMENT_ROWS = int(os.getenv('SPOOL_SEGMENT_ROWS', '10000'))  # rows per segment file
+SPOOL_FSYNC_ROWS = int(os.getenv('SPOOL_FSYNC_ROWS', '100'))  # fsync after this many rows...
+SPOOL_FSYNC_INTERVAL_MS = int(os.getenv('SPOOL_FSYNC_INTERVAL_MS', '200'))  # ...or this long
+SPOOL_REPLAY_BATCH = int(os.getenv('SPOOL_REPLAY_BATCH', '500'))
+SPOOL_REPLAY_INTERVAL_MS = int(os.getenv('SPOOL_REPLAY_INTERVAL_MS', '2000'))
+SPOOL_LATENCY_THRESHOLD_MS = int(os.getenv('SPOOL_LATENCY_THRESHOLD_MS', '0'))
+
+# Max number of groups (and, separately, topics) kept in the metadata cache
+METADATA_CACHE_SIZE = int(os.getenv('METADATA_CACHE_SIZE', '10000'))
+
 # Webhook Configuration (for Vercel)
 WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', None)
 
+# Fast-ack webhook mode: reply 200 immediately and process updates from an
+# in-process queue. Needs a long-running worker (asgi.py or a Flask server),
+# not a serverless function that is frozen once the response is sent.
+WEBHOOK_FAST_ACK = os.getenv('WEBHOOK_FAST_ACK', 'false').lower() == 'true'
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', '8'))
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', '1000'))
+
+# Skip webhook updates whose update_id was already seen (Telegram redelivers
+# updates that time out). "memory" only catches redeliveries to the same
+# worker; "database" shares seen ids between workers via processed_updates.
+UPDATE_DEDUP_ENABLED = os.getenv('UPDATE_DEDUP_ENABLED', 'true').lower() == 'true'
+UPDATE_DEDUP_BACKEND = os.getenv('UPDATE_DEDUP_BACKEND', 'memory').lower()
+UPDATE_DEDUP_WINDOW = int(os.getenv('UPDATE_DEDUP_WINDOW', '3600'))  # seconds
+UPDATE_DEDUP_MAX_SIZE = int(os.getenv('UPDATE_DEDUP_MAX_SIZE', '100000'))
+# An update is only marked done once processed. A redelivery while it is still
+# being processed gets a 503 (Telegram retries later); after LEASE seconds
+# without completion (e.g. a killed request) the redelivery processes it.
+UPDATE_DEDUP_LEASE = int(os.getenv('UPDATE_DEDUP_LEASE', '60'))
+
+# Capture plain group messages straight from the webhook JSON, skipping
+# Update.de_json and the handler chain (see fast_path.py)
+FAST_PATH_ENABLED = os.getenv('FAST_PATH_ENABLED', 'false').lower() == 'true'
+
+# Polling mode: updates processed concurrently (same-chat updates stay in
+# order); admin commands get their own budget so they never wait on capture
+UPDATE_CONCURRENCY = int(os.getenv('UPDATE_CONCURRENCY', '8'))
+ADMIN_CONCURRENCY = int(os.getenv('ADMIN_CONCURRENCY', '2'))
+UPDATE_MAX_PENDING = int(os.getenv('UPDATE_MAX_PENDING', '256'))
+
 # Logging Configuration
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 
 # Rate Limiting Configuration
 MESSAGES_PER_SECOND = 20
 FLOOD_WAIT_TIME = 30  # seconds
+# Outbound Bot API calls share token buckets: one global (Telegram allows about
+# 30 messages per second per bot) and one per chat. A chat starts at
+# RATE_LIMIT_CHAT_PER_SECOND (the old MESSAGES_PER_SECOND) and is slowed down on
+# flood control until it settles at the rate Telegram allows for it (often about
+# 20 messages per minute in a group), but never below
+# RATE_LIMIT_MIN_CHAT_PER_SECOND. Flood control on several chats at once slows
+# down the global bucket too.
+RATE_LIMIT_GLOBAL_PER_SECOND = float(os.getenv('RATE_LIMIT_GLOBAL_PER_SECOND', '30'))
+RATE_LIMIT_CHAT_PER_SECOND = float(os.getenv('RATE_LIMIT_CHAT_PER_SECOND', '20'))
+RATE_LIMIT_MIN_CHAT_PER_SECOND = float(os.getenv('RATE_LIMIT_MIN_CHAT_PER_SECOND', str(2 / 60)))
+RATE_LIMIT_MAX_RETRIES = int(os.getenv('RATE_LIMIT_MAX_RETRIES', '5'))  # per call, after flood control or network errors
 
 # Message Processing
 MAX_MESSAGE_LENGTH = 4096
 PROGRESS_UPDATE_INTERVAL = 100  # messages
+REINIT_PAGE_SIZE = int(os.getenv('REINIT_PAGE_SIZE', '500'))  # messages read per query
+# A job's checkpoint is committed after at most this many messages (and after every
+# copyMessages batch), so an interrupted run resumes without re-sending more than that
+REINIT_CHECKPOINT_INTERVAL = int(os.getenv('REINIT_CHECKPOINT_INTERVAL', '10'))
+# "resend" rebuilds messages from stored content; "copy" copies them from the
+# source group with copyMessages (up to 100 per call; the group must still exist)
+REINIT_MODE = os.getenv('REINIT_MODE', 'resend').lower()
+# Forum migrations: topics sent concurrently, each in its own ordered pipeline
+# (1 = all messages in one sequence). Every pipeline sends to the same target
+# group and so shares its per-chat rate limit: more pipelines only overlap
+# request latency and database reads, they do not raise that limit.
+REINIT_TOPIC_CONCURRENCY = int(os.getenv('REINIT_TOPIC_CONCURRENCY', '1'))
+# Run migrations in job_worker.py instead of inside the command handler. The
+# commands only queue a job; the worker edits the admin's status message.
+REINIT_USE_WORKER = os.getenv('REINIT_USE_WORKER', 'false').lower() == 'true'
+REINIT_MAX_CONCURRENT_JOBS = int(os.getenv('REINIT_MAX_CONCURRENT_JOBS', '2'))  # per worker
+REINIT_WORKER_POLL_INTERVAL = int(os.getenv('REINIT_WORKER_POLL_INTERVAL', '5'))  # seconds
+# A running job refreshes its row every HEARTBEAT seconds; one not updated for
+# STALE_AFTER seconds is treated as abandoned and may be resumed elsewhere
+REINIT_JOB_HEARTBEAT_INTERVAL = int(os.getenv('REINIT_JOB_HEARTBEAT_INTERVAL', '30'))
+REINIT_JOB_STALE_AFTER = int(os.getenv('REINIT_JOB_STALE_AFTER', '120'))
@@ -1,13 +1,32 @@
 """Database models for storing Telegram messages."""
-from sqlalchemy import create_engine, Column, Integer, String, BigInteger, DateTime, Text
+from sqlalchemy import (
+    create_engine, event, inspect, delete, exists, insert, select, func, literal, Column, Integer, String,
+    BigInteger, DateTime, Text, Index, UniqueConstraint
+)
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, aliased
 from datetime import datetime
+import logging
 import os
+import threading
 import config
 
+logger = logging.getLogger(__name__)
+
 Base = declarative_base()
 
+# Bump whenever a model (table, column or index) changes, so init_db()
+# creates the new schema objects on the next start
+SCHEMA_VERSION = 7
+
+# Last schema version that changed how message_counters is keyed; older
+# databases get their counters rebuilt by init_db()
+COUNTERS_VERSION = 7
+
+# Unique index message upserts (ON CONFLICT) rely on
+UNIQUE_MESSAGE_INDEX = 'uq_captured_messages_group_message'
+
 # Get database URL from environment or use SQLite as fallback
 DATABASE_URL = os.getenv('DATABASE_URL', f'sqlite:///{config.DATABASE_PATH}')
 
@@ -56,21 +75,323 @@ class CapturedMessage(Base):
     text_content = Column(Text)
     caption = Column(Text)
     file_id = Column(String(255))  # For media files
+    media_group_id = Column(String(64), nullable=True)  # Shared by the items of an album
     timestamp = Column(DateTime, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # One row per Telegram message; edits update it in place
+        Index(UNIQUE_MESSAGE_INDEX, 'group_id', 'message_id', unique=True),
+        # Per-topic counts and per-topic history in timestamp order
+        Index('ix_captured_messages_group_topic_timestamp', 'group_id', 'topic_id', 'timestamp'),
+        # Whole-group history in (timestamp, id) order
+        Index('ix_captured_messages_group_timestamp', 'group_id', 'timestamp', 'id'),
+        # Most recent messages across all groups
+        Index('ix_captured_messages_timestamp', 'timestamp'),
+    )
+
+
+class MessageCounter(Base):
+    """Model for incrementally maintained message counts.
+    
+    One row per (scope, group_id, topic_id, message_type) key, where scope is
+    'group', 'topic' or 'type' (per group and message type). Key columns that
+    do not apply to a scope hold 0 / '' so the unique constraint can be used
+    for upserts. Totals are summed from the per-group rows, so concurrent
+    writers to different groups never update the same row.
+    """
+    __tablename__ = 'message_counters'
+    
+    id = Column(Integer, primary_key=True)
+    scope = Column(String(16), nullable=False)
+    group_id = Column(BigInteger, nullable=False, default=0)
+    topic_id = Column(Integer, nullable=False, default=0)
+    message_type = Column(String(50), nullable=False, default='')
+    count = Column(BigInteger, nullable=False, default=0)
+    
+    __table_args__ = (
+        UniqueConstraint('scope', 'group_id', 'topic_id', 'message_type', name='uq_message_counters_key'),
+    )
+
+
+class ProcessedUpdate(Base):
+    """Model for webhook update_ids claimed by a request (shared dedup set)."""
+    __tablename__ = 'processed_updates'
+    
+    update_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    # When the update was (last) claimed; an unprocessed claim expires after the lease
+    received_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    processed_at = Column(DateTime)  # set once the update was processed
+
+
+class MigrationJob(Base):
+    """Model for a reinitialize job, with the checkpoint it resumes from."""
+    __tablename__ = 'migration_jobs'
+    
+    id = Column(Integer, primary_key=True)
+    source_group_id = Column(BigInteger, nullable=False)
+    target_group_id = Column(BigInteger, nullable=False)
+    mode = Column(String(16), nullable=False, default='resend')
+    # pending, running, paused, completed, failed or cancelled
+    status = Column(String(16), nullable=False, default='running')
+    topic_mapping = Column(Text)  # JSON object: source topic ID -> target message_thread_id
+    total_messages = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)  # messages handled up to the checkpoint
+    sent = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    api_calls = Column(Integer, nullable=False, default=0)
+    # (timestamp, id) of the last captured message handled; a resumed job reads after it
+    checkpoint_timestamp = Column(DateTime)
+    checkpoint_id = Column(Integer)
+    # Parallel topic pipelines checkpoint separately: JSON object of
+    # pipeline key -> [ISO timestamp, id]
+    topic_checkpoints = Column(Text)
+    error = Column(Text)
+    created_by = Column(BigInteger)
+    # 'pause' or 'cancel' requested by an admin, acted on by the running job
+    control = Column(String(16))
+    worker_id = Column(String(64))  # worker process that claimed the job
+    # Admin message the runner keeps editing with progress
+    status_chat_id = Column(BigInteger)
+    status_message_id = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Doubles as the runner's heartbeat: a running job not updated for a while was abandoned
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime)
+    
+    __table_args__ = (
+        # Finding the unfinished job for a source/target pair
+        Index('ix_migration_jobs_source_target_status', 'source_group_id', 'target_group_id', 'status'),
+    )
+
+
+class SchemaVersion(Base):
+    """Model for the single-row marker of the schema version init_db() last applied."""
+    __tablename__ = 'schema_version'
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
+
+# Process-wide engine and session factory (created lazily on first use)
+_engine = None
+_session_factory = None
+_engine_lock = threading.Lock()
+
+
+def is_sqlite():
+    """Check whether the configured database is SQLite."""
+    return DATABASE_URL.startswith('sqlite')
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply the SQLite performance profile to a new connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size={config.SQLITE_CACHE_SIZE}")
+        cursor.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA temp_store={config.SQLITE_TEMP_STORE}")
+    finally:
+        cursor.close()
+
+
+def _engine_options():
+    """Build create_engine() keyword arguments from the pool configuration."""
+    options = {
+        'echo': False,
+        'pool_pre_ping': config.DB_POOL_PRE_PING,
+        'pool_recycle': config.DB_POOL_RECYCLE,
+    }
+    # In-memory SQLite uses a single shared connection, so sizing does not apply
+    if not is_sqlite() or ':memory:' not in DATABASE_URL:
+        options.update({
+            'pool_size': config.DB_POOL_SIZE,
+            'max_overflow': config.DB_MAX_OVERFLOW,
+            'pool_timeout': config.DB_POOL_TIMEOUT,
+        })
+    return options
+
+
+def get_engine():
+    """Get the shared engine, creating it (and its connection pool) once per process."""
+    global _engine, _session_factory
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = create_engine(DATABASE_URL, **_engine_options())
+                if is_sqlite():
+                    event.listen(engine, 'connect', _apply_sqlite_pragmas)
+                _session_factory = sessionmaker(bind=engine)
+                _engine = engine
+    return _engine
+
+
+def dispose_engine():
+    """Close all pooled connections (call on shutdown or after forking a worker)."""
+    global _engine, _session_factory
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+        _engine = None
+        _session_factory = None
+
+
+def get_pool_stats():
+    """Get connection pool statistics for the shared engine."""
+    pool = get_engine().pool
+    stats = {'pool_class': type(pool).__name__, 'status': pool.status()}
+    # QueuePool exposes counters; other pool classes only report a status string
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        counter = getattr(pool, name, None)
+        if callable(counter):
+            stats[name] = counter()
+    return stats
+
+
+def checkpoint_sqlite(mode=None):
+    """
+    Run a WAL checkpoint on SQLite, copying the write-ahead log into the database.
+    
+    Returns:
+        (busy, wal_frames, checkpointed_frames) as reported by SQLite
+    """
+    mode = mode or config.SQLITE_CHECKPOINT_MODE
+    with get_engine().connect() as conn:
+        return tuple(conn.exec_driver_sql(f"PRAGMA wal_checkpoint({mode})").first())
+
+
+def get_schema_version(conn):
+    """Get the schema version recorded in the database, or None if there is none."""
+    try:
+        return conn.exec_driver_sql(
+            f"SELECT version FROM {SchemaVersion.__tablename__} WHERE id = 1"
+        ).scalar()
+    except SQLAlchemyError:
+        # Table missing (new or pre-versioning database)
+        conn.rollback()
+        return None
+
+
+def add_missing_columns(engine):
+    """
+    Add columns that models gained after their table was created.
+    
+    create_all() only creates missing tables, so new columns on existing
+    tables are added here with ALTER TABLE. Such columns must be nullable
+    (Python-side defaults do not apply to existing rows).
+    
+    Returns:
+        List of "table.column" names that were added
+    """
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def delete_duplicate_messages(conn):
+    """Delete every captured message that has a newer row (higher id) for the same Telegram message."""
+    newer = aliased(CapturedMessage)
+    stmt = delete(CapturedMessage).where(exists().where(
+        newer.group_id == CapturedMessage.group_id,
+        newer.message_id == CapturedMessage.message_id,
+        newer.id > CapturedMessage.id
+    ))
+    return conn.execute(stmt).rowcount
+
+
+def has_unique_message_index(engine):
+    """Check whether captured_messages has the (group_id, message_id) unique index."""
+    indexes = inspect(engine).get_indexes(CapturedMessage.__tablename__)
+    return UNIQUE_MESSAGE_INDEX in {ix['name'] for ix in indexes}
+
+
+def rebuild_message_counters(conn):
+    """
+    Recompute all message counters from captured_messages inside the caller's transaction.
+    
+    Returns:
+        Number of counter rows written
+    """
+    m = CapturedMessage
+    count = func.count(m.id)
+    sources = [
+        select(literal('group'), m.group_id, literal(0), literal(''), count)
+            .group_by(m.group_id),
+        select(literal('topic'), m.group_id, m.topic_id, literal(''), count)
+            .where(m.topic_id.isnot(None))
+            .group_by(m.group_id, m.topic_id),
+        select(literal('type'), m.group_id, literal(0), m.message_type, count)
+            .group_by(m.group_id, m.message_type),
+    ]
+    conn.execute(delete(MessageCounter))
+    for source in sources:
+        conn.execute(insert(MessageCounter).from_select(
+            ['scope', 'group_id', 'topic_id', 'message_type', 'count'], source
+        ))
+    return conn.execute(select(func.count(MessageCounter.id))).scalar()
 
 
 # Database initialization
 def init_db():
-    """Initialize the database - creates tables automatically."""
-    engine = create_engine(DATABASE_URL, echo=False)
+    """
+    Initialize the database - creates tables automatically.
+    
+    When the recorded schema version is current this is a single query;
+    otherwise every table is inspected, missing tables are created and
+    missing columns are added, and the message counters are seeded when
+    they are missing or out of date.
+    
+    Raises:
+        RuntimeError: captured_messages exists without the unique message
+            index; deleting duplicates and building it on a large table takes
+            too long for startup, so dedup_messages.py has to be run first
+    """
+    engine = get_engine()
+    with engine.connect() as conn:
+        stored_version = get_schema_version(conn)
+        if stored_version == SCHEMA_VERSION:
+            return engine
+    
+    # create_all() skips indexes of existing tables; upserts cannot work without this one
+    has_messages = inspect(engine).has_table(CapturedMessage.__tablename__)
+    if has_messages and not has_unique_message_index(engine):
+        raise RuntimeError(
+            f"captured_messages has no {UNIQUE_MESSAGE_INDEX} index: "
+            f"run python dedup_messages.py to remove duplicate rows and create it"
+        )
+    # Also for unversioned databases (created before schema_version existed);
+    # a no-op on tables create_all() is about to create
+    add_missing_columns(engine)
+    # Older databases have no or old-style counters
+    rebuild_counters = has_messages and (stored_version is None or stored_version < COUNTERS_VERSION)
     # This line creates ALL tables defined in models above
     Base.metadata.create_all(engine)
+    if rebuild_counters:
+        with engine.begin() as conn:
+            rows = rebuild_message_counters(conn)
+        logger.info(f"Rebuilt message counters ({rows} rows)")
+    with get_session() as session:
+        session.merge(SchemaVersion(id=1, version=SCHEMA_VERSION, applied_at=datetime.utcnow()))
+        session.commit()
     return engine
 
 
 def get_session():
-    """Get a database session."""
-    engine = create_engine(DATABASE_URL, echo=False)
-    Session = sessionmaker(bind=engine)
-    return Session()
+    """Get a database session from the shared session factory."""
+    get_engine()
+    return _session_factory()
@@ -1,128 +1,573 @@
 """Database operations for the Telegram bot."""
+import functools
 import logging
-from datetime import datetime
-from sqlalchemy import func
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, literal, or_, and_
 from database import (
-    get_session, TelegramGroup, ForumTopic, CapturedMessage
+    get_engine, get_session, rebuild_message_counters, TelegramGroup, ForumTopic, CapturedMessage, MessageCounter,
+    ProcessedUpdate, MigrationJob
 )
+from message_buffer import MessageBuffer
+from spool import MessageSpool
+from metadata_cache import MISSING, group_cache, topic_cache
+from update_dedup import UPDATE_NEW, UPDATE_IN_PROGRESS, UPDATE_DONE
+import config
 
 logger = logging.getLogger(__name__)
 
+# Write-behind buffer used when INGEST_MODE is "batch" (created on first use)
+_message_buffer = None
+
+# On-disk spool for rows the database cannot take (created on first use, if enabled)
+_message_spool = None
+_spool_lock = threading.Lock()
+
+# Guards group/topic inserts (only reached on cache misses, so rarely contended)
+_metadata_lock = threading.Lock()
+
+# processed_updates rows older than the dedup window are pruned every N inserts
+PRUNE_UPDATES_EVERY = 1000
+_updates_marked = 0
+_updates_marked_lock = threading.Lock()
+
+# Migration jobs in these states can still be run (or resumed) to completion
+UNFINISHED_JOB_STATUSES = ('pending', 'running', 'paused', 'failed')
+
+# Admin actions on jobs that are not running: action -> {current status: new status}.
+# A running job is paused or cancelled through its control column instead.
+JOB_ACTIONS = {
+    'pause': {'pending': 'paused'},
+    'cancel': {'pending': 'cancelled', 'paused': 'cancelled', 'failed': 'cancelled'},
+    'resume': {'paused': 'pending', 'failed': 'pending'},
+}
+
+COUNTER_KEY = ['scope', 'group_id', 'topic_id', 'message_type']
+
+# Columns an edited message overwrites on the stored row
+UPSERT_COLUMNS = {
+    'group_name', 'topic_id', 'topic_name', 'sender_id', 'sender_username',
+    'sender_first_name', 'sender_last_name', 'message_type', 'text_content',
+    'caption', 'file_id', 'media_group_id',
+}
+
+# Columns needed to re-send a captured message (streamed as lightweight rows)
+MESSAGE_ROW_COLUMNS = (
+    CapturedMessage.id,
+    CapturedMessage.message_id,
+    CapturedMessage.topic_id,
+    CapturedMessage.message_type,
+    CapturedMessage.text_content,
+    CapturedMessage.caption,
+    CapturedMessage.file_id,
+    CapturedMessage.media_group_id,
+    CapturedMessage.timestamp,
+)
+
+
+def _upsert_insert(session):
+    """Get the INSERT construct with ON CONFLICT support for the session's dialect."""
+    # Imported here so only the dialect in use is loaded (keeps cold starts short)
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+        return postgresql_insert
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert
+    return None
+
+
+def _counter_keys(message_data):
+    """Get the counter keys a captured message contributes to."""
+    group_id = message_data['group_id']
+    topic_id = message_data.get('topic_id')
+    # No bot-wide row: every writer would queue on its lock (totals are summed from 'group')
+    keys = [
+        ('group', group_id, 0, ''),
+        ('type', group_id, 0, message_data['message_type']),
+    ]
+    if topic_id is not None:
+        keys.append(('topic', group_id, topic_id, ''))
+    return keys
+
 
 class DatabaseHandler:
     """Handle all database operations."""
     
     @staticmethod
     def add_or_update_group(group_id, group_name):
-        """Add or update a group in the database."""
+        """Add or update a group in the database (skipped if the cached name matches)."""
+        if group_cache.get(group_id) == group_name:
+            return
+        # Serialize metadata writes so concurrent handlers never insert the same row twice
+        with _metadata_lock:
+            if group_cache.get(group_id) == group_name:
+                return
+            session = get_session()
+            try:
+                group = session.query(TelegramGroup).filter_by(group_id=group_id).first()
+                if group:
+                    group.group_name = group_name
+                    group.updated_at = datetime.utcnow()
+                    logger.info(f"Updated group: {group_name} ({group_id})")
+                else:
+                    group = TelegramGroup(group_id=group_id, group_name=group_name)
+                    session.add(group)
+                    logger.info(f"Added group: {group_name} ({group_id})")
+                session.commit()
+                group_cache.put(group_id, group_name)
+            except Exception as e:
+                logger.error(f"Error adding/updating group {group_id}: {e}")
+                session.rollback()
+                # Try to recover by updating existing record
+                try:
+                    existing = session.query(TelegramGroup).filter_by(group_id=group_id).first()
+                    if existing:
+                        existing.group_name = group_name
+                        existing.updated_at = datetime.utcnow()
+                        session.commit()
+                        group_cache.put(group_id, group_name)
+                        logger.info(f"Recovered: Updated existing group {group_id}")
+                except Exception as e2:
+                    logger.error(f"Recovery failed for group {group_id}: {e2}")
+                    session.rollback()
+            finally:
+                session.close()
+    
+    @staticmethod
+    def add_forum_topic(group_id, topic_id, topic_name):
+        """Add a forum topic to the database (skipped if the cached name matches)."""
+        if topic_cache.get((group_id, topic_id)) == topic_name:
+            return
+        # Serialize metadata writes so concurrent handlers never insert the same row twice
+        with _metadata_lock:
+            if topic_cache.get((group_id, topic_id)) == topic_name:
+                return
+            session = get_session()
+            try:
+                existing = session.query(ForumTopic).filter_by(
+                    group_id=group_id, topic_id=topic_id
+                ).first()
+                if existing:
+                    # Update topic name if it changed
+                    if existing.topic_name != topic_name:
+                        existing.topic_name = topic_name
+                        session.commit()
+                        logger.info(f"Updated topic name: {topic_name} ({topic_id}) in group {group_id}")
+                else:
+                    topic = ForumTopic(
+                        group_id=group_id,
+                        topic_id=topic_id,
+                        topic_name=topic_name
+                    )
+                    session.add(topic)
+                    session.commit()
+                    logger.info(f"Added topic: {topic_name} ({topic_id}) in group {group_id}")
+                topic_cache.put((group_id, topic_id), topic_name)
+            except Exception as e:
+                logger.error(f"Error adding forum topic: {e}")
+                session.rollback()
+            finally:
+                session.close()
+    
+    @staticmethod
+    def get_topic_name(group_id, topic_id):
+        """Get topic name from the cache, falling back to the database."""
+        cached = topic_cache.get((group_id, topic_id))
+        if cached is not MISSING:
+            return cached
         session = get_session()
         try:
-            group = session.query(TelegramGroup).filter_by(group_id=group_id).first()
-            if group:
-                group.group_name = group_name
-                group.updated_at = datetime.utcnow()
-                logger.info(f"Updated group: {group_name} ({group_id})")
-            else:
-                group = TelegramGroup(group_id=group_id, group_name=group_name)
-                session.add(group)
-                logger.info(f"Added group: {group_name} ({group_id})")
+            topic = session.query(ForumTopic).filter_by(
+                group_id=group_id, topic_id=topic_id
+            ).first()
+            if topic:
+                topic_cache.put((group_id, topic_id), topic.topic_name)
+            return topic.topic_name if topic else None
+        finally:
+            session.close()
+    
+    @staticmethod
+    def invalidate_group(group_id):
+        """Forget the cached name of a group so the next update is written."""
+        group_cache.invalidate(group_id)
+    
+    @staticmethod
+    def invalidate_topic(group_id, topic_id):
+        """Forget the cached name of a topic so the next update is written."""
+        topic_cache.invalidate((group_id, topic_id))
+    
+    @staticmethod
+    def save_message(message_data):
+        """Save a captured message (buffered in batch mode, immediately otherwise)."""
+        if config.INGEST_MODE == 'batch':
+            DatabaseHandler.get_message_buffer().add(message_data)
+            return
+        DatabaseHandler.save_message_now(message_data)
+    
+    @staticmethod
+    def save_message_now(message_data):
+        """Save a captured message with its own commit (spooled if the database fails or lags)."""
+        spool = DatabaseHandler.get_spool()
+        if spool is not None and spool.should_divert():
+            spool.append([message_data])
+            return
+        
+        session = get_session()
+        started = time.perf_counter()
+        try:
+            DatabaseHandler._upsert_messages(session, [message_data])
             session.commit()
+            logger.debug(f"Saved message {message_data['message_id']} from group {message_data['group_id']}")
+            if spool is not None:
+                spool.record_latency((time.perf_counter() - started) * 1000)
         except Exception as e:
-            logger.error(f"Error adding/updating group {group_id}: {e}")
+            logger.error(f"Error saving message: {e}")
             session.rollback()
-            # Try to recover by updating existing record
-            try:
-                existing = session.query(TelegramGroup).filter_by(group_id=group_id).first()
-                if existing:
-                    existing.group_name = group_name
-                    existing.updated_at = datetime.utcnow()
-                    session.commit()
-                    logger.info(f"Recovered: Updated existing group {group_id}")
-            except Exception as e2:
-                logger.error(f"Recovery failed for group {group_id}: {e2}")
-                session.rollback()
+            if spool is not None:
+                spool.append([message_data])
+                logger.warning(f"Spooled message {message_data['message_id']} for replay")
         finally:
             session.close()
     
     @staticmethod
-    def add_forum_topic(group_id, topic_id, topic_name):
-        """Add a forum topic to the database."""
+    def save_messages_bulk(rows, raise_errors=False):
+        """
+        Upsert a batch of captured messages in one statement and one commit.
+        
+        Returns False on failure, or raises the error if raise_errors is set.
+        """
         session = get_session()
         try:
-            existing = session.query(ForumTopic).filter_by(
-                group_id=group_id, topic_id=topic_id
-            ).first()
-            if existing:
-                # Update topic name if it changed
-                if existing.topic_name != topic_name:
-                    existing.topic_name = topic_name
-                    session.commit()
-                    logger.info(f"Updated topic name: {topic_name} ({topic_id}) in group {group_id}")
-            else:
-                topic = ForumTopic(
-                    group_id=group_id,
-                    topic_id=topic_id,
-                    topic_name=topic_name
+            DatabaseHandler._upsert_messages(session, rows)
+            session.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error saving batch of {len(rows)} messages: {e}")
+            session.rollback()
+            if raise_errors:
+                raise
+            return False
+        finally:
+            session.close()
+    
+    @staticmethod
+    def _write_batch(rows):
+        """Write a buffered batch to the database, or to the spool if it fails or lags."""
+        spool = DatabaseHandler.get_spool()
+        if spool is None:
+            return DatabaseHandler.save_messages_bulk(rows)
+        if spool.should_divert():
+            spool.append(rows)
+            return True
+        
+        started = time.perf_counter()
+        if DatabaseHandler.save_messages_bulk(rows):
+            spool.record_latency((time.perf_counter() - started) * 1000)
+        else:
+            spool.append(rows)
+            logger.warning(f"Spooled batch of {len(rows)} messages for replay")
+        return True
+    
+    @staticmethod
+    def _upsert_messages(session, rows):
+        """
+        Insert captured messages, updating rows that already exist for the same
+        (group_id, message_id) so edits replace the stored content in place.
+        
+        Counters follow what the statements did: rows the insert actually
+        added are counted, and an edit that moves a message to another topic
+        or type moves its counts. Rows that conflict are locked (on
+        PostgreSQL) before their old topic and type are read, so concurrent
+        writers of the same message never count it twice.
+        """
+        # An edit can arrive in the same batch as the original; keep the latest
+        latest = {}
+        for row in rows:
+            latest[(row['group_id'], row['message_id'])] = row
+        # One statement needs the same keys in every row (e.g. rows spooled by an older version)
+        columns = list(dict.fromkeys(column for row in latest.values() for column in row))
+        latest = {key: {column: row.get(column) for column in columns} for key, row in latest.items()}
+        
+        upsert = _upsert_insert(session)
+        if upsert is None:
+            # Generic fallback: not atomic with concurrent writers (run rebuild_counters.py if they drift)
+            stored = DatabaseHandler._stored_messages(session, latest.keys())
+            for key, row in latest.items():
+                if key in stored:
+                    session.query(CapturedMessage).filter_by(
+                        group_id=key[0], message_id=key[1]
+                    ).update({c: v for c, v in row.items() if c in UPSERT_COLUMNS})
+            new_rows = [row for key, row in latest.items() if key not in stored]
+            if new_rows:
+                session.execute(insert(CapturedMessage), new_rows)
+        else:
+            # Insert what is new; the database decides, so a row inserted concurrently conflicts here
+            stmt = upsert(CapturedMessage).on_conflict_do_nothing(
+                index_elements=['group_id', 'message_id']
+            ).returning(CapturedMessage.group_id, CapturedMessage.message_id)
+            inserted = {tuple(key) for key in session.execute(stmt, list(latest.values()))}
+            edits = {key: row for key, row in latest.items() if key not in inserted}
+            stored = DatabaseHandler._stored_messages(session, edits.keys(), lock=True) if edits else {}
+            if edits:
+                stmt = upsert(CapturedMessage)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=['group_id', 'message_id'],
+                    set_={
+                        column: stmt.excluded[column]
+                        for column in columns if column in UPSERT_COLUMNS
+                    }
                 )
-                session.add(topic)
-                session.commit()
-                logger.info(f"Added topic: {topic_name} ({topic_id}) in group {group_id}")
+                session.execute(stmt, list(edits.values()))
+        
+        deltas = Counter()
+        for key, row in latest.items():
+            old = stored.get(key)
+            if old is None:
+                # Not stored before (or deleted since the insert above): a new message
+                deltas.update(_counter_keys(row))
+                continue
+            new = {
+                'group_id': key[0],
+                'topic_id': row['topic_id'] if 'topic_id' in columns else old.topic_id,
+                'message_type': row['message_type'] if 'message_type' in columns else old.message_type,
+            }
+            if (new['topic_id'], new['message_type']) != (old.topic_id, old.message_type):
+                deltas.subtract(_counter_keys({'group_id': key[0], 'topic_id': old.topic_id,
+                                               'message_type': old.message_type}))
+                deltas.update(_counter_keys(new))
+        DatabaseHandler._bump_counters(session, deltas)
+    
+    @staticmethod
+    def _stored_messages(session, keys, lock=False):
+        """
+        Get the stored topic and type of the (group_id, message_id) keys that exist.
+        
+        With lock set, the rows are locked (SELECT ... FOR UPDATE on PostgreSQL)
+        until the transaction ends.
+        """
+        by_group = {}
+        for group_id, message_id in keys:
+            by_group.setdefault(group_id, []).append(message_id)
+        conditions = [
+            and_(CapturedMessage.group_id == group_id, CapturedMessage.message_id.in_(message_ids))
+            for group_id, message_ids in by_group.items()
+        ]
+        if not conditions:
+            return {}
+        query = session.query(
+            CapturedMessage.group_id, CapturedMessage.message_id,
+            CapturedMessage.topic_id, CapturedMessage.message_type
+        ).filter(or_(*conditions))
+        if lock:
+            query = query.with_for_update()
+        return {(row.group_id, row.message_id): row for row in query.all()}
+    
+    @staticmethod
+    def _bump_counters(session, deltas):
+        """Apply counter deltas (a Counter of counter keys) inside the caller's transaction."""
+        # Sorted so concurrent writers lock counter rows in the same order
+        values = [
+            dict(zip(COUNTER_KEY, key), count=delta)
+            for key, delta in sorted(deltas.items())
+            if delta
+        ]
+        if not values:
+            return
+        
+        upsert = _upsert_insert(session)
+        if upsert is not None:
+            stmt = upsert(MessageCounter).values(values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=COUNTER_KEY,
+                set_={'count': MessageCounter.count + stmt.excluded.count}
+            )
+            session.execute(stmt)
+            return
+        
+        # Generic fallback: update existing counters, insert missing ones
+        for value in values:
+            updated = session.query(MessageCounter).filter_by(
+                **{column: value[column] for column in COUNTER_KEY}
+            ).update({MessageCounter.count: MessageCounter.count + value['count']})
+            if not updated:
+                session.add(MessageCounter(**value))
+    
+    @staticmethod
+    def rebuild_counters():
+        """Recompute all message counters from captured_messages in one transaction."""
+        with get_engine().begin() as conn:
+            return rebuild_message_counters(conn)
+    
+    @staticmethod
+    def get_message_buffer():
+        """Get the process-wide write-behind buffer for captured messages."""
+        global _message_buffer
+        if _message_buffer is None:
+            _message_buffer = MessageBuffer(
+                DatabaseHandler._write_batch,
+                max_rows=config.INGEST_BATCH_SIZE,
+                max_delay_ms=config.INGEST_BATCH_INTERVAL_MS
+            )
+        return _message_buffer
+    
+    @staticmethod
+    def get_spool():
+        """Get the process-wide message spool, or None when SPOOL_ENABLED is off.
+        
+        Creating it resumes replaying any backlog left by a previous run.
+        """
+        global _message_spool
+        if not config.SPOOL_ENABLED:
+            return None
+        if _message_spool is None:
+            with _spool_lock:
+                if _message_spool is None:
+                    _message_spool = MessageSpool(
+                        config.SPOOL_DIR,
+                        # Raising lets the spool tell rejected rows from an unavailable database
+                        functools.partial(DatabaseHandler.save_messages_bulk, raise_errors=True),
+                        segment_rows=config.SPOOL_SEGMENT_ROWS,
+                        fsync_rows=config.SPOOL_FSYNC_ROWS,
+                        fsync_interval_ms=config.SPOOL_FSYNC_INTERVAL_MS,
+                        replay_batch=config.SPOOL_REPLAY_BATCH,
+                        replay_interval_ms=config.SPOOL_REPLAY_INTERVAL_MS,
+                        latency_threshold_ms=config.SPOOL_LATENCY_THRESHOLD_MS
+                    )
+        return _message_spool
+    
+    @staticmethod
+    def flush_message_buffer():
+        """Flush buffered messages, stop the buffer and close the spool (call on shutdown)."""
+        if _message_buffer is not None:
+            _message_buffer.stop()
+        if _message_spool is not None:
+            _message_spool.stop()
+    
+    @staticmethod
+    def claim_update(update_id, lease_seconds):
+        """
+        Claim a webhook update_id in the shared dedup table.
+        
+        A claim that was not completed within lease_seconds (its request was
+        killed mid-update) is taken over, so a redelivery is processed.
+        
+        Returns:
+            UPDATE_NEW, UPDATE_IN_PROGRESS or UPDATE_DONE
+        """
+        global _updates_marked
+        session = get_session()
+        try:
+            now = datetime.utcnow()
+            dialect_insert = _upsert_insert(session)
+            if dialect_insert is not None:
+                stmt = dialect_insert(ProcessedUpdate).values(
+                    update_id=update_id, received_at=now
+                ).on_conflict_do_nothing(index_elements=['update_id'])
+                inserted = session.execute(stmt).rowcount == 1
+            elif session.get(ProcessedUpdate, update_id) is None:
+                session.add(ProcessedUpdate(update_id=update_id, received_at=now))
+                inserted = True
+            else:
+                inserted = False
+            
+            outcome = UPDATE_NEW
+            if not inserted:
+                taken_over = session.query(ProcessedUpdate).filter(
+                    ProcessedUpdate.update_id == update_id,
+                    ProcessedUpdate.processed_at.is_(None),
+                    ProcessedUpdate.received_at < now - timedelta(seconds=lease_seconds)
+                ).update({ProcessedUpdate.received_at: now}, synchronize_session=False)
+                if not taken_over:
+                    processed_at = session.query(ProcessedUpdate.processed_at).filter_by(
+                        update_id=update_id
+                    ).scalar()
+                    outcome = UPDATE_DONE if processed_at is not None else UPDATE_IN_PROGRESS
+            
+            with _updates_marked_lock:
+                _updates_marked += 1
+                prune = _updates_marked % PRUNE_UPDATES_EVERY == 0
+            if prune:
+                cutoff = now - timedelta(seconds=config.UPDATE_DEDUP_WINDOW)
+                session.query(ProcessedUpdate).filter(
+                    ProcessedUpdate.received_at < cutoff
+                ).delete(synchronize_session=False)
+            session.commit()
+            return outcome
         except Exception as e:
-            logger.error(f"Error adding forum topic: {e}")
+            # Fail open: processing an update twice beats dropping it
+            logger.error(f"Error recording update {update_id}: {e}")
             session.rollback()
+            return UPDATE_NEW
         finally:
             session.close()
     
     @staticmethod
-    def get_topic_name(group_id, topic_id):
-        """Get topic name from database."""
+    def complete_update(update_id):
+        """Mark a claimed update_id as processed in the shared dedup table."""
         session = get_session()
         try:
-            topic = session.query(ForumTopic).filter_by(
-                group_id=group_id, topic_id=topic_id
-            ).first()
-            return topic.topic_name if topic else None
+            session.query(ProcessedUpdate).filter_by(update_id=update_id).update(
+                {ProcessedUpdate.processed_at: datetime.utcnow()}
+            )
+            session.commit()
+        except Exception as e:
+            logger.error(f"Error completing update {update_id}: {e}")
+            session.rollback()
         finally:
             session.close()
     
     @staticmethod
-    def save_message(message_data):
-        """Save a captured message to the database."""
+    def forget_update(update_id):
+        """Remove an update_id from the shared dedup table so a redelivery is processed."""
         session = get_session()
         try:
-            message = CapturedMessage(**message_data)
-            session.add(message)
+            session.query(ProcessedUpdate).filter_by(update_id=update_id).delete()
             session.commit()
-            logger.debug(f"Saved message {message_data['message_id']} from group {message_data['group_id']}")
         except Exception as e:
-            logger.error(f"Error saving message: {e}")
+            logger.error(f"Error forgetting update {update_id}: {e}")
             session.rollback()
         finally:
             session.close()
     
     @staticmethod
     def get_all_groups():
-        """Get all monitored groups with message counts."""
+        """Get all monitored groups with message and topic counts in one query."""
         session = get_session()
         try:
-            groups = session.query(TelegramGroup).all()
-            result = []
-            for group in groups:
-                message_count = session.query(CapturedMessage).filter_by(
-                    group_id=group.group_id
-                ).count()
-                topic_count = session.query(ForumTopic).filter_by(
-                    group_id=group.group_id
-                ).count()
-                if topic_count == 0:
-                    topic_count = 1  # Default topic
-                result.append({
-                    'group_id': group.group_id,
-                    'group_name': group.group_name,
+            # Message counts come from the per-group counters, not a scan of captured_messages
+            message_counts = session.query(
+                MessageCounter.group_id,
+                MessageCounter.count.label('message_count')
+            ).filter(MessageCounter.scope == 'group').subquery()
+            topic_counts = session.query(
+                ForumTopic.group_id,
+                func.count(ForumTopic.id).label('topic_count')
+            ).group_by(ForumTopic.group_id).subquery()
+            
+            rows = session.query(
+                TelegramGroup.group_id,
+                TelegramGroup.group_name,
+                func.coalesce(message_counts.c.message_count, 0),
+                func.coalesce(topic_counts.c.topic_count, 0)
+            ).outerjoin(
+                message_counts, message_counts.c.group_id == TelegramGroup.group_id
+            ).outerjoin(
+                topic_counts, topic_counts.c.group_id == TelegramGroup.group_id
+            ).order_by(TelegramGroup.id).all()
+            
+            return [
+                {
+                    'group_id': group_id,
+                    'group_name': group_name,
                     'message_count': message_count,
-                    'topic_count': topic_count
-                })
-            return result
+                    'topic_count': topic_count or 1  # Default topic
+                }
+                for group_id, group_name, message_count, topic_count in rows
+            ]
         finally:
             session.close()
     
@@ -133,7 +578,7 @@ class DatabaseHandler:
         try:
             group_count = session.query(TelegramGroup).count()
             topic_count = session.query(ForumTopic).count()
-            message_count = session.query(CapturedMessage).count()
+            message_count = DatabaseHandler._total_messages(session)
             return {
                 'groups': group_count,
                 'topics': topic_count if topic_count > 0 else group_count,
@@ -149,11 +594,78 @@ class DatabaseHandler:
         try:
             messages = session.query(CapturedMessage).filter_by(
                 group_id=group_id
-            ).order_by(CapturedMessage.timestamp).all()
+            ).order_by(CapturedMessage.timestamp, CapturedMessage.id).all()
             return messages
         finally:
             session.close()
     
+    @staticmethod
+    def count_messages_for_group(group_id):
+        """Count a group's messages (answered from the group_id index)."""
+        session = get_session()
+        try:
+            return session.query(func.count(CapturedMessage.id)).filter(
+                CapturedMessage.group_id == group_id
+            ).scalar()
+        finally:
+            session.close()
+    
+    @staticmethod
+    def get_message_page(group_id, after=None, limit=500, topic_ids=None, exclude_topic_ids=None):
+        """
+        Get the next page of a group's messages in (timestamp, id) order.
+        
+        Args:
+            group_id: Group ID
+            after: (timestamp, id) of the last row already read, or None to start
+            limit: Maximum number of rows to return
+            topic_ids: Only messages in these topics (None in the list means General)
+            exclude_topic_ids: Skip messages in these topics (General is always kept)
+        
+        Returns:
+            List of lightweight rows with the MESSAGE_ROW_COLUMNS attributes
+        """
+        session = get_session()
+        try:
+            query = session.query(*MESSAGE_ROW_COLUMNS).filter(
+                CapturedMessage.group_id == group_id
+            )
+            if topic_ids is not None:
+                ids = [topic_id for topic_id in topic_ids if topic_id is not None]
+                if None in topic_ids:
+                    query = query.filter(or_(CapturedMessage.topic_id.is_(None), CapturedMessage.topic_id.in_(ids)))
+                else:
+                    query = query.filter(CapturedMessage.topic_id.in_(ids))
+            if exclude_topic_ids:
+                query = query.filter(or_(
+                    CapturedMessage.topic_id.is_(None),
+                    CapturedMessage.topic_id.notin_(list(exclude_topic_ids))
+                ))
+            if after is not None:
+                last_timestamp, last_id = after
+                query = query.filter(or_(
+                    CapturedMessage.timestamp > last_timestamp,
+                    and_(
+                        CapturedMessage.timestamp == last_timestamp,
+                        CapturedMessage.id > last_id
+                    )
+                ))
+            return query.order_by(
+                CapturedMessage.timestamp, CapturedMessage.id
+            ).limit(limit).all()
+        finally:
+            session.close()
+    
+    @staticmethod
+    def iter_messages_for_group(group_id, chunk_size=500, after=None, **topic_filters):
+        """Yield a group's messages page by page without loading them all."""
+        while True:
+            page = DatabaseHandler.get_message_page(group_id, after, chunk_size, **topic_filters)
+            yield from page
+            if len(page) < chunk_size:
+                return
+            after = (page[-1].timestamp, page[-1].id)
+    
     @staticmethod
     def get_topics_for_group(group_id):
         """Get all topics for a specific group."""
@@ -177,32 +689,41 @@ class DatabaseHandler:
     
     @staticmethod
     def get_topic_stats(group_id):
-        """Get message count per topic for a group."""
+        """Get message count per topic for a group in one query."""
         session = get_session()
         try:
-            topics = session.query(ForumTopic).filter_by(group_id=group_id).all()
+            counts = session.query(
+                CapturedMessage.topic_id,
+                func.count(CapturedMessage.id).label('message_count')
+            ).filter(
+                CapturedMessage.group_id == group_id
+            ).group_by(CapturedMessage.topic_id).cte('topic_counts')
+            
+            # Known topics (including empty ones) plus messages without a topic
+            topics = session.query(
+                ForumTopic.topic_id,
+                ForumTopic.topic_name,
+                func.coalesce(counts.c.message_count, 0)
+            ).outerjoin(
+                counts, counts.c.topic_id == ForumTopic.topic_id
+            ).filter(ForumTopic.group_id == group_id)
+            general = session.query(
+                counts.c.topic_id,
+                literal('General'),
+                counts.c.message_count
+            ).filter(counts.c.topic_id.is_(None))
+            
             result = []
-            for topic in topics:
-                count = session.query(CapturedMessage).filter_by(
-                    group_id=group_id,
-                    topic_id=topic.topic_id
-                ).count()
-                result.append({
-                    'topic_id': topic.topic_id,
-                    'topic_name': topic.topic_name,
+            for topic_id, topic_name, count in topics.union_all(general).all():
+                row = {
+                    'topic_id': topic_id,
+                    'topic_name': topic_name,
                     'message_count': count
-                })
-            # Also get messages without topic (general messages)
-            general_count = session.query(CapturedMessage).filter_by(
-                group_id=group_id,
-                topic_id=None
-            ).count()
-            if general_count > 0:
-                result.insert(0, {
-                    'topic_id': None,
-                    'topic_name': 'General',
-                    'message_count': general_count
-                })
+                }
+                if topic_id is None:
+                    result.insert(0, row)
+                else:
+                    result.append(row)
             return result
         finally:
             session.close()
@@ -226,43 +747,58 @@ class DatabaseHandler:
         finally:
             session.close()
     
+    @staticmethod
+    def _total_messages(session):
+        """Get the total message count from the per-group counters."""
+        total = session.query(func.sum(MessageCounter.count)).filter(
+            MessageCounter.scope == 'group'
+        ).scalar()
+        return int(total or 0)
+    
     @staticmethod
     def get_detailed_stats():
         """Get detailed statistics for all groups and topics."""
         session = get_session()
         try:
             # Total stats
-            total_messages = session.query(CapturedMessage).count()
+            total_messages = DatabaseHandler._total_messages(session)
             total_groups = session.query(TelegramGroup).count()
             total_topics = session.query(ForumTopic).count()
             
-            # Messages by type
+            # Messages by type (counted per group)
+            type_count = func.sum(MessageCounter.count)
             type_stats = session.query(
-                CapturedMessage.message_type,
-                func.count(CapturedMessage.id).label('count')
-            ).group_by(CapturedMessage.message_type).all()
+                MessageCounter.message_type,
+                type_count
+            ).filter(
+                MessageCounter.scope == 'type'
+            ).group_by(MessageCounter.message_type).order_by(type_count.desc()).all()
             
             # Most active groups
             active_groups = session.query(
-                CapturedMessage.group_id,
-                CapturedMessage.group_name,
-                func.count(CapturedMessage.id).label('count')
-            ).group_by(
-                CapturedMessage.group_id,
-                CapturedMessage.group_name
-            ).order_by(func.count(CapturedMessage.id).desc()).limit(5).all()
+                MessageCounter.group_id,
+                TelegramGroup.group_name,
+                MessageCounter.count
+            ).outerjoin(
+                TelegramGroup, TelegramGroup.group_id == MessageCounter.group_id
+            ).filter(
+                MessageCounter.scope == 'group'
+            ).order_by(MessageCounter.count.desc()).limit(5).all()
             
             # Most active topics
             active_topics = session.query(
-                CapturedMessage.topic_name,
-                CapturedMessage.group_name,
-                func.count(CapturedMessage.id).label('count')
+                ForumTopic.topic_name,
+                TelegramGroup.group_name,
+                MessageCounter.count
+            ).outerjoin(
+                ForumTopic,
+                (ForumTopic.group_id == MessageCounter.group_id) &
+                (ForumTopic.topic_id == MessageCounter.topic_id)
+            ).outerjoin(
+                TelegramGroup, TelegramGroup.group_id == MessageCounter.group_id
             ).filter(
-                CapturedMessage.topic_id.isnot(None)
-            ).group_by(
-                CapturedMessage.topic_name,
-                CapturedMessage.group_name
-            ).order_by(func.count(CapturedMessage.id).desc()).limit(5).all()
+                MessageCounter.scope == 'topic'
+            ).order_by(MessageCounter.count.desc()).limit(5).all()
             
             return {
                 'total_messages': total_messages,
@@ -274,3 +810,234 @@ class DatabaseHandler:
             }
         finally:
             session.close()
+    
+    @staticmethod
+    def create_migration_job(source_group_id, target_group_id, mode, total_messages=0, created_by=None,
+                             status='running', worker_id=None, status_chat_id=None, status_message_id=None):
+        """Record a new migration job and return its ID."""
+        session = get_session()
+        try:
+            job = MigrationJob(
+                source_group_id=source_group_id,
+                target_group_id=target_group_id,
+                mode=mode,
+                status=status,
+                topic_mapping='{}',
+                total_messages=total_messages,
+                created_by=created_by,
+                worker_id=worker_id,
+                status_chat_id=status_chat_id,
+                status_message_id=status_message_id
+            )
+            session.add(job)
+            session.commit()
+            return job.id
+        finally:
+            session.close()
+    
+    @staticmethod
+    def get_migration_job(job_id):
+        """Get a migration job by ID."""
+        session = get_session()
+        try:
+            return session.get(MigrationJob, job_id)
+        finally:
+            session.close()
+    
+    @staticmethod
+    def get_unfinished_migration_job(source_group_id, target_group_id):
+        """Get the most recent unfinished job for a source/target pair, if any."""
+        session = get_session()
+        try:
+            return session.query(MigrationJob).filter(
+                MigrationJob.source_group_id == source_group_id,
+                MigrationJob.target_group_id == target_group_id,
+                MigrationJob.status.in_(UNFINISHED_JOB_STATUSES)
+            ).order_by(MigrationJob.id.desc()).first()
+        finally:
+            session.close()
+    
+    @staticmethod
+    def update_migration_job(job_id, **fields):
+        """
+        Update a migration job's columns (status, checkpoint, counts, ...) and commit.
+        
+        Calling it without fields just refreshes updated_at, the runner's heartbeat.
+        
+        Returns:
+            The job's pending control request ('pause', 'cancel') or None
+        """
+        session = get_session()
+        try:
+            fields['updated_at'] = datetime.utcnow()
+            session.query(MigrationJob).filter_by(id=job_id).update(fields, synchronize_session=False)
+            session.commit()
+            return session.query(MigrationJob.control).filter_by(id=job_id).scalar()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+    
+    @staticmethod
+    def claim_migration_job(worker_id, stale_after, job_id=None):
+        """
+        Atomically take a job for running.
+        
+        Without job_id the oldest queued job is claimed, or a running job whose
+        runner has not updated it for stale_after seconds (it was killed). With
+        job_id that job is claimed unless it is running elsewhere; paused and
+        failed jobs qualify too.
+        
+        Returns:
+            The claimed MigrationJob, or None
+        """
+        session = get_session()
+        try:
+            stale = datetime.utcnow() - timedelta(seconds=stale_after)
+            available = or_(
+                MigrationJob.status == 'pending',
+                and_(MigrationJob.status == 'running', MigrationJob.updated_at < stale)
+            )
+            query = session.query(MigrationJob)
+            if job_id is None:
+                query = query.filter(available).order_by(MigrationJob.id)
+            else:
+                query = query.filter(
+                    MigrationJob.id == job_id,
+                    or_(available, MigrationJob.status.in_(('paused', 'failed')))
+                )
+            for job in query.limit(5).all():
+                # Only one claimant can move the row on from the state it read
+                claimed = session.query(MigrationJob).filter(
+                    MigrationJob.id == job.id,
+                    MigrationJob.status == job.status,
+                    MigrationJob.updated_at == job.updated_at
+                ).update({
+                    'status': 'running',
+                    'worker_id': worker_id,
+                    'error': None,
+                    # A pause or cancel left by a runner that died was meant for that run
+                    'control': None,
+                    'updated_at': datetime.utcnow(),
+                }, synchronize_session=False)
+                session.commit()
+                if claimed:
+                    session.refresh(job)
+                    return job
+            return None
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+    
+    @staticmethod
+    def enqueue_migration_job(source_group_id, target_group_id, mode, stale_after, created_by=None,
+                              status_chat_id=None, status_message_id=None):
+        """
+        Queue a migration for a worker, reusing the pair's unfinished job if there is one.
+        
+        Returns:
+            (job ID, whether it was newly queued); False means the job is
+            already queued or being run
+        """
+        session = get_session()
+        try:
+            job = session.query(MigrationJob).filter(
+                MigrationJob.source_group_id == source_group_id,
+                MigrationJob.target_group_id == target_group_id,
+                MigrationJob.status.in_(UNFINISHED_JOB_STATUSES)
+            ).order_by(MigrationJob.id.desc()).first()
+            if job is None:
+                job = MigrationJob(
+                    source_group_id=source_group_id,
+                    target_group_id=target_group_id,
+                    mode=mode,
+                    status='pending',
+                    topic_mapping='{}',
+                    created_by=created_by,
+                    status_chat_id=status_chat_id,
+                    status_message_id=status_message_id
+                )
+                session.add(job)
+                session.commit()
+                return job.id, True
+            
+            stale = datetime.utcnow() - timedelta(seconds=stale_after)
+            if job.status == 'pending' or (job.status == 'running' and job.updated_at >= stale):
+                return job.id, False
+            # Paused, failed or abandoned: queue it again, reporting to the new status message
+            queued = session.query(MigrationJob).filter(
+                MigrationJob.id == job.id,
+                MigrationJob.status == job.status,
+                MigrationJob.updated_at == job.updated_at
+            ).update({
+                'status': 'pending',
+                'status_chat_id': status_chat_id,
+                'status_message_id': status_message_id,
+                'updated_at': datetime.utcnow(),
+            }, synchronize_session=False)
+            session.commit()
+            return job.id, bool(queued)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+    
+    @staticmethod
+    def control_migration_job(job_id, action):
+        """
+        Apply an admin action ('pause', 'cancel' or 'resume') to a job.
+        
+        A job that is not running changes status right away. A running job
+        gets the request in its control column and stops at its next
+        checkpoint or heartbeat.
+        
+        Returns:
+            The job's new status, 'requested' for a running job, or None if
+            there is no such job
+        
+        Raises:
+            ValueError: The action does not apply to the job's current status
+        """
+        session = get_session()
+        try:
+            job = session.get(MigrationJob, job_id)
+            if job is None:
+                return None
+            if job.status == 'running' and action in ('pause', 'cancel'):
+                values = {'control': action}
+                outcome = 'requested'
+            elif job.status in JOB_ACTIONS[action]:
+                outcome = JOB_ACTIONS[action][job.status]
+                values = {'status': outcome, 'updated_at': datetime.utcnow()}
+                if outcome == 'cancelled':
+                    values['finished_at'] = datetime.utcnow()
+            else:
+                raise ValueError(f"Job #{job_id} is {job.status}")
+            
+            # Conditional on the status read above, so a concurrent claim is not overwritten
+            updated = session.query(MigrationJob).filter(
+                MigrationJob.id == job_id,
+                MigrationJob.status == job.status
+            ).update(values, synchronize_session=False)
+            session.commit()
+            if not updated:
+                raise ValueError(f"Job #{job_id} changed state, please try again")
+            return outcome
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+    
+    @staticmethod
+    def get_migration_jobs(limit=5):
+        """Get the most recent migration jobs, newest first."""
+        session = get_session()
+        try:
+            return session.query(MigrationJob).order_by(MigrationJob.id.desc()).limit(limit).all()
+        finally:
+            session.close()
@@ -0,0 +1,79 @@
+"""Remove duplicate captured messages and add the (group_id, message_id) unique index.
+
+Edited messages used to be stored as new rows, so older databases can hold
+several rows for the same Telegram message. This keeps the newest row
+(the latest edit) for each (group_id, message_id), creates the unique
+index that message upserts rely on, and rebuilds the message counters.
+init_db() refuses to start on a database without the index, so run this
+before deploying a version that upserts messages. On PostgreSQL the index
+is built with CREATE UNIQUE INDEX CONCURRENTLY, so captures are not
+blocked; if a writer adds a duplicate meanwhile, the build fails and
+leaves an INVALID index: drop it and run the script again.
+
+Usage:
+    python dedup_messages.py            # delete duplicates and create the index
+    python dedup_messages.py --dry-run  # only report how many rows would be removed
+"""
+import argparse
+import time
+from sqlalchemy import inspect, select, func, text
+from database import (
+    get_engine, CapturedMessage, MessageCounter, UNIQUE_MESSAGE_INDEX,
+    delete_duplicate_messages, has_unique_message_index
+)
+from db_handler import DatabaseHandler
+from migrate_indexes import index_ddl
+
+
+def count_duplicates(conn):
+    """Count rows that have a newer row for the same message."""
+    per_message = select(
+        (func.count(CapturedMessage.id) - 1).label('extra')
+    ).group_by(
+        CapturedMessage.group_id, CapturedMessage.message_id
+    ).having(func.count(CapturedMessage.id) > 1).subquery()
+    return conn.execute(select(func.coalesce(func.sum(per_message.c.extra), 0))).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dry-run', action='store_true', help='report duplicates without changes')
+    args = parser.parse_args()
+
+    engine = get_engine()
+    table = CapturedMessage.__table__
+    index = next(ix for ix in table.indexes if ix.name == UNIQUE_MESSAGE_INDEX)
+    has_index = has_unique_message_index(engine)
+
+    with engine.connect() as conn:
+        duplicates = count_duplicates(conn)
+    print(f'🔍 Duplicate rows: {duplicates:,}')
+    print(f'   Unique index present: {has_index}')
+
+    if args.dry_run:
+        print('\n⚠️ Dry run: nothing was changed.')
+        return
+
+    if duplicates:
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            deleted = delete_duplicate_messages(conn)
+        print(f'🗑️ Deleted {deleted:,} duplicate rows in {time.perf_counter() - started:.1f}s')
+
+    if not has_index:
+        ddl = index_ddl(index, engine.dialect)
+        print(f'🔧 {ddl}')
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            conn.execute(text(ddl))
+        print('✅ Unique index created')
+
+    # Databases without message_counters get it (and their counters) from init_db()
+    if duplicates and inspect(engine).has_table(MessageCounter.__tablename__):
+        print('🔄 Rebuilding message counters...')
+        DatabaseHandler.rebuild_counters()
+
+    print('✅ Done')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Raw-JSON fast path for capturing ordinary group messages.
+
+Webhook updates that carry a plain group message (new or edited) are
+captured straight from the parsed JSON, without building the Update object
+graph or running the handler chain. Everything else - commands, service
+messages such as forum topic events, callback queries and chat member
+updates - returns False from capture() and goes through the full
+python-telegram-bot pipeline.
+
+The extraction below must stay in step with MessageCapture.handle_message.
+"""
+import json
+import logging
+from datetime import datetime
+from message_handlers import MessageCapture
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the standard library parser
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+def loads(body):
+    """Parse a JSON request body (bytes or str), using orjson when installed."""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def _captioned_file(value, message):
+    return None, message.get('caption'), value['file_id']
+
+
+def _file(value, message):
+    return None, None, value['file_id']
+
+
+# (message field, message_type, extractor returning (text_content, caption, file_id)),
+# checked in the same order as MessageCapture.handle_message
+MESSAGE_TYPES = (
+    ('text', 'text', lambda value, message: (value, None, None)),
+    ('photo', 'photo', lambda value, message: (None, message.get('caption'), value[-1]['file_id'])),
+    ('video', 'video', _captioned_file),
+    ('document', 'document', _captioned_file),
+    ('audio', 'audio', _captioned_file),
+    ('voice', 'voice', _captioned_file),
+    ('video_note', 'video_note', _file),
+    ('sticker', 'sticker', _file),
+    ('animation', 'animation', _captioned_file),
+    ('location', 'location', lambda value, message: (
+        f"Location: {value['latitude']}, {value['longitude']}", None, None)),
+    ('poll', 'poll', lambda value, message: (f"Poll: {value['question']}", None, None)),
+    ('contact', 'contact', lambda value, message: (
+        f"Contact: {value['first_name']} {value.get('last_name') or ''} ({value['phone_number']})",
+        None, None)),
+    ('venue', 'venue', lambda value, message: (f"Venue: {value['title']} - {value['address']}", None, None)),
+    ('new_chat_members', 'new_member', lambda value, message: (
+        f"New members: {', '.join(member['first_name'] for member in value)}", None, None)),
+    ('left_chat_member', 'left_member', lambda value, message: (
+        f"Left: {value['first_name']}", None, None)),
+    ('new_chat_title', 'title_change', lambda value, message: (f"New title: {value}", None, None)),
+)
+
+
+def _is_command(message):
+    """Mirror filters.COMMAND: the first entity is a bot command at offset 0."""
+    entities = message.get('entities')
+    return bool(entities) and entities[0].get('type') == 'bot_command' and entities[0].get('offset') == 0
+
+
+def parse_plain_message(data):
+    """
+    Extract the captured-message row from a raw update.
+
+    Returns:
+        (message_data, topic_root_name), or None if the update needs the full pipeline
+    """
+    message = data.get('message') or data.get('edited_message')
+    if not message:
+        return None
+    chat = message.get('chat') or {}
+    if chat.get('type') not in ('group', 'supergroup') or _is_command(message):
+        return None
+
+    for field, message_type, extract in MESSAGE_TYPES:
+        value = message.get(field)
+        if value:
+            text_content, caption, file_id = extract(value, message)
+            break
+    else:
+        # Service messages and unknown types take the full pipeline
+        return None
+
+    topic_id = None
+    topic_root_name = None
+    if message.get('is_topic_message') and message.get('message_thread_id'):
+        topic_id = message['message_thread_id']
+        topic_created = (message.get('reply_to_message') or {}).get('forum_topic_created')
+        if topic_created:
+            topic_root_name = topic_created.get('name')
+
+    sender = message.get('from') or {}
+    message_data = {
+        'group_id': chat['id'],
+        'group_name': chat.get('title'),
+        'message_id': message['message_id'],
+        'topic_id': topic_id,
+        'topic_name': None,
+        'sender_id': sender.get('id'),
+        'sender_username': sender.get('username'),
+        'sender_first_name': sender.get('first_name'),
+        'sender_last_name': sender.get('last_name'),
+        'message_type': message_type,
+        'text_content': text_content,
+        'caption': caption,
+        'file_id': file_id,
+        'media_group_id': message.get('media_group_id'),
+        'timestamp': datetime.fromtimestamp(message['date'])
+    }
+    return message_data, topic_root_name
+
+
+async def capture(data):
+    """
+    Capture a raw update directly if it is a plain group message.
+
+    Returns:
+        False if the update was not handled and must go through the application
+    """
+    parsed = parse_plain_message(data)
+    if parsed is None:
+        return False
+    message_data, topic_root_name = parsed
+    await MessageCapture.capture(message_data, topic_root_name)
+    logger.debug(f"Captured {message_data['message_type']} message from {message_data['group_name']} (fast path)")
+    return True
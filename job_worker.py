@@ -0,0 +1,161 @@
+"""Background worker that runs reinitialize jobs.
+
+With REINIT_USE_WORKER enabled, /reinitialize only queues a migration job;
+this process claims queued jobs, runs up to REINIT_MAX_CONCURRENT_JOBS of
+them at once and keeps editing the admin's status message. Several workers
+may run side by side - each job is claimed by exactly one of them.
+
+Usage:
+    python job_worker.py
+
+On SIGINT/SIGTERM running jobs stop after the message in flight and are
+queued again, so the next worker resumes them from their checkpoint.
+"""
+import asyncio
+import logging
+import os
+import signal
+from telegram import Bot
+import config
+from database import init_db, dispose_engine
+from async_db_handler import AsyncDatabaseHandler, shutdown_db_executor
+from reinitialize import ReinitializationHandler, runner_id, progress_text, result_text
+
+# Create logs directory if it doesn't exist
+if not os.path.exists('logs'):
+    os.makedirs('logs')
+
+# Configure logging with both file and console output
+logging.basicConfig(
+    level=getattr(logging, config.LOG_LEVEL),
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('logs/worker.log', encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+logger = logging.getLogger(__name__)
+
+
+class JobWorker:
+    """Claim queued migration jobs and run a bounded number of them concurrently."""
+
+    def __init__(self, bot, max_jobs=2, poll_interval=5):
+        self.bot = bot
+        self.max_jobs = max_jobs
+        self.poll_interval = poll_interval
+        self.worker_id = runner_id('worker')
+        self._running = {}  # job id -> ReinitializationHandler
+        self._tasks = set()
+        self._stopping = None  # created on the running event loop
+
+    async def run(self):
+        """Claim and run jobs until stop() is called, then requeue the running ones."""
+        self._stopping = asyncio.Event()
+        logger.info(f"Worker {self.worker_id} started (up to {self.max_jobs} concurrent jobs)")
+        while not self._stopping.is_set():
+            if len(self._running) < self.max_jobs:
+                try:
+                    job = await AsyncDatabaseHandler.claim_migration_job(
+                        self.worker_id, config.REINIT_JOB_STALE_AFTER
+                    )
+                except Exception as e:
+                    logger.error(f"Could not claim a job: {e}")
+                    job = None
+                if job is not None:
+                    self._start(job)
+                    continue
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+        # Running jobs stop after the message in flight and go back to the queue
+        for handler in self._running.values():
+            handler.request_stop('requeue')
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        logger.info(f"Worker {self.worker_id} stopped")
+
+    def stop(self):
+        """Stop claiming jobs and wind down the running ones."""
+        if self._stopping is not None:
+            self._stopping.set()
+
+    def _start(self, job):
+        """Run a claimed job in its own task."""
+        logger.info(f"Claimed job {job.id}: {job.source_group_id} -> {job.target_group_id}")
+        handler = ReinitializationHandler(self.bot)
+        self._running[job.id] = handler
+        task = asyncio.create_task(self._run_job(job, handler))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_job(self, job, handler):
+        """Run one job, reporting progress and the outcome in its status message."""
+        async def progress_callback(current, total):
+            await self._edit_status(job, progress_text(current, total))
+
+        try:
+            result = await handler.run_job(job, progress_callback)
+            await self._edit_status(job, result_text(result))
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}", exc_info=True)
+            await self._edit_status(
+                job,
+                f"❌ Reinitialization Failed (job #{job.id})\n\n"
+                f"Error: {e}\n\n"
+                f"Use /reinit_resume {job.id} to retry from the last checkpoint.",
+                parse_mode=None
+            )
+        finally:
+            self._running.pop(job.id, None)
+
+    async def _edit_status(self, job, text, parse_mode='Markdown'):
+        """Edit the admin's status message for a job, if it has one."""
+        if not job.status_chat_id or not job.status_message_id:
+            return
+        try:
+            await self.bot.edit_message_text(
+                text=text,
+                chat_id=job.status_chat_id,
+                message_id=job.status_message_id,
+                parse_mode=parse_mode
+            )
+        except Exception as e:
+            logger.debug(f"Could not update status message of job {job.id}: {e}")
+
+
+async def run_worker():
+    """Run the worker until SIGINT/SIGTERM."""
+    bot = Bot(config.BOT_TOKEN)
+    worker = JobWorker(
+        bot,
+        max_jobs=config.REINIT_MAX_CONCURRENT_JOBS,
+        poll_interval=config.REINIT_WORKER_POLL_INTERVAL
+    )
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, worker.stop)
+        except NotImplementedError:
+            pass  # Windows: Ctrl+C still interrupts, jobs are resumed once stale
+    async with bot:
+        await worker.run()
+
+
+def main():
+    """Start the job worker."""
+    # Initialize database
+    logger.info("Initializing database...")
+    init_db()
+
+    try:
+        asyncio.run(run_worker())
+    finally:
+        shutdown_db_executor()
+        dispose_engine()
+
+
+if __name__ == '__main__':
+    main()
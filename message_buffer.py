@@ -0,0 +1,152 @@
+"""Write-behind buffer for batching captured message inserts."""
+import atexit
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class MessageBuffer:
+    """Collect captured messages in memory and insert them in batches.
+
+    A background thread flushes the buffer when it holds ``max_rows`` rows or
+    when the oldest buffered row is ``max_delay_ms`` old, whichever comes first.
+    Remaining rows are flushed on shutdown. A batch that fails is retried row
+    by row, so like a direct write only the rows the database rejects are lost.
+    """
+
+    def __init__(self, flush_fn, max_rows=200, max_delay_ms=500):
+        """
+        Args:
+            flush_fn: Callable taking a list of message dicts, returns True on success
+            max_rows: Flush as soon as this many rows are buffered
+            max_delay_ms: Flush rows that have waited this long
+        """
+        self.flush_fn = flush_fn
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000
+        self._rows = []
+        self._first_row_at = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()  # Keeps batches in arrival order
+        self._thread = None
+        self._stopped = False
+        self._stats = {
+            'flushes': 0,
+            'rows_flushed': 0,
+            'failed_flushes': 0,
+            'rows_recovered': 0,  # saved by the row-by-row retry of a failed batch
+            'rows_dropped': 0,
+            'last_flush_size': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0,
+        }
+
+    def add(self, message_data):
+        """Buffer a message for the next flush (written right away once the buffer is stopped)."""
+        with self._wakeup:
+            if not self._stopped:
+                if self._thread is None:
+                    self._start()
+                if not self._rows:
+                    self._first_row_at = time.monotonic()
+                    # Wake the idle flush thread so it starts the max_delay countdown
+                    self._wakeup.notify()
+                self._rows.append(message_data)
+                if len(self._rows) >= self.max_rows:
+                    self._wakeup.notify()
+                return
+        # Shutting down: nothing would flush the buffer again
+        with self._flush_lock:
+            self._write([message_data])
+
+    def flush(self):
+        """Insert everything currently buffered. Returns the number of rows flushed."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+                self._first_row_at = None
+            if not rows:
+                return 0
+
+            started = time.perf_counter()
+            ok = self._write(rows)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            with self._lock:
+                stats = self._stats
+                stats['flushes'] += 1
+                stats['last_flush_size'] = len(rows)
+                stats['last_flush_ms'] = elapsed_ms
+                stats['max_flush_ms'] = max(stats['max_flush_ms'], elapsed_ms)
+                stats['total_flush_ms'] += elapsed_ms
+                if ok:
+                    stats['rows_flushed'] += len(rows)
+                else:
+                    stats['failed_flushes'] += 1
+
+            logger.debug(f"Flushed {len(rows)} messages in {elapsed_ms:.1f} ms")
+            return len(rows)
+
+    def _write(self, rows):
+        """Write rows in one call, retrying row by row if it fails. Returns whether the batch call succeeded."""
+        if self.flush_fn(rows):
+            return True
+        recovered = sum(1 for row in rows if self.flush_fn([row]))
+        with self._lock:
+            self._stats['rows_recovered'] += recovered
+            self._stats['rows_dropped'] += len(rows) - recovered
+        if recovered < len(rows):
+            logger.error(f"Dropped {len(rows) - recovered} of {len(rows)} buffered messages the database rejected")
+        return False
+
+    def stop(self):
+        """Stop the flush thread and flush any remaining rows."""
+        with self._wakeup:
+            self._stopped = True
+            self._wakeup.notify()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self.flush()
+
+    def get_stats(self):
+        """Get flush statistics, including the current buffer depth."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['buffered'] = len(self._rows)
+        flushes = stats['flushes']
+        successful = flushes - stats['failed_flushes']
+        stats['avg_flush_size'] = (stats['rows_flushed'] / successful) if successful else 0
+        stats['avg_flush_ms'] = (stats['total_flush_ms'] / flushes) if flushes else 0.0
+        return stats
+
+    def _start(self):
+        """Start the background flush thread (called with the lock held)."""
+        self._thread = threading.Thread(
+            target=self._run, name='message-buffer', daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self):
+        """Background loop: wait for a full batch or an expired deadline, then flush."""
+        while True:
+            with self._wakeup:
+                while not self._stopped and len(self._rows) < self.max_rows:
+                    if self._rows:
+                        remaining = self._first_row_at + self.max_delay - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._wakeup.wait(remaining)
+                    else:
+                        self._wakeup.wait()
+                if self._stopped:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Message buffer flush failed: {e}", exc_info=True)
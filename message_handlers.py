@@ -3,7 +3,8 @@ import logging
 from datetime import datetime
 from telegram import Update
 from telegram.ext import ContextTypes
-from db_handler import DatabaseHandler
+from async_db_handler import AsyncDatabaseHandler
+from backpressure import get_write_budget
 
 logger = logging.getLogger(__name__)
 
@@ -20,9 +21,58 @@ class MessageCapture:
             
             if new_status in ["member", "administrator"]:
                 # Bot was added to a group
-                DatabaseHandler.add_or_update_group(chat.id, chat.title)
+                AsyncDatabaseHandler.invalidate_group(chat.id)
+                await AsyncDatabaseHandler.add_or_update_group(chat.id, chat.title)
                 logger.info(f"Bot added to group: {chat.title} ({chat.id})")
     
+    @staticmethod
+    async def resolve_topic(group_id, group_name, topic_id, root_name=None):
+        """Get a topic's name (stored, from the topic root, or a fallback) and save the topic."""
+        # Try to get topic name from database first
+        topic_name = await AsyncDatabaseHandler.get_topic_name(group_id, topic_id)
+        
+        # If not in database, use the name from the topic root message
+        if not topic_name:
+            topic_name = root_name
+        if not topic_name:
+            topic_name = f"Topic {topic_id}"  # Fallback
+            logger.debug(f"Using fallback topic name for topic {topic_id}")
+        
+        # Save/update topic in database
+        await AsyncDatabaseHandler.add_forum_topic(group_id, topic_id, topic_name)
+        logger.info(f"Processing message in topic '{topic_name}' ({topic_id}) in group '{group_name}'")
+        return topic_name
+    
+    @staticmethod
+    async def store_message(message_data, topic_root_name=None):
+        """Save a captured message together with its group and topic."""
+        group_id = message_data['group_id']
+        group_name = message_data['group_name']
+        
+        # Ensure group is in database
+        await AsyncDatabaseHandler.add_or_update_group(group_id, group_name)
+        if message_data['topic_id'] is not None:
+            message_data['topic_name'] = await MessageCapture.resolve_topic(
+                group_id, group_name, message_data['topic_id'], topic_root_name
+            )
+        
+        # Save to database
+        await AsyncDatabaseHandler.save_message(message_data)
+    
+    @staticmethod
+    async def capture(message_data, topic_root_name=None):
+        """Store a captured message within the write budget, shedding it if policy allows."""
+        budget = get_write_budget()
+        
+        # Under load, drop or defer low-value service messages before anything else
+        if budget.should_shed(message_data['message_type']):
+            budget.shed(lambda: MessageCapture.store_message(message_data, topic_root_name))
+            logger.debug(f"Shed {message_data['message_type']} message {message_data['message_id']}")
+            return
+        
+        async with budget.slot():
+            await MessageCapture.store_message(message_data, topic_root_name)
+    
     @staticmethod
     async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Capture messages from groups."""
@@ -37,9 +87,6 @@ class MessageCapture:
         if chat.type not in ['group', 'supergroup']:
             return
         
-        # Ensure group is in database
-        DatabaseHandler.add_or_update_group(chat.id, chat.title)
-        
         # Extract sender information
         sender = message.from_user
         sender_id = sender.id if sender else None
@@ -49,31 +96,12 @@ class MessageCapture:
         
         # Extract topic information (for forum groups)
         topic_id = None
-        topic_name = None
+        root_name = None
         if message.is_topic_message and message.message_thread_id:
             topic_id = message.message_thread_id
-            
-            # Try to get topic name from database first
-            topic_name = DatabaseHandler.get_topic_name(chat.id, topic_id)
-            
-            # If not in database, try to fetch from Telegram
-            if not topic_name:
-                try:
-                    # For forum topics, we need to get the topic info
-                    # The topic name might be in the reply_to_message if it's a topic root
-                    if message.reply_to_message and message.reply_to_message.forum_topic_created:
-                        topic_name = message.reply_to_message.forum_topic_created.name
-                    else:
-                        # Try to get from chat
-                        topic_name = f"Topic {topic_id}"  # Fallback
-                        logger.debug(f"Using fallback topic name for topic {topic_id}")
-                except Exception as e:
-                    topic_name = f"Topic {topic_id}"
-                    logger.warning(f"Could not fetch topic name: {e}")
-            
-            # Save/update topic in database
-            DatabaseHandler.add_forum_topic(chat.id, topic_id, topic_name)
-            logger.info(f"Processing message in topic '{topic_name}' ({topic_id}) in group '{chat.title}'")
+            # The topic name might be in the reply_to_message if it's a topic root
+            if message.reply_to_message and message.reply_to_message.forum_topic_created:
+                root_name = message.reply_to_message.forum_topic_created.name
         
         # Determine message type and extract content
         message_type = "text"
@@ -149,7 +177,7 @@ class MessageCapture:
             'group_name': chat.title,
             'message_id': message.message_id,
             'topic_id': topic_id,
-            'topic_name': topic_name,
+            'topic_name': None,  # resolved when the message is stored
             'sender_id': sender_id,
             'sender_username': sender_username,
             'sender_first_name': sender_first_name,
@@ -158,12 +186,11 @@ class MessageCapture:
             'text_content': text_content,
             'caption': caption,
             'file_id': file_id,
+            'media_group_id': message.media_group_id,
             'timestamp': datetime.fromtimestamp(message.date.timestamp())
         }
         
-        # Save to database
-        DatabaseHandler.save_message(message_data)
-        
+        await MessageCapture.capture(message_data, root_name)
         logger.debug(f"Captured {message_type} message from {chat.title}")
     
     @staticmethod
@@ -179,10 +206,11 @@ class MessageCapture:
         topic_id = message.message_thread_id
         
         # Ensure group is in database
-        DatabaseHandler.add_or_update_group(chat.id, chat.title)
+        await AsyncDatabaseHandler.add_or_update_group(chat.id, chat.title)
         
         # Add topic to database
-        DatabaseHandler.add_forum_topic(chat.id, topic_id, topic.name)
+        AsyncDatabaseHandler.invalidate_topic(chat.id, topic_id)
+        await AsyncDatabaseHandler.add_forum_topic(chat.id, topic_id, topic.name)
         logger.info(f"✨ New forum topic created: '{topic.name}' (ID: {topic_id}) in group '{chat.title}' (ID: {chat.id})")
     
     @staticmethod
@@ -198,5 +226,6 @@ class MessageCapture:
         topic_id = message.message_thread_id
         
         # Update topic name in database
-        DatabaseHandler.add_forum_topic(chat.id, topic_id, topic.name)
+        AsyncDatabaseHandler.invalidate_topic(chat.id, topic_id)
+        await AsyncDatabaseHandler.add_forum_topic(chat.id, topic_id, topic.name)
         logger.info(f"📝 Forum topic edited: '{topic.name}' (ID: {topic_id}) in group '{chat.title}' (ID: {chat.id})")
@@ -0,0 +1,56 @@
+"""In-memory cache of known groups and forum topics."""
+import threading
+from collections import OrderedDict
+import config
+
+# Returned by LRUCache.get() for keys that are not cached
+MISSING = object()
+
+
+class LRUCache:
+    """A bounded, thread-safe least-recently-used cache."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=MISSING):
+        """Get a cached value and mark it as recently used."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """Cache a value, evicting the least recently used entry when full."""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        """Remove a key from the cache."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Group names keyed by group_id
+group_cache = LRUCache(config.METADATA_CACHE_SIZE)
+
+# Topic names keyed by (group_id, topic_id)
+topic_cache = LRUCache(config.METADATA_CACHE_SIZE)
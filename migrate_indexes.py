@@ -0,0 +1,124 @@
+"""Create missing indexes on an existing database and compare query plans.
+
+Usage:
+    python migrate_indexes.py            # build missing indexes
+    python migrate_indexes.py --dry-run  # only show plans and the DDL that would run
+
+On PostgreSQL the indexes are built with CREATE INDEX CONCURRENTLY, so
+ingestion keeps writing to captured_messages while they are built. If a
+concurrent build is interrupted, drop the INVALID index it leaves behind
+and run the script again.
+"""
+import argparse
+import time
+from sqlalchemy import inspect, select, func, text
+from sqlalchemy.schema import CreateIndex
+from database import get_engine, CapturedMessage
+
+
+def sample_ids(conn):
+    """Pick a real group/topic so the plans reflect actual data."""
+    row = conn.execute(
+        select(CapturedMessage.group_id, CapturedMessage.topic_id).limit(1)
+    ).first()
+    if row is None:
+        return 0, 0
+    return row.group_id, row.topic_id if row.topic_id is not None else 0
+
+
+def representative_queries(group_id, topic_id):
+    """The hot read queries from db_handler.py."""
+    return {
+        'get_recent_messages': select(CapturedMessage)
+            .order_by(CapturedMessage.timestamp.desc())
+            .limit(10),
+        'get_messages_for_group': select(CapturedMessage)
+            .where(CapturedMessage.group_id == group_id)
+            .order_by(CapturedMessage.timestamp, CapturedMessage.id),
+        'get_topic_stats': select(func.count(CapturedMessage.id))
+            .where(CapturedMessage.group_id == group_id)
+            .where(CapturedMessage.topic_id == topic_id),
+    }
+
+
+def explain(conn, statement):
+    """Return the query plan of a statement as a list of lines."""
+    sql = str(statement.compile(conn, compile_kwargs={'literal_binds': True}))
+    if conn.dialect.name == 'sqlite':
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        return [row[-1] for row in rows]
+    rows = conn.execute(text(f"EXPLAIN {sql}")).all()
+    return [row[0] for row in rows]
+
+
+def print_plans(conn, title, queries):
+    """Print the plan of every representative query."""
+    print(f'\n📋 {title}')
+    print('-' * 60)
+    for name, statement in queries.items():
+        print(f'  • {name}')
+        for line in explain(conn, statement):
+            print(f'      {line}')
+
+
+def index_ddl(index, dialect):
+    """Build the CREATE INDEX statement, concurrent on PostgreSQL."""
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect))
+    if dialect.name == 'postgresql':
+        ddl = ddl.replace('CREATE UNIQUE INDEX', 'CREATE UNIQUE INDEX CONCURRENTLY', 1)
+        ddl = ddl.replace('CREATE INDEX', 'CREATE INDEX CONCURRENTLY', 1)
+    return ddl
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dry-run', action='store_true', help='show plans and DDL without changes')
+    args = parser.parse_args()
+
+    engine = get_engine()
+    table = CapturedMessage.__table__
+    existing = {ix['name'] for ix in inspect(engine).get_indexes(table.name)}
+    missing = [ix for ix in sorted(table.indexes, key=lambda ix: ix.name) if ix.name not in existing]
+    # Unique indexes need existing duplicates removed first (see dedup_messages.py)
+    skipped = [ix for ix in missing if ix.unique]
+    missing = [ix for ix in missing if not ix.unique]
+
+    print('\n' + '=' * 60)
+    print(f'       INDEX MIGRATION ({engine.dialect.name})')
+    print('=' * 60)
+
+    # Concurrent index builds cannot run inside a transaction
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        queries = representative_queries(*sample_ids(conn))
+        print_plans(conn, 'QUERY PLANS BEFORE', queries)
+
+        for index in skipped:
+            print(f'\n⚠️ Skipping unique index {index.name}: run dedup_messages.py to create it.')
+
+        if not missing:
+            print('\n✅ All indexes already exist.')
+            return
+
+        print(f'\n🔧 Missing indexes: {len(missing)}')
+        for index in missing:
+            ddl = index_ddl(index, engine.dialect)
+            print(f'  • {ddl}')
+            if args.dry_run:
+                continue
+            started = time.perf_counter()
+            conn.execute(text(ddl))
+            print(f'    built in {time.perf_counter() - started:.1f}s')
+
+        if args.dry_run:
+            print('\n⚠️ Dry run: no indexes were created.')
+            return
+
+        # Refresh planner statistics so the new indexes are considered
+        conn.execute(text(f'ANALYZE {table.name}'))
+        print_plans(conn, 'QUERY PLANS AFTER', queries)
+
+    print('\n' + '=' * 60 + '\n')
+
+
+if __name__ == '__main__':
+    main()
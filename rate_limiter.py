@@ -0,0 +1,186 @@
+"""Adaptive token-bucket rate limiting for outbound Bot API calls.
+
+Every call takes a token from a global bucket (Telegram's overall limit
+for a bot) and from the target chat's bucket. Tokens are taken when a
+request starts, so request latency counts towards the interval instead of
+being added on top of a fixed sleep. When Telegram answers with
+RetryAfter, the chat is paused for the requested time and its rate is
+halved; successful calls then raise it back by a small step relative to
+its current rate, up to the configured rate, so a chat started at the
+configured rate settles just below the limit Telegram enforces. Flood
+control on a chat while another chat is still paused points at the
+bot-wide limit, so the global bucket is paused and slowed down the same way.
+"""
+import asyncio
+import logging
+import time
+from telegram.error import BadRequest, NetworkError, RetryAfter, TimedOut
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Token bucket that hands out reservations, so callers queue by sleeping."""
+
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum burst (defaults to one second's worth, at least 1)
+        """
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def reserve(self, now, cost=1):
+        """Take `cost` tokens (possibly going into debt) and return how long to wait first."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        wait = max(0.0, (cost - self.tokens) / self.rate, self.paused_until - now)
+        self.tokens -= cost
+        return wait
+
+    def pause(self, now, seconds):
+        """Stop handing out tokens for `seconds` (flood control), dropping any burst."""
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = min(self.tokens, 0.0)
+
+
+class RateLimiter:
+    """Global and per-chat rate limits with adaptive backoff and bounded retries."""
+
+    def __init__(self, global_rate=30.0, chat_rate=20.0, min_chat_rate=2 / 60, max_retries=5):
+        """
+        Args:
+            global_rate: Calls per second across all chats
+            chat_rate: Starting (and maximum) calls per second to a single chat
+            min_chat_rate: Lowest rate adaptive backoff may reduce a chat to
+            max_retries: Retries after flood control or network errors before giving up
+        """
+        self.global_rate = global_rate
+        self.global_bucket = TokenBucket(global_rate)
+        self.chat_rate = chat_rate
+        self.min_chat_rate = min_chat_rate
+        self.max_retries = max_retries
+        self._chats = {}  # chat id -> TokenBucket
+        self._stats = {
+            'calls': 0,
+            'retries': 0,
+            'retry_after': 0,
+            'global_pauses': 0,
+            'network_errors': 0,
+            'gave_up': 0,
+            'total_wait_s': 0.0,
+        }
+
+    async def acquire(self, chat_id, cost=1):
+        """Wait until a call to `chat_id` is allowed under both the global and the chat limit."""
+        now = time.monotonic()
+        bucket = self._bucket(chat_id)
+        wait = max(self.global_bucket.reserve(now, cost), bucket.reserve(now, cost))
+        if wait > 0:
+            self._stats['total_wait_s'] += wait
+            await asyncio.sleep(wait)
+
+    async def call(self, chat_id, func, /, *args, **kwargs):
+        """
+        Call a Bot API coroutine function for `chat_id` within the rate limits.
+
+        Flood control (RetryAfter) and network errors are retried up to
+        max_retries times; any other error is raised immediately.
+        """
+        attempt = 0
+        while True:
+            await self.acquire(chat_id)
+            self._stats['calls'] += 1
+            try:
+                result = await func(*args, **kwargs)
+            except RetryAfter as e:
+                self._stats['retry_after'] += 1
+                self._back_off(chat_id, e.retry_after)
+                error = e
+            except TimedOut:
+                # The request may have gone through; retrying could post it twice
+                raise
+            except BadRequest:
+                # A NetworkError subclass in python-telegram-bot, but retrying cannot help
+                raise
+            except NetworkError as e:
+                self._stats['network_errors'] += 1
+                error = e
+                await asyncio.sleep(min(2 ** attempt, 30))
+            else:
+                self._speed_up(chat_id)
+                return result
+
+            attempt += 1
+            if attempt > self.max_retries:
+                self._stats['gave_up'] += 1
+                raise error
+            self._stats['retries'] += 1
+
+    def get_stats(self):
+        """Get call, retry and wait totals plus the rates of chats slowed down by flood control."""
+        stats = dict(self._stats)
+        stats['global_rate'] = round(self.global_bucket.rate, 2)
+        stats['slowed_chats'] = {
+            chat_id: round(bucket.rate, 2)
+            for chat_id, bucket in self._chats.items()
+            if bucket.rate < self.chat_rate
+        }
+        return stats
+
+    def _bucket(self, chat_id):
+        """Get (or create) the bucket for a chat."""
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate)
+        return bucket
+
+    def _back_off(self, chat_id, retry_after):
+        """Pause a chat for Telegram's retry_after and halve its rate (and the global one, if it is global)."""
+        now = time.monotonic()
+        bucket = self._bucket(chat_id)
+        seconds = retry_after.total_seconds() if hasattr(retry_after, 'total_seconds') else retry_after
+        # Another chat still under flood control: the bot as a whole is over the limit
+        is_global = any(
+            other.paused_until > now for other_id, other in self._chats.items() if other_id != chat_id
+        )
+        bucket.pause(now, seconds)
+        bucket.rate = max(self.min_chat_rate, bucket.rate / 2)
+        logger.warning(f"Flood control for chat {chat_id}: waiting {seconds}s, rate now {bucket.rate:.2f}/s")
+        if is_global:
+            self._stats['global_pauses'] += 1
+            self.global_bucket.pause(now, seconds)
+            self.global_bucket.rate = max(self.min_chat_rate, self.global_bucket.rate / 2)
+            logger.warning(f"Flood control on several chats: pausing all calls for {seconds}s, "
+                           f"global rate now {self.global_bucket.rate:.2f}/s")
+
+    def _speed_up(self, chat_id):
+        """Raise a chat's (and the global) rate a little after a successful call, up to the configured rate."""
+        bucket = self._chats[chat_id]
+        if bucket.rate < self.chat_rate:
+            # A step of the chat's own rate: a fixed step of the configured rate would
+            # overshoot a chat slowed far below it straight back into flood control
+            bucket.rate = min(self.chat_rate, bucket.rate * 1.05)
+        if self.global_bucket.rate < self.global_rate:
+            self.global_bucket.rate = min(self.global_rate, self.global_bucket.rate + self.global_rate / 50)
+
+
+_rate_limiter = None
+
+
+def get_rate_limiter():
+    """Get the process-wide rate limiter shared by every migration."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter(
+            global_rate=config.RATE_LIMIT_GLOBAL_PER_SECOND,
+            chat_rate=config.RATE_LIMIT_CHAT_PER_SECOND,
+            min_chat_rate=config.RATE_LIMIT_MIN_CHAT_PER_SECOND,
+            max_retries=config.RATE_LIMIT_MAX_RETRIES
+        )
+    return _rate_limiter
@@ -0,0 +1,31 @@
+"""Rebuild the message_counters table from captured_messages.
+
+init_db() seeds the counters when it upgrades an existing database; run
+this any time /status and /stats look out of sync with the stored messages.
+The rebuild scans captured_messages once per counter scope, so prefer a
+quiet period on large databases.
+
+Usage:
+    python rebuild_counters.py
+"""
+import time
+from database import init_db
+from db_handler import DatabaseHandler
+
+
+def main():
+    init_db()
+
+    print('🔄 Rebuilding message counters...')
+    started = time.perf_counter()
+    rows = DatabaseHandler.rebuild_counters()
+    elapsed = time.perf_counter() - started
+
+    stats = DatabaseHandler.get_database_stats()
+    print(f'✅ Rebuilt {rows:,} counter rows in {elapsed:.1f}s')
+    print(f'   Groups: {stats["groups"]}')
+    print(f'   Messages: {stats["messages"]:,}')
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,7 @@
 import logging
 from telegram import Update
 from telegram.ext import ContextTypes
-from reinitialize import ReinitializationHandler
+from reinitialize import ReinitializationHandler, progress_text, queued_text, result_text
 import config
 
 logger = logging.getLogger(__name__)
@@ -29,7 +29,8 @@ async def reinitialize_command(update: Update, context: ContextTypes.DEFAULT_TYP
             "Example: `/reinitialize -1001234567890 -1009876543210`\n\n"
             "⚠️ **Webhook Mode Warning:**\n"
             "Large migrations may timeout after 10 seconds on Vercel. "
-            "Process will be killed but already sent messages will remain.",
+            "Run the same command again to resume from where it stopped, "
+            "and check progress with /reinit_status.",
             parse_mode='Markdown'
         )
         return
@@ -52,56 +53,55 @@ async def reinitialize_command(update: Update, context: ContextTypes.DEFAULT_TYP
     
     # Progress callback
     async def progress_callback(current, total):
-        progress_text = (
-            f"🔄 **Reinitialization in progress...**\n\n"
-            f"Progress: {current:,}/{total:,} messages\n"
-            f"Percentage: {(current/total*100):.1f}%"
-        )
         try:
-            await status_message.edit_text(progress_text, parse_mode='Markdown')
+            await status_message.edit_text(progress_text(current, total), parse_mode='Markdown')
         except Exception:
             pass  # Ignore edit errors
     
     # Perform reinitialization
-    try:
-        handler = ReinitializationHandler(context.bot)
-        result = await handler.reinitialize(
-            source_group_id,
-            target_group_id,
-            progress_callback
-        )
-        
-        # Format result message
-        result_text = (
-            f"✅ **Reinitialization Complete**\n\n"
-            f"Messages sent: {result['sent']:,}\n"
-            f"Messages failed: {result['failed']:,}\n"
-            f"Topics created: {result['topics_created']}\n"
-        )
-        
-        # Add error details if any
-        if result['errors']:
-            result_text += f"\n⚠️ **Errors encountered:** {len(result['errors'])}\n"
-            # Show first 5 errors
-            for error in result['errors'][:5]:
-                result_text += f"• Message {error['message_id']}: {error['error']}\n"
-            if len(result['errors']) > 5:
-                result_text += f"• ... and {len(result['errors']) - 5} more errors\n"
-        
-        await status_message.edit_text(result_text, parse_mode='Markdown')
-        logger.info(f"Reinitialization completed by {user.username}: {source_group_id} -> {target_group_id}")
-    
-    except ValueError as e:
-        await status_message.edit_text(f"❌ **Reinitialization Failed**\n\n{str(e)}")
-        logger.error(f"Reinitialization failed: {e}")
+    async def execute():
+        try:
+            if config.REINIT_USE_WORKER:
+                # job_worker.py runs the job and keeps editing the status message
+                job_id, queued = await ReinitializationHandler.enqueue(
+                    source_group_id,
+                    target_group_id,
+                    created_by=user.id,
+                    status_chat_id=status_message.chat_id,
+                    status_message_id=status_message.message_id
+                )
+                await status_message.edit_text(queued_text(job_id, queued), parse_mode='Markdown')
+                logger.info(f"Reinitialization job {job_id} queued by {user.username}: {source_group_id} -> {target_group_id}")
+                return
+                
+            handler = ReinitializationHandler(context.bot)
+            result = await handler.reinitialize(
+                source_group_id,
+                target_group_id,
+                progress_callback,
+                created_by=user.id
+            )
+                
+            await status_message.edit_text(result_text(result), parse_mode='Markdown')
+            logger.info(f"Reinitialization {result['status']} by {user.username}: {source_group_id} -> {target_group_id}")
+            
+        except ValueError as e:
+            await status_message.edit_text(f"❌ **Reinitialization Failed**\n\n{str(e)}")
+            logger.error(f"Reinitialization failed: {e}")
+            
+        except Exception as e:
+            await status_message.edit_text(
+                f"❌ **Reinitialization Failed**\n\n"
+                f"Error: {str(e)}\n\n"
+                f"Please check that:\n"
+                f"• The bot is a member of both groups\n"
+                f"• The bot has admin rights in both groups\n"
+                f"• The group IDs are correct"
+            )
+            logger.error(f"Reinitialization error: {e}", exc_info=True)
     
-    except Exception as e:
-        await status_message.edit_text(
-            f"❌ **Reinitialization Failed**\n\n"
-            f"Error: {str(e)}\n\n"
-            f"Please check that:\n"
-            f"• The bot is a member of both groups\n"
-            f"• The bot has admin rights in both groups\n"
-            f"• The group IDs are correct"
-        )
-        logger.error(f"Reinitialization error: {e}", exc_info=True)
+    if config.REINIT_USE_WORKER:
+        await execute()
+    else:
+        # Run in the background so this chat's next updates (e.g. /reinit_pause) are not held behind it
+        context.application.create_task(execute(), update=update)
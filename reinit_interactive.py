@@ -7,8 +7,7 @@ from telegram.ext import (
     CommandHandler,
     CallbackQueryHandler
 )
-from reinitialize import ReinitializationHandler
-from db_handler import DatabaseHandler
+from async_db_handler import AsyncDatabaseHandler, with_db_priority
 import config
 
 logger = logging.getLogger(__name__)
@@ -31,7 +30,7 @@ async def start_reinitialize(update: Update, context: ContextTypes.DEFAULT_TYPE)
         return ConversationHandler.END
     
     # Get all groups
-    groups = DatabaseHandler.get_all_groups()
+    groups = await AsyncDatabaseHandler.get_all_groups()
     
     if len(groups) < 2:
         await update.message.reply_text(
@@ -54,7 +53,8 @@ async def start_reinitialize(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await update.message.reply_text(
         "🔄 **Reinitialize: Step 1/2**\n\n"
         "Select the **source group** (where to copy messages FROM):\n\n"
-        "⚠️ Note: Large migrations may timeout on Vercel (10s limit).",
+        "⚠️ Note: Large migrations may timeout on Vercel (10s limit); "
+        "start the same migration again to resume it.",
         reply_markup=reply_markup,
         parse_mode='Markdown'
     )
@@ -76,7 +76,7 @@ async def select_source(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data['source_id'] = source_id
     
     # Get source group info
-    groups = DatabaseHandler.get_all_groups()
+    groups = await AsyncDatabaseHandler.get_all_groups()
     source_group = next((g for g in groups if g['group_id'] == source_id), None)
     
     if not source_group:
@@ -127,7 +127,7 @@ async def select_target(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data['target_id'] = target_id
     
     # Get target group info
-    groups = DatabaseHandler.get_all_groups()
+    groups = await AsyncDatabaseHandler.get_all_groups()
     target_group = next((g for g in groups if g['group_id'] == target_id), None)
     
     if not target_group:
@@ -149,7 +149,7 @@ async def select_target(update: Update, context: ContextTypes.DEFAULT_TYPE):
     source_id = context.user_data['source_id']
     
     # Get message count
-    groups = DatabaseHandler.get_all_groups()
+    groups = await AsyncDatabaseHandler.get_all_groups()
     source_group = next((g for g in groups if g['group_id'] == source_id), None)
     msg_count = source_group['message_count'] if source_group else 0
     
@@ -200,52 +200,55 @@ async def confirm_and_execute(update: Update, context: ContextTypes.DEFAULT_TYPE
     
     # Progress callback
     async def progress_callback(current, total):
-        progress_text = (
-            f"🔄 **Reinitialization in progress...**\n\n"
-            f"Progress: {current:,}/{total:,} messages\n"
-            f"Percentage: {(current/total*100):.1f}%"
-        )
         try:
-            await status_message.edit_text(progress_text, parse_mode='Markdown')
+            await status_message.edit_text(progress_text(current, total), parse_mode='Markdown')
         except Exception:
             pass
     
-    # Perform reinitialization
-    try:
-        handler = ReinitializationHandler(context.bot)
-        result = await handler.reinitialize(
-            source_id,
-            target_id,
-            progress_callback
-        )
-        
-        # Format result
-        result_text = (
-            f"✅ **Reinitialization Complete**\n\n"
-            f"Messages sent: {result['sent']:,}\n"
-            f"Messages failed: {result['failed']:,}\n"
-            f"Topics created: {result['topics_created']}\n"
-        )
-        
-        if result['errors']:
-            result_text += f"\n⚠️ **Errors:** {len(result['errors'])}\n"
-            for error in result['errors'][:5]:
-                result_text += f"• Message {error['message_id']}: {error['error']}\n"
-            if len(result['errors']) > 5:
-                result_text += f"• ... and {len(result['errors']) - 5} more errors\n"
-        
-        await status_message.edit_text(result_text, parse_mode='Markdown')
-        logger.info(f"Reinitialization completed: {source_id} -> {target_id}")
-    
-    except Exception as e:
-        await status_message.edit_text(
-            f"❌ **Reinitialization Failed**\n\n"
-            f"Error: {str(e)}\n\n"
-            f"Please check that:\n"
-            f"• Bot is admin in both groups\n"
-            f"• Group IDs are correct"
-        )
-        logger.error(f"Reinitialization error: {e}", exc_info=True)
+    # Perform reinitialization (imported on first use to keep cold starts short)
+    from reinitialize import ReinitializationHandler, progress_text, queued_text, result_text
+    
+    async def execute():
+        try:
+            if config.REINIT_USE_WORKER:
+                # job_worker.py runs the job and keeps editing the status message
+                job_id, queued = await ReinitializationHandler.enqueue(
+                    source_id,
+                    target_id,
+                    created_by=update.effective_user.id,
+                    status_chat_id=status_message.chat_id,
+                    status_message_id=status_message.message_id
+                )
+                await status_message.edit_text(queued_text(job_id, queued), parse_mode='Markdown')
+                logger.info(f"Reinitialization job {job_id} queued: {source_id} -> {target_id}")
+                return
+                
+            handler = ReinitializationHandler(context.bot)
+            result = await handler.reinitialize(
+                source_id,
+                target_id,
+                progress_callback,
+                created_by=update.effective_user.id
+            )
+                
+            await status_message.edit_text(result_text(result), parse_mode='Markdown')
+            logger.info(f"Reinitialization {result['status']}: {source_id} -> {target_id}")
+            
+        except Exception as e:
+            await status_message.edit_text(
+                f"❌ **Reinitialization Failed**\n\n"
+                f"Error: {str(e)}\n\n"
+                f"Please check that:\n"
+                f"• Bot is admin in both groups\n"
+                f"• Group IDs are correct"
+            )
+            logger.error(f"Reinitialization error: {e}", exc_info=True)
+            
+    if config.REINIT_USE_WORKER:
+        await execute()
+    else:
+        # Run in the background so this chat's next updates (e.g. /reinit_pause) are not held behind it
+        context.application.create_task(execute(), update=update)
     
     return ConversationHandler.END
 
@@ -254,7 +257,7 @@ async def start_reinitialize_from_callback(update: Update, context: ContextTypes
     """Restart from callback (for back button)."""
     query = update.callback_query
     
-    groups = DatabaseHandler.get_all_groups()
+    groups = await AsyncDatabaseHandler.get_all_groups()
     
     keyboard = []
     for group in groups:
@@ -281,7 +284,7 @@ async def select_source_from_callback(update: Update, context: ContextTypes.DEFA
     source_id = context.user_data.get('source_id')
     source_name = context.user_data.get('source_name')
     
-    groups = DatabaseHandler.get_all_groups()
+    groups = await AsyncDatabaseHandler.get_all_groups()
     source_group = next((g for g in groups if g['group_id'] == source_id), None)
     
     query = update.callback_query
@@ -318,14 +321,16 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # Create the conversation handler
 def get_reinitialize_handler():
     """Get the reinitialize conversation handler."""
+    # The selection steps get priority database access like the admin commands; the
+    # confirm step does not, as the migration it starts would inherit the priority
     return ConversationHandler(
-        entry_points=[CommandHandler('reinitialize', start_reinitialize)],
+        entry_points=[CommandHandler('reinitialize', with_db_priority(start_reinitialize))],
         states={
             SELECT_SOURCE: [
-                CallbackQueryHandler(select_source)
+                CallbackQueryHandler(with_db_priority(select_source))
             ],
             SELECT_TARGET: [
-                CallbackQueryHandler(select_target)
+                CallbackQueryHandler(with_db_priority(select_target))
             ],
             CONFIRM: [
                 CallbackQueryHandler(confirm_and_execute)
@@ -1,68 +1,287 @@
 """Reinitialization logic for migrating messages between groups."""
-import logging
 import asyncio
-from telegram import Bot
-from telegram.error import TelegramError, RetryAfter, BadRequest
-from db_handler import DatabaseHandler
+import json
+import logging
+import os
+import socket
+import time
+from datetime import datetime
+from telegram import Bot, InputMediaAudio, InputMediaDocument, InputMediaPhoto, InputMediaVideo
+from telegram.error import TelegramError, BadRequest
+from async_db_handler import AsyncDatabaseHandler
+from rate_limiter import get_rate_limiter
 import config
 
 logger = logging.getLogger(__name__)
 
+# Captured message types copyMessages can reproduce (service messages cannot be copied)
+COPYABLE_TYPES = {
+    'text', 'photo', 'video', 'document', 'audio', 'voice', 'video_note',
+    'sticker', 'animation', 'location', 'poll', 'contact', 'venue',
+}
+COPY_BATCH_SIZE = 100  # copyMessages limit per call
+
+# Album items re-sent together with sendMediaGroup (up to 10 per call)
+ALBUM_MEDIA = {
+    'photo': InputMediaPhoto, 'video': InputMediaVideo,
+    'document': InputMediaDocument, 'audio': InputMediaAudio,
+}
+ALBUM_SIZE = 10
+
+# Stop request -> status the job is left in ("requeue" is used when a worker shuts down)
+STOP_STATUSES = {'pause': 'paused', 'cancel': 'cancelled', 'requeue': 'pending'}
+
+
+def runner_id(role):
+    """Identify this process as a job runner (stored in migration_jobs.worker_id)."""
+    return f"{role}:{socket.gethostname()}:{os.getpid()}"
+
+
+def progress_text(current, total):
+    """Format a progress update for the admin's status message."""
+    return (
+        f"🔄 **Reinitialization in progress...**\n\n"
+        f"Progress: {current:,}/{total:,} messages\n"
+        f"Percentage: {(current/total*100):.1f}%"
+    )
+
+
+def queued_text(job_id, queued):
+    """Format the reply to a migration handed to job_worker.py."""
+    if not queued:
+        return (
+            f"ℹ️ **Already in progress** (job #{job_id})\n\n"
+            f"This migration is already queued or running. Check /reinit_status {job_id}."
+        )
+    return (
+        f"📥 **Reinitialization queued** (job #{job_id})\n\n"
+        f"A worker will start it shortly and update this message.\n"
+        f"Use /reinit_pause {job_id} or /reinit_cancel {job_id} to stop it."
+    )
+
+
+def result_text(result):
+    """Format the outcome of a reinitialization for the admin's status message."""
+    headers = {
+        'completed': "✅ **Reinitialization Complete**",
+        'paused': "⏸ **Reinitialization Paused**",
+        'cancelled': "🛑 **Reinitialization Cancelled**",
+        'pending': "⏳ **Reinitialization Interrupted**",
+    }
+    text = (
+        f"{headers[result['status']]} (job #{result['job_id']}"
+        f"{', resumed' if result['resumed'] else ''})\n\n"
+        f"Messages sent: {result['sent']:,}\n"
+        f"Messages failed: {result['failed']:,}\n"
+        f"Topics created: {result['topics_created']}\n"
+        f"API calls: {result['api_calls']:,} ({result['api_calls_saved']:,} saved, {result['mode']} mode)\n"
+    )
+    if result.get('albums'):
+        text += f"Albums: {result['albums']:,} re-sent as media groups\n"
+    if result.get('topic_throughput'):
+        text += "\n📊 **Per-topic throughput:**\n"
+        for topic in result['topic_throughput'][:10]:
+            rate = topic['messages'] / max(topic['seconds'], 0.1)
+            text += f"• {topic['topic']}: {topic['messages']:,} messages in {topic['seconds']:.0f}s ({rate:.1f}/s)\n"
+        if len(result['topic_throughput']) > 10:
+            text += f"• ... and {len(result['topic_throughput']) - 10} more topics\n"
+    if result['status'] == 'paused':
+        text += f"\nUse /reinit_resume {result['job_id']} to continue.\n"
+    elif result['status'] == 'pending':
+        text += "\nThe job was queued again and continues when a worker picks it up.\n"
+    
+    # Add error details if any
+    if result['errors']:
+        text += f"\n⚠️ **Errors encountered:** {len(result['errors'])}\n"
+        # Show first 5 errors
+        for error in result['errors'][:5]:
+            text += f"• Message {error['message_id']}: {error['error']}\n"
+        if len(result['errors']) > 5:
+            text += f"• ... and {len(result['errors']) - 5} more errors\n"
+    return text
+
 
 class ReinitializationHandler:
     """Handle reinitialization of messages to a new group."""
     
-    def __init__(self, bot: Bot):
+    def __init__(self, bot: Bot, rate_limiter=None):
         self.bot = bot
+        self.rate_limiter = rate_limiter or get_rate_limiter()
         self.errors = []
+        self.counts = {}
+        self.job_id = None
+        self._copy_enabled = False
+        self._control = None  # stop request ('pause', 'cancel' or 'requeue')
+        self._checkpointed = 0
+        self._checkpoint_lock = None
+        self._last_done = None  # (timestamp, id) of the last message sent or given up on
+        self._topic_mapping = {}
+        self._topic_checkpoints = None  # pipeline key -> [ISO timestamp, id] when topics run in parallel
+        self._processed = 0
     
-    async def reinitialize(self, source_group_id, target_group_id, progress_callback=None):
+    @staticmethod
+    async def validate(source_group_id):
         """
-        Reinitialize messages from source group to target group.
-        
-        Args:
-            source_group_id: Source group ID
-            target_group_id: Target group ID
-            progress_callback: Optional callback function for progress updates
+        Check that a source group can be migrated.
         
         Returns:
-            Dictionary with statistics about the reinitialization
+            Number of captured messages in the group
         """
-        self.errors = []
-        
         # Get source group info
-        source_group = DatabaseHandler.get_group_by_id(source_group_id)
+        source_group = await AsyncDatabaseHandler.get_group_by_id(source_group_id)
         if not source_group:
             raise ValueError(f"Source group {source_group_id} not found in database")
         
-        # Get all messages from source group
-        messages = DatabaseHandler.get_messages_for_group(source_group_id)
-        total_messages = len(messages)
+        # Count messages up front; the messages themselves are streamed in pages
+        total_messages = await AsyncDatabaseHandler.count_messages_for_group(source_group_id)
         
         if total_messages == 0:
             raise ValueError(f"No messages found for group {source_group_id}")
+        return total_messages
+    
+    @staticmethod
+    async def enqueue(source_group_id, target_group_id, mode=None, created_by=None,
+                      status_chat_id=None, status_message_id=None):
+        """
+        Queue a migration for job_worker.py, reusing the pair's unfinished job if any.
         
-        logger.info(f"Starting reinitialization: {total_messages} messages from {source_group_id} to {target_group_id}")
+        Returns:
+            (job ID, whether it was newly queued); False means it is already queued or running
+        """
+        await ReinitializationHandler.validate(source_group_id)
+        return await AsyncDatabaseHandler.enqueue_migration_job(
+            source_group_id, target_group_id, mode or config.REINIT_MODE, config.REINIT_JOB_STALE_AFTER,
+            created_by=created_by, status_chat_id=status_chat_id, status_message_id=status_message_id
+        )
+    
+    async def reinitialize(self, source_group_id, target_group_id, progress_callback=None, mode=None, created_by=None):
+        """
+        Reinitialize messages from source group to target group in this process.
         
-        # Check if target is a forum group and get topics
-        topics = DatabaseHandler.get_topics_for_group(source_group_id)
-        topic_mapping = {}  # Map old topic IDs to new topic IDs
-        topics_created = 0
+        Progress is recorded as a migration job whose checkpoint is committed as
+        messages are sent. If the pair already has an unfinished job (interrupted,
+        paused or failed), it is resumed from its checkpoint (with its topic
+        mapping and mode) instead of starting over.
         
-        # Try to detect if target is a forum
+        Args:
+            source_group_id: Source group ID
+            target_group_id: Target group ID
+            progress_callback: Optional callback function for progress updates
+            mode: "resend" (from stored content) or "copy" (copyMessages from the
+                source group, which must still exist); defaults to REINIT_MODE
+            created_by: Optional user ID of the admin starting the job
+        
+        Returns:
+            Dictionary with statistics about the reinitialization
+        """
+        await self.validate(source_group_id)
+        
+        job = await AsyncDatabaseHandler.get_unfinished_migration_job(source_group_id, target_group_id)
+        if job:
+            claimed = await AsyncDatabaseHandler.claim_migration_job(
+                runner_id('inline'), config.REINIT_JOB_STALE_AFTER, job_id=job.id
+            )
+            if claimed is None:
+                raise ValueError(
+                    f"Job #{job.id} for these groups is already {job.status}. "
+                    f"Check /reinit_status (an interrupted job can be resumed "
+                    f"{config.REINIT_JOB_STALE_AFTER}s after its last update)."
+                )
+            job = claimed
+        else:
+            job_id = await AsyncDatabaseHandler.create_migration_job(
+                source_group_id, target_group_id, mode or config.REINIT_MODE,
+                created_by=created_by, worker_id=runner_id('inline')
+            )
+            job = await AsyncDatabaseHandler.get_migration_job(job_id)
+        return await self.run_job(job, progress_callback)
+    
+    async def run_job(self, job, progress_callback=None):
+        """
+        Run a claimed job from its checkpoint until it completes or is stopped.
+        
+        Returns:
+            Dictionary with statistics about the reinitialization; 'status' is
+            'completed', or the status the job was stopped in
+        """
+        self.errors = []
+        self.job_id = job.id
+        self._control = None
+        self._last_done = None
+        self._checkpointed = job.processed
+        self.counts = {
+            'sent': job.sent, 'failed': job.failed, 'api_calls': job.api_calls,
+            'copy_calls': 0, 'copied': 0, 'album_calls': 0, 'album_items': 0,
+        }
+        topic_mapping = {int(k): v for k, v in json.loads(job.topic_mapping or '{}').items()}
+        self._topic_mapping = topic_mapping
+        self._topic_checkpoints = json.loads(job.topic_checkpoints) if job.topic_checkpoints else None
+        self._checkpoint_lock = asyncio.Lock()
+        after = None
+        if job.checkpoint_id is not None:
+            after = (job.checkpoint_timestamp, job.checkpoint_id)
+        
+        heartbeat = asyncio.create_task(self._heartbeat())
         try:
-            chat = await self.bot.get_chat(target_group_id)
-            is_forum = chat.is_forum
+            total_messages = await self.validate(job.source_group_id)
+            await AsyncDatabaseHandler.update_migration_job(self.job_id, total_messages=total_messages)
+            if after is None and not self._topic_checkpoints:
+                logger.info(f"Starting reinitialization job {self.job_id}: {total_messages} messages from {job.source_group_id} to {job.target_group_id}")
+            else:
+                logger.info(f"Resuming job {self.job_id} after {job.processed} of {total_messages} messages")
+            result = await self._run(
+                job.source_group_id, job.target_group_id, job.mode, topic_mapping, after,
+                job.processed, total_messages, progress_callback
+            )
         except Exception as e:
-            logger.warning(f"Could not get chat info: {e}")
-            is_forum = False
+            await AsyncDatabaseHandler.update_migration_job(self.job_id, status='failed', error=str(e))
+            raise
+        finally:
+            heartbeat.cancel()
+        result['job_id'] = self.job_id
+        result['resumed'] = job.processed > 0
+        return result
+    
+    def request_stop(self, control='requeue'):
+        """Stop the running job after the message in flight (by default queueing it again)."""
+        self._control = control
+    
+    async def _heartbeat(self):
+        """Keep the job's row fresh while it runs and pick up pause/cancel requests."""
+        while True:
+            await asyncio.sleep(config.REINIT_JOB_HEARTBEAT_INTERVAL)
+            try:
+                control = await AsyncDatabaseHandler.update_migration_job(self.job_id)
+            except Exception as e:
+                logger.warning(f"Heartbeat for job {self.job_id} failed: {e}")
+                continue
+            self._control = self._control or control
+    
+    async def _run(self, source_group_id, target_group_id, mode, topic_mapping, after,
+                   processed, total_messages, progress_callback):
+        """Create missing topics and send the messages after the checkpoint."""
+        # Check if target is a forum group and get topics
+        topics = await AsyncDatabaseHandler.get_topics_for_group(source_group_id)
+        topics_created = 0
+        
+        # Detect if target is a forum; a guess could send a resumed job's messages to
+        # the wrong threads, so the run fails if the chat cannot be read
+        chat = await self.rate_limiter.call(target_group_id, self.bot.get_chat, target_group_id)
+        is_forum = chat.is_forum
+        if self._topic_checkpoints and not is_forum:
+            # Sending sequentially would restart from the first message (per-topic jobs have no job-wide checkpoint)
+            raise ValueError(f"Target group {target_group_id} is no longer a forum; job #{self.job_id} cannot resume its topics")
         
-        # Create topics in target group if it's a forum
+        # Create topics in target group if it's a forum (a resumed job already has some)
         if is_forum and topics:
             for topic in topics:
+                if topic.topic_id in topic_mapping:
+                    continue
                 try:
                     # Create forum topic in target group
-                    forum_topic = await self.bot.create_forum_topic(
+                    forum_topic = await self.rate_limiter.call(
+                        target_group_id,
+                        self.bot.create_forum_topic,
                         chat_id=target_group_id,
                         name=topic.topic_name
                     )
@@ -71,65 +290,333 @@ class ReinitializationHandler:
                     logger.info(f"Created topic '{topic.topic_name}' with ID {forum_topic.message_thread_id}")
                 except Exception as e:
                     logger.error(f"Failed to create topic '{topic.topic_name}': {e}")
+                    continue
+                fields = {'topic_mapping': json.dumps(topic_mapping)}
+                general = (self._topic_checkpoints or {}).get('general')
+                if general:
+                    # Created on resume: the General pipeline already sent the topic's
+                    # messages up to its checkpoint, so the topic's own pipeline starts there
+                    self._topic_checkpoints[str(topic.topic_id)] = general
+                    fields['topic_checkpoints'] = json.dumps(self._topic_checkpoints)
+                # Saved right away so a resumed job never creates the topic twice
+                await AsyncDatabaseHandler.update_migration_job(self.job_id, **fields)
         
         # Send messages to target group
-        sent_count = 0
-        failed_count = 0
+        self._copy_enabled = mode == 'copy'
+        self._processed = processed
+        topic_throughput = []
         
-        for i, message in enumerate(messages):
-            try:
-                # Determine message thread ID for forum groups
-                message_thread_id = None
-                if is_forum and message.topic_id and message.topic_id in topic_mapping:
-                    message_thread_id = topic_mapping[message.topic_id]
-                
-                # Send message based on type
-                await self._send_message(
-                    target_group_id,
-                    message,
-                    message_thread_id
-                )
-                
-                sent_count += 1
-                
-                # Progress update
-                if progress_callback and (i + 1) % config.PROGRESS_UPDATE_INTERVAL == 0:
-                    await progress_callback(i + 1, total_messages)
-                
-                # Rate limiting
-                await asyncio.sleep(1 / config.MESSAGES_PER_SECOND)
-                
-            except RetryAfter as e:
-                # Handle flood control
-                wait_time = e.retry_after
-                logger.warning(f"Rate limited. Waiting {wait_time} seconds...")
-                await asyncio.sleep(wait_time)
-                # Retry this message
-                try:
-                    await self._send_message(target_group_id, message, message_thread_id)
-                    sent_count += 1
-                except Exception as retry_error:
-                    failed_count += 1
-                    self._log_error(message, retry_error)
-            
-            except Exception as e:
-                failed_count += 1
-                self._log_error(message, e)
+        def thread_for(message):
+            """Determine message thread ID for forum groups."""
+            if is_forum and message.topic_id and message.topic_id in topic_mapping:
+                return topic_mapping[message.topic_id]
+            return None
         
-        # Final progress update
-        if progress_callback:
-            await progress_callback(total_messages, total_messages)
+        # A job that already has per-topic checkpoints must continue in pipelines
+        if is_forum and (config.REINIT_TOPIC_CONCURRENCY > 1 or self._topic_checkpoints):
+            topic_names = {topic.topic_id: topic.topic_name for topic in topics}
+            topic_throughput = await self._run_topics(
+                source_group_id, target_group_id, topic_mapping, topic_names, after,
+                thread_for, total_messages, progress_callback
+            )
+        else:
+            self._topic_checkpoints = None
+            messages = AsyncDatabaseHandler.iter_messages_for_group(
+                source_group_id, chunk_size=config.REINIT_PAGE_SIZE, after=after
+            )
+            await self._pipeline(
+                source_group_id, target_group_id, messages, thread_for, total_messages, progress_callback
+            )
+        
+        if self._control:
+            status = STOP_STATUSES.get(self._control, 'paused')
+            fields = {'status': status, 'control': None}
+            if status == 'cancelled':
+                fields['finished_at'] = datetime.utcnow()
+            await self._checkpoint(**fields)
+        else:
+            status = 'completed'
+            await self._checkpoint(status=status, finished_at=datetime.utcnow())
+            
+            # Final progress update
+            if progress_callback:
+                await progress_callback(total_messages, total_messages)
         
-        logger.info(f"Reinitialization complete: {sent_count} sent, {failed_count} failed")
+        sent_count = self.counts['sent']
+        failed_count = self.counts['failed']
+        api_calls = self.counts['api_calls']
+        logger.info(
+            f"Reinitialization job {self.job_id} {status}: {sent_count} sent, {failed_count} failed, "
+            f"{api_calls} API calls ({self.counts['copied']} messages copied in "
+            f"{self.counts['copy_calls']} batches, {self.counts['album_items']} album items in "
+            f"{self.counts['album_calls']} albums)"
+        )
         
         return {
+            'status': status,
             'total_messages': total_messages,
             'sent': sent_count,
             'failed': failed_count,
             'topics_created': topics_created,
+            'mode': mode,
+            'api_calls': api_calls,
+            'api_calls_saved': max(0, sent_count + failed_count - api_calls),
+            'albums': self.counts['album_calls'],
+            'topic_throughput': topic_throughput,
             'errors': self.errors
         }
     
+    async def _pipeline(self, source_group_id, target_group_id, messages, thread_for,
+                        total_messages, progress_callback):
+        """
+        Send a stream of messages in order, batching copyable runs in copy mode
+        and re-sending consecutive album items as one album otherwise.
+        
+        Returns:
+            Number of messages taken from the stream
+        """
+        batch = []  # consecutive copyable messages for one copyMessages call
+        batch_thread_id = None
+        album = []  # consecutive items of one album for one sendMediaGroup call
+        album_thread_id = None
+        count = 0
+        
+        async for message in messages:
+            if self._control:
+                # Messages still waiting in a batch are after the checkpoint and are sent on resume
+                return count
+            self._processed += 1
+            count += 1
+            message_thread_id = thread_for(message)
+            
+            if album and (
+                message.media_group_id != album[0].media_group_id
+                or message_thread_id != album_thread_id
+                or len(album) >= ALBUM_SIZE
+            ):
+                await self._send_album(target_group_id, album, album_thread_id)
+                album = []
+            
+            if self._copy_enabled and message.message_type in COPYABLE_TYPES:
+                # A batch must target one thread and list message IDs in ascending order
+                # (copyMessages keeps album items grouped)
+                if batch and (
+                    message_thread_id != batch_thread_id
+                    or message.message_id <= batch[-1].message_id
+                    or len(batch) >= COPY_BATCH_SIZE
+                ):
+                    await self._copy_batch(source_group_id, target_group_id, batch, batch_thread_id)
+                    batch = []
+                batch.append(message)
+                batch_thread_id = message_thread_id
+            elif message.media_group_id and message.message_type in ALBUM_MEDIA:
+                if batch:
+                    await self._copy_batch(source_group_id, target_group_id, batch, batch_thread_id)
+                    batch = []
+                album.append(message)
+                album_thread_id = message_thread_id
+            else:
+                if batch:
+                    await self._copy_batch(source_group_id, target_group_id, batch, batch_thread_id)
+                    batch = []
+                await self._resend(target_group_id, message, message_thread_id)
+            
+            await self._checkpoint()
+            
+            # Progress update
+            if progress_callback and self._processed % config.PROGRESS_UPDATE_INTERVAL == 0:
+                await progress_callback(self._processed, total_messages)
+        
+        if batch and not self._control:
+            await self._copy_batch(source_group_id, target_group_id, batch, batch_thread_id)
+        if album and not self._control:
+            await self._send_album(target_group_id, album, album_thread_id)
+        return count
+    
+    async def _run_topics(self, source_group_id, target_group_id, topic_mapping, topic_names, after,
+                          thread_for, total_messages, progress_callback):
+        """
+        Send each created topic (plus General, which also takes messages of
+        topics that could not be created) in its own ordered pipeline, at most
+        REINIT_TOPIC_CONCURRENCY at a time.
+        
+        Returns:
+            Per-topic throughput, busiest topic first
+        """
+        if self._topic_checkpoints is None:
+            self._topic_checkpoints = {}
+        # Pipeline key -> message filter; order within each target thread is preserved
+        pipelines = {str(topic_id): {'topic_ids': [topic_id]} for topic_id in topic_mapping}
+        pipelines['general'] = {'exclude_topic_ids': list(topic_mapping)}
+        semaphore = asyncio.Semaphore(max(1, config.REINIT_TOPIC_CONCURRENCY))
+        throughput = []
+        
+        async def run_pipeline(key, topic_filter):
+            async with semaphore:
+                if self._control:
+                    return
+                # Topics without their own checkpoint continue from the job-wide one (if any)
+                checkpoint = self._topic_checkpoints.get(key)
+                topic_after = after
+                if checkpoint:
+                    topic_after = (datetime.fromisoformat(checkpoint[0]), checkpoint[1])
+                messages = AsyncDatabaseHandler.iter_messages_for_group(
+                    source_group_id, chunk_size=config.REINIT_PAGE_SIZE, after=topic_after, **topic_filter
+                )
+                started = time.monotonic()
+                count = await self._pipeline(
+                    source_group_id, target_group_id, messages, thread_for, total_messages, progress_callback
+                )
+                if count:
+                    seconds = time.monotonic() - started
+                    name = 'General' if key == 'general' else topic_names.get(int(key), key)
+                    throughput.append({'topic': name, 'messages': count, 'seconds': round(seconds, 1)})
+                    logger.info(f"Job {self.job_id} topic '{name}': {count} messages in {seconds:.1f}s ({count / max(seconds, 0.001):.1f}/s)")
+        
+        tasks = [asyncio.create_task(run_pipeline(key, topic_filter)) for key, topic_filter in pipelines.items()]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return sorted(throughput, key=lambda topic: topic['messages'], reverse=True)
+    
+    def _pipeline_key(self, topic_id):
+        """Get the pipeline (and topic checkpoint) key a message belongs to."""
+        return str(topic_id) if topic_id in self._topic_mapping else 'general'
+    
+    def _mark_done(self, message):
+        """Record a message as sent or given up on, for the next checkpoint."""
+        if self._topic_checkpoints is None:
+            self._last_done = (message.timestamp, message.id)
+        else:
+            key = self._pipeline_key(message.topic_id)
+            self._topic_checkpoints[key] = [message.timestamp.isoformat(), message.id]
+    
+    async def _checkpoint(self, **fields):
+        """
+        Commit the job's checkpoint once REINIT_CHECKPOINT_INTERVAL messages were
+        handled since the last one (always when extra fields, e.g. a final status, are given).
+        """
+        handled = self.counts['sent'] + self.counts['failed']
+        if not fields and handled - self._checkpointed < config.REINIT_CHECKPOINT_INTERVAL:
+            return
+        # Topic pipelines checkpoint concurrently; the lock keeps an older snapshot from landing last
+        async with self._checkpoint_lock:
+            handled = self.counts['sent'] + self.counts['failed']
+            if not fields and handled - self._checkpointed < config.REINIT_CHECKPOINT_INTERVAL:
+                return
+            if self._topic_checkpoints is not None:
+                fields['topic_checkpoints'] = json.dumps(self._topic_checkpoints)
+            elif self._last_done is not None:
+                fields['checkpoint_timestamp'], fields['checkpoint_id'] = self._last_done
+            control = await AsyncDatabaseHandler.update_migration_job(
+                self.job_id,
+                processed=handled,
+                sent=self.counts['sent'],
+                failed=self.counts['failed'],
+                api_calls=self.counts['api_calls'],
+                **fields
+            )
+            self._checkpointed = handled
+            self._control = self._control or control
+    
+    async def _call(self, chat_id, func, /, *args, **kwargs):
+        """Send within the rate limits, counting every attempt (retries included) in api_calls."""
+        async def attempt():
+            self.counts['api_calls'] += 1
+            return await func(*args, **kwargs)
+        return await self.rate_limiter.call(chat_id, attempt)
+    
+    async def _resend(self, chat_id, message, message_thread_id=None):
+        """Re-send one message from its stored content within the rate limits."""
+        try:
+            await self._call(chat_id, self._send_message, chat_id, message, message_thread_id)
+            self.counts['sent'] += 1
+        except Exception as e:
+            self.counts['failed'] += 1
+            self._log_error(message, e)
+        self._mark_done(message)
+    
+    async def _copy_batch(self, from_chat_id, chat_id, batch, message_thread_id=None):
+        """Copy a run of messages with one copyMessages call, re-sending them if it fails."""
+        message_ids = [message.message_id for message in batch]
+        try:
+            copied = await self._call(
+                chat_id,
+                self.bot.copy_messages,
+                chat_id=chat_id,
+                from_chat_id=from_chat_id,
+                message_ids=message_ids,
+                message_thread_id=message_thread_id
+            )
+        except TelegramError as e:
+            logger.warning(f"copyMessages failed for {len(batch)} messages ({e}), re-sending them one by one")
+            if isinstance(e, BadRequest) and 'chat not found' in str(e).lower():
+                # The source group is gone: copying can never work again
+                logger.warning("Source group not reachable, switching to re-sending messages")
+                self._copy_enabled = False
+            for message in batch:
+                await self._resend(chat_id, message, message_thread_id)
+            return
+        
+        if not copied:
+            # Every message was deleted from the source group: rebuild them from their stored content
+            logger.warning(f"copyMessages skipped all {len(batch)} messages, re-sending them from stored content")
+            for message in batch:
+                await self._resend(chat_id, message, message_thread_id)
+            return
+        
+        self.counts['copy_calls'] += 1
+        self.counts['copied'] += len(copied)
+        self.counts['sent'] += len(copied)
+        self._mark_done(batch[-1])
+        
+        # Messages deleted from the source group are skipped by copyMessages. Only the new
+        # IDs are returned, so which ones were skipped is unknown and they cannot be re-sent
+        missing = len(batch) - len(copied)
+        if missing:
+            self.counts['failed'] += missing
+            self.errors.append({
+                'message_id': f"{message_ids[0]}-{message_ids[-1]}",
+                'error': f"{missing} of {len(batch)} messages no longer exist in the source group"
+            })
+            logger.error(f"copyMessages skipped {missing} of {len(batch)} messages {message_ids[0]}-{message_ids[-1]}")
+    
+    async def _send_album(self, chat_id, album, message_thread_id=None):
+        """Re-send an album's items with one sendMediaGroup call, one by one if it fails."""
+        if len(album) == 1:
+            # The rest of the album was not captured; a one-item album is just a message
+            await self._resend(chat_id, album[0], message_thread_id)
+            return
+        
+        media = []
+        for message in album:
+            caption = message.caption or None
+            if caption and len(caption) > 1024:
+                caption = caption[:1021] + "..."
+            media.append(ALBUM_MEDIA[message.message_type](media=message.file_id, caption=caption))
+        try:
+            await self._call(
+                chat_id,
+                self.bot.send_media_group,
+                chat_id=chat_id,
+                media=media,
+                message_thread_id=message_thread_id
+            )
+        except TelegramError as e:
+            # e.g. items of types Telegram does not allow in one album
+            logger.warning(f"sendMediaGroup failed for {len(album)} messages ({e}), re-sending them one by one")
+            for message in album:
+                await self._resend(chat_id, message, message_thread_id)
+            return
+        
+        self.counts['album_calls'] += 1
+        self.counts['album_items'] += len(album)
+        self.counts['sent'] += len(album)
+        self._mark_done(album[-1])
+    
     async def _send_message(self, chat_id, message, message_thread_id=None):
         """Send a single message to the target group."""
         if message.message_type == "text":
@@ -0,0 +1,351 @@
+"""Durable on-disk spool for captured messages the database cannot take right now.
+
+Rows are appended to segmented JSON-lines files and fsynced in batches. A
+background thread replays the oldest segment into the database once it is
+reachable again and deletes it when every row is stored. Replaying a
+segment twice is harmless because message writes are upserts on
+(group_id, message_id), so a crash mid-replay never loses or duplicates rows.
+
+While a backlog exists, new messages are spooled too, so rows reach the
+database in the order they were captured. A batch the database rejects
+because of its content (not its availability) is retried row by row, and
+rows that still fail are moved to a dead-letter file so they cannot hold
+up the rest of the backlog.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from sqlalchemy.exc import DataError, IntegrityError
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = 'spool-'
+SEGMENT_SUFFIX = '.jsonl'
+DEAD_LETTER_FILE = 'dead-letter.jsonl'
+
+# Errors caused by the rows themselves (bad values, or fields missing or malformed
+# when a row is turned into a message): retrying the same rows can never succeed.
+# ProgrammingError is not one of them: a missing table or column after a bad deploy
+# rejects every row, so those stay in the backlog and are retried.
+REJECTED_ROW_ERRORS = (DataError, IntegrityError, KeyError, TypeError, ValueError)
+
+
+def _encode(value):
+    """JSON fallback for message values (only timestamps are not JSON-native)."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot spool value of type {type(value).__name__}")
+
+
+def _read_segment(path):
+    """Read a segment's rows, skipping a torn last line left by a crash mid-write."""
+    rows = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                logger.warning(f"Skipping unreadable line in {os.path.basename(path)}")
+                continue
+            row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+            row.setdefault('media_group_id', None)  # spooled before albums were captured
+            rows.append(row)
+    return rows
+
+
+class MessageSpool:
+    """Append-only, segmented journal of captured messages with a background replayer."""
+
+    def __init__(self, directory, flush_fn, segment_rows=10000, fsync_rows=100,
+                 fsync_interval_ms=200, replay_batch=500, replay_interval_ms=1000,
+                 latency_threshold_ms=0):
+        """
+        Args:
+            directory: Directory holding the segment files (created if missing)
+            flush_fn: Callable taking a list of message dicts, returns True on success
+                (or raises, which lets rejected rows be told apart from an unavailable database)
+            segment_rows: Start a new segment file after this many rows
+            fsync_rows: fsync after this many unsynced rows...
+            fsync_interval_ms: ...or once the oldest unsynced row is this old
+            replay_batch: Rows per flush_fn call when replaying
+            replay_interval_ms: How often to sync and retry a replay
+            latency_threshold_ms: Divert writes to the spool while the average direct
+                write takes longer than this (0 disables)
+        """
+        self.directory = directory
+        self.flush_fn = flush_fn
+        self.segment_rows = segment_rows
+        self.fsync_rows = fsync_rows
+        self.fsync_interval = fsync_interval_ms / 1000
+        self.replay_batch = replay_batch
+        self.replay_interval = replay_interval_ms / 1000
+        self.latency_threshold_ms = latency_threshold_ms
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._file = None
+        self._file_path = None
+        self._unsynced = 0
+        self._first_unsynced_at = None
+        self._segments = {}  # path -> rows, oldest first
+        self._next_seq = 1
+        self._latency_ms = 0.0  # moving average of direct write latency
+        self._slow = False
+        self._thread = None
+        self._stopped = False
+        self._stats = {
+            'spooled': 0,
+            'replayed': 0,
+            'replay_failures': 0,
+            'dead_lettered': 0,
+            'fsyncs': 0,
+            'last_replay_rate': 0.0,
+            'last_error': None,
+        }
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_segments()
+
+    def should_divert(self):
+        """Check whether new writes must go to the spool (backlog or slow database)."""
+        with self._lock:
+            return bool(self._segments) or self._slow
+
+    def record_latency(self, elapsed_ms):
+        """Record a direct database write's latency; sustained slowness diverts writes."""
+        if not self.latency_threshold_ms:
+            return
+        with self._lock:
+            self._latency_ms = 0.8 * self._latency_ms + 0.2 * elapsed_ms
+            if not self._slow and self._latency_ms > self.latency_threshold_ms:
+                self._slow = True
+                logger.warning(
+                    f"Database writes averaging {self._latency_ms:.0f} ms, spooling new messages"
+                )
+
+    def append(self, rows):
+        """Append rows to the current segment (durable after the next batched fsync)."""
+        lines = ''.join(json.dumps(row, default=_encode) + '\n' for row in rows)
+        with self._wakeup:
+            if self._thread is None and not self._stopped:
+                self._start()
+            if self._file is None:
+                self._open_segment()
+            self._file.write(lines)
+            self._segments[self._file_path] += len(rows)
+            self._stats['spooled'] += len(rows)
+            if self._first_unsynced_at is None:
+                self._first_unsynced_at = time.monotonic()
+                # Let the replay thread schedule the batched fsync
+                self._wakeup.notify()
+            self._unsynced += len(rows)
+            if self._unsynced >= self.fsync_rows:
+                self._sync()
+            if self._segments[self._file_path] >= self.segment_rows:
+                self._close_segment()
+
+    def sync(self):
+        """fsync rows written since the last sync."""
+        with self._lock:
+            self._sync()
+
+    def stop(self):
+        """Stop the replayer and make every spooled row durable (the backlog stays on disk)."""
+        with self._wakeup:
+            self._stopped = True
+            self._wakeup.notify()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        with self._lock:
+            self._close_segment()
+
+    def get_stats(self):
+        """Get spool size, totals and the replay rate of the last replay pass."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = sum(self._segments.values())
+            stats['segments'] = len(self._segments)
+            stats['diverting'] = bool(self._segments) or self._slow
+            stats['avg_write_ms'] = self._latency_ms
+            paths = list(self._segments)
+        stats['bytes'] = sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+        return stats
+
+    def _load_segments(self):
+        """Pick up segments left behind by a previous run."""
+        names = sorted(
+            name for name in os.listdir(self.directory)
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        )
+        for name in names:
+            path = os.path.join(self.directory, name)
+            with open(path, encoding='utf-8') as f:
+                self._segments[path] = sum(1 for line in f if line.strip())
+            self._next_seq = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]) + 1
+        if self._segments:
+            logger.info(
+                f"Found {sum(self._segments.values()):,} spooled messages in "
+                f"{len(self._segments)} segments, replaying"
+            )
+            self._start()
+
+    def _open_segment(self):
+        """Open a new segment file (called with the lock held)."""
+        name = f"{SEGMENT_PREFIX}{self._next_seq:010d}{SEGMENT_SUFFIX}"
+        self._next_seq += 1
+        self._file_path = os.path.join(self.directory, name)
+        self._file = open(self._file_path, 'a', encoding='utf-8')
+        self._segments[self._file_path] = 0
+
+    def _close_segment(self):
+        """Sync and close the current segment so it can be replayed (lock held)."""
+        if self._file is None:
+            return
+        self._sync()
+        self._file.close()
+        self._file = None
+        self._file_path = None
+
+    def _sync(self):
+        """flush + fsync the current segment (called with the lock held)."""
+        if self._file is None or not self._unsynced:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._stats['fsyncs'] += 1
+        self._unsynced = 0
+        self._first_unsynced_at = None
+
+    def _start(self):
+        """Start the background replay thread."""
+        self._thread = threading.Thread(target=self._run, name='message-spool', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self):
+        """Background loop: fsync rows that have waited too long and replay every interval."""
+        next_replay = 0.0
+        while True:
+            with self._wakeup:
+                if self._stopped:
+                    return
+                now = time.monotonic()
+                deadline = next_replay
+                if self._first_unsynced_at is not None:
+                    deadline = min(deadline, self._first_unsynced_at + self.fsync_interval)
+                if deadline > now:
+                    self._wakeup.wait(deadline - now)
+                    continue
+                if self._first_unsynced_at is not None and \
+                        now - self._first_unsynced_at >= self.fsync_interval:
+                    self._sync()
+            if now >= next_replay:
+                try:
+                    self._replay()
+                except Exception as e:
+                    logger.error(f"Spool replay failed: {e}", exc_info=True)
+                next_replay = time.monotonic() + self.replay_interval
+
+    def _replay(self):
+        """Replay segments until the spool is empty or the database is unavailable."""
+        started = time.perf_counter()
+        replayed = 0
+        while not self._stopped:
+            with self._lock:
+                if not self._segments:
+                    break
+                path = next(iter(self._segments))
+                if path == self._file_path:
+                    # Replay the active segment too; new rows go to a fresh one
+                    self._close_segment()
+
+            rows = _read_segment(path)
+            done = self._replay_rows(rows)
+            replayed += done
+            with self._lock:
+                self._stats['replayed'] += done
+            if done < len(rows):
+                with self._lock:
+                    self._stats['replay_failures'] += 1
+                    self._stats['last_error'] = time.strftime('%Y-%m-%d %H:%M:%S')
+                logger.warning(f"Spool replay paused: database unavailable while replaying {os.path.basename(path)}")
+                if done:
+                    # Keep only the rest, so stored and dead-lettered rows are not handled again
+                    self._rewrite_segment(path, rows[done:])
+                break
+
+            os.remove(path)
+            with self._lock:
+                self._segments.pop(path, None)
+                if not self._segments:
+                    # Backlog drained: give direct writes another chance
+                    self._slow = False
+                    self._latency_ms = 0.0
+
+        if replayed:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._stats['last_replay_rate'] = replayed / elapsed if elapsed else 0.0
+            logger.info(f"Replayed {replayed:,} spooled messages ({replayed / elapsed:.0f} rows/s)")
+
+    def _replay_rows(self, rows):
+        """
+        Write rows in replay batches, retrying a failed batch row by row and
+        dead-lettering rows the database rejects.
+
+        Returns:
+            Number of leading rows handled (all of them unless the database is unavailable)
+        """
+        for offset in range(0, len(rows), self.replay_batch):
+            batch = rows[offset:offset + self.replay_batch]
+            if self._flush(batch) is None:
+                continue
+            for index, row in enumerate(batch):
+                error = self._flush([row])
+                if error is None:
+                    continue
+                if not isinstance(error, REJECTED_ROW_ERRORS):
+                    return offset + index
+                self._dead_letter(row, error)
+        return len(rows)
+
+    def _flush(self, rows):
+        """Write rows with flush_fn; returns the error (or False), or None on success."""
+        try:
+            if self.flush_fn(rows):
+                return None
+            return False
+        except Exception as e:
+            return e
+
+    def _dead_letter(self, row, error):
+        """Move a row the database keeps rejecting to the dead-letter file."""
+        line = json.dumps({'error': f"{type(error).__name__}: {error}", 'row': row}, default=_encode)
+        with self._lock:
+            with open(os.path.join(self.directory, DEAD_LETTER_FILE), 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self._stats['dead_lettered'] += 1
+        logger.error(
+            f"Dead-lettered spooled message {row.get('message_id')} from group {row.get('group_id')}: {error}"
+        )
+
+    def _rewrite_segment(self, path, rows):
+        """Replace a segment's contents with the rows still to replay (atomically)."""
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(row, default=_encode) + '\n' for row in rows))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+        with self._lock:
+            if path in self._segments:
+                self._segments[path] = len(rows)
@@ -0,0 +1,49 @@
+"""Message buffer: a failed batch is retried row by row, so only rejected rows are lost.
+
+Run with:
+    python -m pytest tests
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from message_buffer import MessageBuffer  # noqa: E402
+
+
+class MessageBufferTest(unittest.TestCase):
+    def setUp(self):
+        self.stored = []
+
+    def flush(self, rows):
+        """flush_fn stand-in that rejects any batch containing a negative message_id."""
+        if any(row['message_id'] < 0 for row in rows):
+            return False
+        self.stored.extend(row['message_id'] for row in rows)
+        return True
+
+    def test_failed_batch_keeps_the_good_rows(self):
+        buffer = MessageBuffer(self.flush, max_rows=1000, max_delay_ms=60000)
+        for message_id in (1, 2, -3, 4):
+            buffer.add({'message_id': message_id})
+
+        self.assertEqual(buffer.flush(), 4)
+        self.assertEqual(self.stored, [1, 2, 4])
+        stats = buffer.get_stats()
+        self.assertEqual((stats['failed_flushes'], stats['rows_recovered'], stats['rows_dropped']), (1, 3, 1))
+        self.assertEqual(stats['avg_flush_size'], 0)  # failed flushes are not averaged
+        buffer.stop()
+
+    def test_rows_added_after_stop_are_written(self):
+        buffer = MessageBuffer(self.flush, max_rows=1000, max_delay_ms=60000)
+        buffer.add({'message_id': 1})
+        buffer.stop()
+        buffer.add({'message_id': 2})
+
+        self.assertEqual(self.stored, [1, 2])
+        self.assertEqual(buffer.get_stats()['buffered'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
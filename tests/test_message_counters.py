@@ -0,0 +1,95 @@
+"""Message counters stay equal to a full recount as messages are saved and edited.
+
+Run with:
+    python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('BOT_TOKEN', '123:test')
+
+import database  # noqa: E402
+from database import MessageCounter, get_session  # noqa: E402
+from db_handler import DatabaseHandler  # noqa: E402
+
+GROUP_ID = -1002
+
+
+def message(message_id, topic_id=None, message_type='text', text='hello'):
+    return {
+        'group_id': GROUP_ID,
+        'group_name': 'Group',
+        'message_id': message_id,
+        'topic_id': topic_id,
+        'message_type': message_type,
+        'text_content': text,
+        'timestamp': datetime(2024, 1, 1),
+    }
+
+
+class MessageCounterTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.database_url = database.DATABASE_URL
+        database.dispose_engine()
+        database.DATABASE_URL = f"sqlite:///{os.path.join(self.tmp.name, 'counters.db')}"
+        database.init_db()
+
+    def tearDown(self):
+        database.dispose_engine()
+        database.DATABASE_URL = self.database_url
+        self.tmp.cleanup()
+
+    def counters(self):
+        session = get_session()
+        try:
+            rows = session.query(MessageCounter).filter(MessageCounter.count != 0).all()
+            return {(row.scope, row.group_id, row.topic_id, row.message_type): row.count for row in rows}
+        finally:
+            session.close()
+
+    def assert_counters_match_recount(self):
+        counted = self.counters()
+        DatabaseHandler.rebuild_counters()
+        self.assertEqual(counted, self.counters())
+
+    def test_new_messages_are_counted_once(self):
+        self.assertTrue(DatabaseHandler.save_messages_bulk([message(1), message(2, topic_id=5)]))
+        # Redelivered and edited messages are not new
+        self.assertTrue(DatabaseHandler.save_messages_bulk([message(1, text='edited'), message(3)]))
+        DatabaseHandler.save_message_now(message(2, topic_id=5, text='edited'))
+
+        counters = self.counters()
+        self.assertEqual(counters[('group', GROUP_ID, 0, '')], 3)
+        self.assertEqual(counters[('topic', GROUP_ID, 5, '')], 1)
+        self.assert_counters_match_recount()
+
+    def test_edit_moves_topic_and_type_counts(self):
+        DatabaseHandler.save_messages_bulk([message(1), message(2)])
+        DatabaseHandler.save_messages_bulk([message(1, topic_id=7, message_type='photo')])
+
+        counters = self.counters()
+        self.assertEqual(counters[('group', GROUP_ID, 0, '')], 2)
+        self.assertEqual(counters[('type', GROUP_ID, 0, 'text')], 1)
+        self.assertEqual(counters[('type', GROUP_ID, 0, 'photo')], 1)
+        self.assertEqual(counters[('topic', GROUP_ID, 7, '')], 1)
+        self.assert_counters_match_recount()
+
+    def test_rows_without_topic_keep_the_stored_topic(self):
+        DatabaseHandler.save_messages_bulk([message(1, topic_id=4)])
+        # e.g. a row spooled by an older version, without the topic_id key
+        edit = message(1, text='edited')
+        del edit['topic_id']
+        DatabaseHandler.save_messages_bulk([edit])
+
+        self.assertEqual(DatabaseHandler.get_message_page(GROUP_ID)[0].topic_id, 4)
+        self.assertEqual(self.counters()[('topic', GROUP_ID, 4, '')], 1)
+        self.assert_counters_match_recount()
+
+
+if __name__ == '__main__':
+    unittest.main()
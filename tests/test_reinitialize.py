@@ -0,0 +1,247 @@
+"""Migrations against a fake bot: albums, copyMessages batches and resuming from checkpoints.
+
+Run with:
+    python -m pytest tests
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import types
+import unittest
+from collections import Counter
+from datetime import datetime, timedelta
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('BOT_TOKEN', '123:test')
+
+from telegram.error import BadRequest  # noqa: E402
+import config  # noqa: E402
+import database  # noqa: E402
+from db_handler import DatabaseHandler  # noqa: E402
+from metadata_cache import group_cache, topic_cache  # noqa: E402
+from rate_limiter import RateLimiter  # noqa: E402
+from reinitialize import ReinitializationHandler  # noqa: E402
+
+SOURCE = -2001
+TARGET = -2002
+
+
+class Crash(BaseException):
+    """The process dying mid-migration (not an error a send would catch)."""
+
+
+class FakeBot:
+    """Records Bot API calls; copy_messages and send_media_group behave like Telegram's."""
+
+    def __init__(self, forum=False, crash_after=None, copy_result=None, bad_album_caption=None):
+        self.forum = forum
+        self.crash_after = crash_after
+        self.copy_result = copy_result
+        self.bad_album_caption = bad_album_caption
+        self.calls = []
+        self.next_id = 1000
+
+    async def get_chat(self, chat_id):
+        return types.SimpleNamespace(is_forum=self.forum)
+
+    async def create_forum_topic(self, chat_id, name):
+        self.next_id += 1
+        return types.SimpleNamespace(message_thread_id=self.next_id)
+
+    def __getattr__(self, name):
+        async def call(**kwargs):
+            if self.crash_after is not None and len(self.calls) >= self.crash_after:
+                raise Crash()
+            if name == 'send_media_group' and self.bad_album_caption is not None \
+                    and kwargs['media'][0].caption == self.bad_album_caption:
+                raise BadRequest('Wrong file identifier')
+            self.calls.append((name, kwargs))
+            self.next_id += 1
+            if name == 'copy_messages':
+                if self.copy_result is not None:
+                    return self.copy_result
+                return [types.SimpleNamespace(message_id=i) for i in kwargs['message_ids']]
+            if name == 'send_media_group':
+                return [types.SimpleNamespace(message_id=self.next_id) for _ in kwargs['media']]
+            return types.SimpleNamespace(message_id=self.next_id)
+        return call
+
+    def sent(self):
+        """(method, thread, text or file of each item) for every message the bot posted."""
+        sent = []
+        for name, kwargs in self.calls:
+            thread = kwargs.get('message_thread_id')
+            if name == 'send_media_group':
+                sent.extend((name, thread, item.media) for item in kwargs['media'])
+            elif name == 'copy_messages':
+                sent.extend((name, thread, message_id) for message_id in kwargs['message_ids'])
+            else:
+                sent.append((name, thread, kwargs.get('text') or next(
+                    value for key, value in kwargs.items() if key not in ('chat_id', 'caption', 'message_thread_id')
+                )))
+        return sent
+
+
+class MigrationTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.database_url = database.DATABASE_URL
+        database.dispose_engine()
+        database.DATABASE_URL = f"sqlite:///{os.path.join(self.tmp.name, 'migrate.db')}"
+        database.init_db()
+        # The caches would skip writing groups and topics the previous test's database had
+        group_cache.clear()
+        topic_cache.clear()
+        DatabaseHandler.add_or_update_group(SOURCE, 'Source')
+        DatabaseHandler.add_or_update_group(TARGET, 'Target')
+        self.rows = []
+        # Checkpoint after every message so a resumed job re-sends nothing
+        patcher = mock.patch.multiple(config, REINIT_CHECKPOINT_INTERVAL=1, REINIT_JOB_STALE_AFTER=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        database.dispose_engine()
+        database.DATABASE_URL = self.database_url
+        self.tmp.cleanup()
+
+    def add(self, message_type='text', media_group_id=None, caption=None, topic_id=None):
+        message_id = len(self.rows) + 1
+        self.rows.append({
+            'group_id': SOURCE,
+            'group_name': 'Source',
+            'message_id': message_id,
+            'topic_id': topic_id,
+            'message_type': message_type,
+            'text_content': f'text {message_id}' if message_type == 'text' else None,
+            'caption': caption,
+            'file_id': f'file {message_id}',
+            'media_group_id': media_group_id,
+            'timestamp': datetime(2024, 1, 1) + timedelta(seconds=message_id),
+        })
+
+    def migrate(self, bot, mode='resend'):
+        DatabaseHandler.save_messages_bulk(self.rows)
+        handler = ReinitializationHandler(bot, rate_limiter=RateLimiter(10000, 10000))
+        return asyncio.run(handler.reinitialize(SOURCE, TARGET, mode=mode))
+
+    def resume(self, bot, mode='resend'):
+        handler = ReinitializationHandler(bot, rate_limiter=RateLimiter(10000, 10000))
+        return asyncio.run(handler.reinitialize(SOURCE, TARGET, mode=mode))
+
+
+class AlbumTest(MigrationTest):
+    def test_albums_are_sent_with_send_media_group(self):
+        self.add()
+        for _ in range(3):
+            self.add('photo', media_group_id='a1', caption='holiday')
+        for _ in range(12):
+            self.add('video', media_group_id='a2')
+        self.add('photo', media_group_id='a3')  # the rest of this album was not captured
+        self.add()
+
+        bot = FakeBot()
+        result = self.migrate(bot)
+
+        calls = [(name, len(kwargs.get('media', ()))) for name, kwargs in bot.calls]
+        self.assertEqual(calls, [
+            ('send_message', 0),
+            ('send_media_group', 3),
+            ('send_media_group', 10),  # sendMediaGroup takes at most 10 items
+            ('send_media_group', 2),
+            ('send_photo', 0),
+            ('send_message', 0),
+        ])
+        self.assertEqual(result['status'], 'completed')
+        self.assertEqual(result['sent'], 18)
+        self.assertEqual(result['albums'], 3)
+        self.assertEqual(result['api_calls'], 6)
+        self.assertEqual(result['api_calls_saved'], 12)
+
+    def test_rejected_album_is_sent_item_by_item(self):
+        for _ in range(2):
+            self.add('photo', media_group_id='a1', caption='broken')
+
+        bot = FakeBot(bad_album_caption='broken')
+        result = self.migrate(bot)
+
+        self.assertEqual([name for name, _ in bot.calls], ['send_photo', 'send_photo'])
+        self.assertEqual((result['sent'], result['failed'], result['albums']), (2, 0, 0))
+        self.assertEqual(result['api_calls'], 3)  # the rejected album counts too
+
+
+class CopyBatchTest(MigrationTest):
+    def test_copyable_messages_are_copied_in_one_call(self):
+        for _ in range(5):
+            self.add()
+
+        bot = FakeBot()
+        result = self.migrate(bot, mode='copy')
+
+        self.assertEqual(bot.sent(), [('copy_messages', None, i) for i in range(1, 6)])
+        self.assertEqual((result['sent'], result['api_calls']), (5, 1))
+
+    def test_messages_copy_messages_skipped_are_resent(self):
+        for _ in range(3):
+            self.add()
+
+        # Every message was deleted from the source group: nothing is copied
+        bot = FakeBot(copy_result=[])
+        result = self.migrate(bot, mode='copy')
+
+        self.assertEqual([name for name, _ in bot.calls], ['copy_messages'] + ['send_message'] * 3)
+        self.assertEqual((result['sent'], result['failed']), (3, 0))
+
+
+class ResumeTest(MigrationTest):
+    def test_resume_continues_after_the_checkpoint(self):
+        for _ in range(30):
+            self.add()
+
+        first = FakeBot(crash_after=12)
+        with self.assertRaises(Crash):
+            self.migrate(first)
+        second = FakeBot()
+        result = self.resume(second)
+
+        texts = [text for _, _, text in first.sent() + second.sent()]
+        self.assertEqual(texts, [f'text {i}' for i in range(1, 31)])
+        self.assertEqual(result['status'], 'completed')
+        self.assertTrue(result['resumed'])
+        self.assertEqual(result['sent'], 30)
+
+    def test_parallel_topics_resume_from_their_own_checkpoints(self):
+        DatabaseHandler.add_forum_topic(SOURCE, 1, 'One')
+        DatabaseHandler.add_forum_topic(SOURCE, 2, 'Two')
+        for i in range(45):
+            self.add(topic_id=(i % 3) or None)
+
+        with mock.patch.object(config, 'REINIT_TOPIC_CONCURRENCY', 3):
+            first = FakeBot(forum=True, crash_after=20)
+            with self.assertRaises(Crash):
+                self.migrate(first)
+            second = FakeBot(forum=True)
+            result = self.resume(second)
+
+        self.assertEqual(result['status'], 'completed')
+        self.assertEqual(result['topics_created'], 0)  # created by the first run
+        sent = first.sent() + second.sent()
+        texts = Counter(text for _, _, text in sent)
+        self.assertEqual(set(texts), {f'text {i}' for i in range(1, 46)})
+        # A pipeline cancelled mid-checkpoint may send its last message again, nothing more
+        self.assertLessEqual(sum(texts.values()) - 45, 3)
+        # Each target thread gets its messages in order
+        by_thread = {}
+        for _, thread, text in sent:
+            number = int(text.split()[1])
+            if number not in by_thread.setdefault(thread, []):
+                by_thread[thread].append(number)
+        for numbers in by_thread.values():
+            self.assertEqual(numbers, sorted(numbers))
+        self.assertEqual(len(by_thread), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
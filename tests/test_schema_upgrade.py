@@ -0,0 +1,159 @@
+"""Upgrade a database created by the original schema and use it.
+
+Run with:
+    python -m pytest tests
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from datetime import datetime
+from io import StringIO
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('BOT_TOKEN', '123:test')
+
+import database  # noqa: E402
+import dedup_messages  # noqa: E402
+from db_handler import DatabaseHandler  # noqa: E402
+
+# Tables as the first release created them (no schema_version table)
+BASELINE_SCHEMA = """
+CREATE TABLE telegram_groups (
+    id INTEGER NOT NULL,
+    group_id BIGINT NOT NULL,
+    group_name VARCHAR(255),
+    created_at DATETIME,
+    updated_at DATETIME,
+    PRIMARY KEY (id)
+);
+CREATE UNIQUE INDEX ix_telegram_groups_group_id ON telegram_groups (group_id);
+CREATE TABLE forum_topics (
+    id INTEGER NOT NULL,
+    group_id BIGINT NOT NULL,
+    topic_id INTEGER NOT NULL,
+    topic_name VARCHAR(255),
+    created_at DATETIME,
+    PRIMARY KEY (id)
+);
+CREATE INDEX ix_forum_topics_group_id ON forum_topics (group_id);
+CREATE TABLE captured_messages (
+    id INTEGER NOT NULL,
+    group_id BIGINT NOT NULL,
+    group_name VARCHAR(255),
+    message_id INTEGER NOT NULL,
+    topic_id INTEGER,
+    topic_name VARCHAR(255),
+    sender_id BIGINT,
+    sender_username VARCHAR(255),
+    sender_first_name VARCHAR(255),
+    sender_last_name VARCHAR(255),
+    message_type VARCHAR(50) NOT NULL,
+    text_content TEXT,
+    caption TEXT,
+    file_id VARCHAR(255),
+    timestamp DATETIME NOT NULL,
+    created_at DATETIME,
+    PRIMARY KEY (id)
+);
+CREATE INDEX ix_captured_messages_group_id ON captured_messages (group_id);
+"""
+
+GROUP_ID = -1001
+
+
+class SchemaUpgradeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'baseline.db')
+        conn = sqlite3.connect(self.path)
+        conn.executescript(BASELINE_SCHEMA)
+        # An edited message used to be stored twice; the newer row is the edit
+        conn.executemany(
+            "INSERT INTO captured_messages (group_id, group_name, message_id, message_type, text_content, timestamp) "
+            "VALUES (?, 'Group', ?, 'text', ?, '2024-01-01 00:00:00.000000')",
+            [(GROUP_ID, 1, 'original'), (GROUP_ID, 1, 'edited'), (GROUP_ID, 2, 'second')]
+        )
+        conn.commit()
+        conn.close()
+
+        self.database_url = database.DATABASE_URL
+        database.dispose_engine()
+        database.DATABASE_URL = f'sqlite:///{self.path}'
+
+    def tearDown(self):
+        database.dispose_engine()
+        database.DATABASE_URL = self.database_url
+        self.tmp.cleanup()
+
+    def upgrade(self):
+        """Upgrade the way the docs say: dedup_messages.py, then start the bot."""
+        with mock.patch.object(sys, 'argv', ['dedup_messages.py']), redirect_stdout(StringIO()):
+            dedup_messages.main()
+        database.init_db()
+
+    def test_refuses_to_start_without_unique_index(self):
+        with self.assertRaises(RuntimeError):
+            database.init_db()
+
+        conn = sqlite3.connect(self.path)
+        try:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            count = conn.execute("SELECT COUNT(*) FROM captured_messages").fetchone()[0]
+        finally:
+            conn.close()
+        self.assertNotIn('schema_version', tables)
+        self.assertEqual(count, 3)
+
+    def test_upgrade_then_save_and_read(self):
+        self.upgrade()
+
+        conn = sqlite3.connect(self.path)
+        try:
+            version = conn.execute("SELECT version FROM schema_version").fetchone()[0]
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(captured_messages)")}
+            indexes = {row[1] for row in conn.execute("PRAGMA index_list(captured_messages)")}
+        finally:
+            conn.close()
+        self.assertEqual(version, database.SCHEMA_VERSION)
+        self.assertIn('media_group_id', columns)
+        self.assertIn(database.UNIQUE_MESSAGE_INDEX, indexes)
+
+        DatabaseHandler.save_message_now({
+            'group_id': GROUP_ID,
+            'group_name': 'Group',
+            'message_id': 3,
+            'topic_id': None,
+            'message_type': 'photo',
+            'caption': 'album',
+            'file_id': 'file-3',
+            'media_group_id': 'album-1',
+            'timestamp': datetime(2024, 1, 2),
+        })
+
+        rows = DatabaseHandler.get_message_page(GROUP_ID)
+        self.assertEqual([row.message_id for row in rows], [1, 2, 3])
+        self.assertEqual(rows[0].text_content, 'edited')
+        self.assertEqual(rows[2].media_group_id, 'album-1')
+        self.assertEqual(DatabaseHandler.get_database_stats()['messages'], 3)
+
+    def test_upgraded_database_is_current(self):
+        self.upgrade()
+        database.init_db()  # second start: version is current, nothing to migrate
+
+        DatabaseHandler.save_message_now({
+            'group_id': GROUP_ID,
+            'message_id': 2,
+            'message_type': 'text',
+            'text_content': 'edited again',
+            'timestamp': datetime(2024, 1, 1),
+        })
+        rows = DatabaseHandler.get_message_page(GROUP_ID)
+        self.assertEqual([row.text_content for row in rows], ['edited', 'edited again'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+"""Spool replay: rejected rows are dead-lettered, an unusable database keeps the backlog.
+
+Run with:
+    python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+import time
+import unittest
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError  # noqa: E402
+from spool import DEAD_LETTER_FILE, MessageSpool  # noqa: E402
+
+
+def rows(first, last):
+    return [
+        {'group_id': -1003, 'message_id': i, 'message_type': 'text', 'timestamp': datetime(2024, 1, 1)}
+        for i in range(first, last + 1)
+    ]
+
+
+class FakeDatabase:
+    """flush_fn stand-in: raises `error` while set, and `rejected(row)` rows with IntegrityError."""
+
+    def __init__(self, error=None, rejected=lambda row: False):
+        self.error = error
+        self.rejected = rejected
+        self.stored = []
+
+    def flush(self, batch):
+        if self.error is not None:
+            raise self.error
+        if any(self.rejected(row) for row in batch):
+            raise IntegrityError('INSERT', {}, Exception('value too long'))
+        self.stored.extend(row['message_id'] for row in batch)
+        return True
+
+
+class SpoolReplayTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.spools = []
+
+    def tearDown(self):
+        for spool in self.spools:
+            spool.stop()
+        self.tmp.cleanup()
+
+    def spool(self, database):
+        spool = MessageSpool(
+            self.tmp.name, database.flush, segment_rows=10, replay_batch=4, replay_interval_ms=20
+        )
+        self.spools.append(spool)
+        return spool
+
+    def wait_for(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail('timed out waiting for the spool replay')
+            time.sleep(0.01)
+
+    def dead_letters(self):
+        path = os.path.join(self.tmp.name, DEAD_LETTER_FILE)
+        if not os.path.exists(path):
+            return 0
+        with open(path, encoding='utf-8') as f:
+            return sum(1 for line in f if line.strip())
+
+    def test_rejected_rows_are_dead_lettered(self):
+        database = FakeDatabase(rejected=lambda row: row['message_id'] % 5 == 0)
+        spool = self.spool(database)
+        spool.append(rows(1, 25))
+
+        self.wait_for(lambda: spool.get_stats()['pending'] == 0)
+        self.assertEqual(database.stored, [i for i in range(1, 26) if i % 5])
+        self.assertEqual(spool.get_stats()['dead_lettered'], 5)
+        self.assertEqual(self.dead_letters(), 5)
+        self.assertFalse(spool.should_divert())
+
+    def test_schema_errors_keep_the_backlog(self):
+        # e.g. a deploy that expects a column the database does not have yet
+        database = FakeDatabase(error=ProgrammingError('INSERT', {}, Exception('no such column')))
+        spool = self.spool(database)
+        spool.append(rows(1, 12))
+
+        self.wait_for(lambda: spool.get_stats()['replay_failures'] >= 2)
+        self.assertEqual(spool.get_stats()['pending'], 12)
+        self.assertEqual(self.dead_letters(), 0)
+
+        database.error = None
+        self.wait_for(lambda: spool.get_stats()['pending'] == 0)
+        self.assertEqual(database.stored, list(range(1, 13)))
+
+    def test_unavailable_database_keeps_the_backlog(self):
+        database = FakeDatabase(error=OperationalError('INSERT', {}, Exception('connection refused')))
+        spool = self.spool(database)
+        spool.append(rows(1, 6))
+
+        self.wait_for(lambda: spool.get_stats()['replay_failures'] >= 1)
+        self.assertTrue(spool.should_divert())
+        database.error = None
+        self.wait_for(lambda: spool.get_stats()['pending'] == 0)
+        self.assertEqual(database.stored, list(range(1, 7)))
+        self.assertEqual(self.dead_letters(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
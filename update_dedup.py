@@ -0,0 +1,142 @@
+"""Suppression of redelivered webhook updates by update_id."""
+import logging
+import threading
+import time
+from collections import OrderedDict
+import config
+
+logger = logging.getLogger(__name__)
+
+
+# Outcomes of claiming an update_id
+UPDATE_NEW = 'new'  # process it
+UPDATE_IN_PROGRESS = 'in_progress'  # another request is processing it; let Telegram retry later
+UPDATE_DONE = 'done'  # already processed; acknowledge without processing
+
+
+class UpdateDeduplicator:
+    """Time-windowed, bounded set of recently claimed update_ids.
+
+    An update_id is claimed when its request arrives and completed once it
+    was processed. A claim that is not completed within the lease (the
+    request was killed mid-update) may be taken over by a redelivery, so
+    the update is never lost. The in-memory set catches redeliveries to the
+    same worker. With a ``store`` (see DatabaseHandler.claim_update), ids are
+    also recorded in a shared table so redeliveries to other workers are
+    caught too.
+    """
+
+    def __init__(self, window_seconds=3600, max_size=100000, lease_seconds=60, store=None):
+        """
+        Args:
+            window_seconds: How long an update_id is remembered
+            max_size: Maximum number of update_ids kept in memory
+            lease_seconds: How long a claimed, unfinished update is left to its request
+            store: Optional object with claim_update(update_id, lease_seconds) -> outcome,
+                complete_update(update_id) and forget_update(update_id), shared between workers
+        """
+        self.window = window_seconds
+        self.max_size = max_size
+        self.lease = lease_seconds
+        self.store = store
+        self._seen = OrderedDict()  # update_id -> (time claimed, completed)
+        self._lock = threading.Lock()
+        self._stats = {'checked': 0, 'memory_hits': 0, 'store_hits': 0, 'in_progress': 0, 'taken_over': 0}
+
+    @property
+    def uses_store(self):
+        """Whether checks may hit the database (and should run off the event loop)."""
+        return self.store is not None
+
+    def claim(self, update_id):
+        """
+        Claim an update for processing.
+
+        Returns:
+            UPDATE_NEW, UPDATE_IN_PROGRESS or UPDATE_DONE
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._stats['checked'] += 1
+            self._expire(now)
+            entry = self._seen.get(update_id)
+            if entry is not None:
+                claimed_at, completed = entry
+                if completed:
+                    self._stats['memory_hits'] += 1
+                    return UPDATE_DONE
+                if now - claimed_at < self.lease:
+                    self._stats['in_progress'] += 1
+                    return UPDATE_IN_PROGRESS
+                self._stats['taken_over'] += 1
+            self._seen[update_id] = (now, False)
+            self._seen.move_to_end(update_id)
+            while len(self._seen) > self.max_size:
+                self._seen.popitem(last=False)
+
+        if self.store is None:
+            return UPDATE_NEW
+        outcome = self.store.claim_update(update_id, self.lease)
+        if outcome != UPDATE_NEW:
+            with self._lock:
+                self._stats['store_hits' if outcome == UPDATE_DONE else 'in_progress'] += 1
+                if outcome == UPDATE_DONE:
+                    self._seen[update_id] = (now, True)
+                else:
+                    # Claimed by another worker; ask the store again next time
+                    self._seen.pop(update_id, None)
+        return outcome
+
+    def complete(self, update_id):
+        """Record a claimed update as processed, so redeliveries are acknowledged and skipped."""
+        with self._lock:
+            if update_id in self._seen:
+                self._seen[update_id] = (self._seen[update_id][0], True)
+        if self.store is not None:
+            self.store.complete_update(update_id)
+
+    def forget(self, update_id):
+        """Forget an update that could not be processed, so its redelivery is accepted."""
+        with self._lock:
+            self._seen.pop(update_id, None)
+        if self.store is not None:
+            self.store.forget_update(update_id)
+
+    def get_stats(self):
+        """Get hit counters and the number of remembered update_ids."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['remembered'] = len(self._seen)
+        stats['hits'] = stats['memory_hits'] + stats['store_hits']
+        return stats
+
+    def _expire(self, now):
+        """Drop ids older than the window (called with the lock held)."""
+        while self._seen:
+            update_id, (claimed_at, _) = next(iter(self._seen.items()))
+            if now - claimed_at < self.window:
+                break
+            self._seen.popitem(last=False)
+
+
+_deduplicator = None
+
+
+def get_deduplicator():
+    """Get the process-wide deduplicator, or None when disabled."""
+    global _deduplicator
+    if not config.UPDATE_DEDUP_ENABLED:
+        return None
+    if _deduplicator is None:
+        store = None
+        if config.UPDATE_DEDUP_BACKEND == 'database':
+            from db_handler import DatabaseHandler
+            store = DatabaseHandler
+        _deduplicator = UpdateDeduplicator(
+            window_seconds=config.UPDATE_DEDUP_WINDOW,
+            max_size=config.UPDATE_DEDUP_MAX_SIZE,
+            lease_seconds=config.UPDATE_DEDUP_LEASE,
+            store=store
+        )
+        logger.info(f"Update deduplication enabled ({config.UPDATE_DEDUP_BACKEND})")
+    return _deduplicator
@@ -0,0 +1,107 @@
+"""Concurrent update processing for polling mode with per-chat ordering.
+
+Updates are processed concurrently, but updates from the same chat still
+run one at a time and in the order they were received. Admin commands
+and button presses run in their own lane with a separate concurrency
+limit, so a long /reinitialize or a slow /stats query cannot hold up
+message capture, and a burst of group messages cannot hold up admins.
+"""
+import asyncio
+import logging
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def is_admin_update(update):
+    """Check whether an update is an admin command or button press (not captured content)."""
+    if not isinstance(update, Update) or not update.effective_user:
+        return False
+    if update.effective_user.id not in config.ADMIN_IDS:
+        return False
+    if update.callback_query:
+        return True
+    message = update.message
+    return bool(message and message.text and message.text.startswith('/'))
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Update processor with per-chat ordering and separate capture/admin lanes."""
+
+    def __init__(self, concurrency=8, admin_concurrency=2, max_pending=256):
+        """
+        Args:
+            concurrency: Updates processed at once in the capture lane
+            admin_concurrency: Admin updates processed at once (separate budget)
+            max_pending: Updates accepted at once, including those waiting on their chat
+        """
+        # The base class semaphore only bounds pending work; the lanes below
+        # limit how much actually runs, after the per-chat lock is taken
+        super().__init__(max(max_pending, concurrency + admin_concurrency))
+        self._lanes = {
+            'capture': asyncio.BoundedSemaphore(concurrency),
+            'admin': asyncio.BoundedSemaphore(admin_concurrency),
+        }
+        self._limits = {'capture': concurrency, 'admin': admin_concurrency}
+        self._chat_locks = {}  # chat id -> [lock, number of updates holding or waiting]
+        self._active = {'capture': 0, 'admin': 0}
+        self._stats = {'capture': 0, 'admin': 0, 'failed': 0}
+
+    async def do_process_update(self, update, coroutine):
+        """Run an update after earlier updates from its chat, within its lane's budget."""
+        lane = 'admin' if is_admin_update(update) else 'capture'
+        key = None
+        if isinstance(update, Update):
+            if update.effective_chat:
+                key = update.effective_chat.id
+            elif update.effective_user:
+                key = update.effective_user.id
+
+        if key is None:
+            await self._run(lane, coroutine)
+            return
+
+        entry = self._chat_locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                await self._run(lane, coroutine)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._chat_locks[key]
+
+    async def _run(self, lane, coroutine):
+        """Await an update's coroutine within its lane's concurrency limit."""
+        async with self._lanes[lane]:
+            self._active[lane] += 1
+            try:
+                await coroutine
+            except Exception:
+                # Application.process_update reports handler errors itself
+                self._stats['failed'] += 1
+                raise
+            finally:
+                self._active[lane] -= 1
+                self._stats[lane] += 1
+
+    async def initialize(self):
+        """Log the configured limits."""
+        logger.info(
+            f"Concurrent update processing: {self._limits['capture']} capture, "
+            f"{self._limits['admin']} admin, {self.max_concurrent_updates} pending"
+        )
+
+    async def shutdown(self):
+        """Nothing to release; in-flight updates are awaited by the application."""
+
+    def get_stats(self):
+        """Get processed counts, current activity and the number of chats with queued updates."""
+        stats = dict(self._stats)
+        for lane, active in self._active.items():
+            stats[f'{lane}_active'] = active
+        stats['busy_chats'] = len(self._chat_locks)
+        stats['pending'] = sum(users for _, users in self._chat_locks.values())
+        return stats
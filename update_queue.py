@@ -0,0 +1,129 @@
+"""In-process update queue drained by a pool of async workers.
+
+Used by the webhook entry points in fast-ack mode: the request handler
+only enqueues the raw update and returns, and the workers feed updates to
+the bot application. Each chat is pinned to one worker, so updates from
+the same chat are still processed in the order they were received.
+"""
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Update fields that carry the chat an update belongs to
+_CHAT_FIELDS = (
+    'message', 'edited_message', 'channel_post', 'edited_channel_post',
+    'my_chat_member', 'chat_member', 'chat_join_request',
+)
+
+
+def extract_chat_id(data):
+    """Get the chat (or user, for callback queries) an update belongs to, without parsing it."""
+    for field in _CHAT_FIELDS:
+        payload = data.get(field)
+        if payload and payload.get('chat'):
+            return payload['chat'].get('id')
+    callback_query = data.get('callback_query')
+    if callback_query:
+        message = callback_query.get('message') or {}
+        chat = message.get('chat') or callback_query.get('from') or {}
+        return chat.get('id')
+    return None
+
+
+class UpdateDispatcher:
+    """Bounded update queue with per-chat ordered workers."""
+
+    def __init__(self, process_fn, workers=8, max_queue_size=1000):
+        """
+        Args:
+            process_fn: Coroutine function called with each raw update dict
+            workers: Number of concurrent workers
+            max_queue_size: Maximum number of queued updates (shared by all workers)
+        """
+        self.process_fn = process_fn
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self._queues = []
+        self._tasks = []
+        self._stats = {
+            'enqueued': 0,
+            'processed': 0,
+            'failed': 0,
+            'dropped': 0,
+            'last_latency_ms': 0.0,
+            'max_latency_ms': 0.0,
+            'total_latency_ms': 0.0,
+        }
+
+    async def start(self):
+        """Create the queues and start the workers on the running event loop."""
+        per_worker = max(1, self.max_queue_size // self.workers)
+        self._queues = [asyncio.Queue(maxsize=per_worker) for _ in range(self.workers)]
+        self._tasks = [
+            asyncio.create_task(self._worker(queue), name=f'update-worker-{i}')
+            for i, queue in enumerate(self._queues)
+        ]
+        logger.info(f"Update dispatcher started with {self.workers} workers")
+
+    def submit(self, data):
+        """
+        Enqueue a raw update. Must be called from the event loop thread.
+
+        Returns:
+            False if the update was dropped because its worker queue is full
+        """
+        chat_id = extract_chat_id(data)
+        key = chat_id if chat_id is not None else data.get('update_id', 0)
+        queue = self._queues[hash(key) % len(self._queues)]
+        try:
+            queue.put_nowait((time.monotonic(), data))
+        except asyncio.QueueFull:
+            self._stats['dropped'] += 1
+            logger.warning(f"Update queue full, dropping update {data.get('update_id')}")
+            return False
+        self._stats['enqueued'] += 1
+        return True
+
+    async def submit_async(self, data):
+        """Coroutine wrapper around submit() for callers on other threads."""
+        return self.submit(data)
+
+    async def stop(self, timeout=10):
+        """Wait (up to `timeout` seconds) for queued updates, then stop the workers."""
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._queues)), timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Update queue not drained after {timeout}s: {self.get_stats()['depth']} left")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def get_stats(self):
+        """Get queue depth, throughput, drop and latency statistics."""
+        stats = dict(self._stats)
+        stats['depth'] = sum(queue.qsize() for queue in self._queues)
+        stats['max_worker_depth'] = max((queue.qsize() for queue in self._queues), default=0)
+        done = stats['processed'] + stats['failed']
+        stats['avg_latency_ms'] = (stats['total_latency_ms'] / done) if done else 0.0
+        return stats
+
+    async def _worker(self, queue):
+        """Process updates from one queue, one at a time."""
+        while True:
+            enqueued_at, data = await queue.get()
+            try:
+                await self.process_fn(data)
+                self._stats['processed'] += 1
+            except Exception as e:
+                self._stats['failed'] += 1
+                logger.error(f"Error processing queued update {data.get('update_id')}: {e}", exc_info=True)
+            finally:
+                latency_ms = (time.monotonic() - enqueued_at) * 1000
+                self._stats['last_latency_ms'] = latency_ms
+                self._stats['max_latency_ms'] = max(self._stats['max_latency_ms'], latency_ms)
+                self._stats['total_latency_ms'] += latency_ms
+                queue.task_done()